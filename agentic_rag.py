@@ -1,21 +1,41 @@
 """Main Agentic RAG System Orchestrator"""
 
-import os
+import time
+
+_IMPORT_START = time.perf_counter()
+
 import sys
 from vector_store import VectorStore
-from preprocess import preprocess_documents
+from ingest import ingest_documents, IndexManifest
 from agents.basic_generator import BasicGeneratorAgent
 from agents.advanced_generator import AdvancedGeneratorAgent
 from agents.router_agent import RouterAgent
-from config import GEMINI_API_KEY
+from watcher import DocumentWatcher
+from utils.startup_timer import StartupTimer
+from utils.answer_cache import SemanticAnswerCache
+from config import GEMINI_API_KEY, LLM_CONFIG, WATCH_CONFIG, STARTUP_CONFIG, ANSWER_CACHE_CONFIG
+
+# Heavy libraries (chromadb, torch, google.generativeai) are imported lazily,
+# so this only covers the light module imports above
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
 
 
-def initialize_system(doc_folder: str = "docs", force_rebuild: bool = False):
-    """Initialize the RAG system with vector store"""
+def initialize_system(doc_folder: str = "docs", force_rebuild: bool = False, watch: bool = None):
+    """
+    Initialize the RAG system with vector store
+    
+    Args:
+        doc_folder: Folder of .txt documents to index
+        force_rebuild: Drop the collection and re-embed everything
+        watch: Keep indexing changes to doc_folder in the background
+               (None = WATCH_CONFIG["enabled"])
+    """
     print("🚀 Initializing Agentic RAG System...")
+    timer = StartupTimer()
+    timer.record("imports", _IMPORT_SECONDS)
     
-    # Check API key
-    if not GEMINI_API_KEY or GEMINI_API_KEY == "your_gemini_api_key_here":
+    # Check API key (the local Ollama backend needs none)
+    if LLM_CONFIG["backend"] == "gemini" and (not GEMINI_API_KEY or GEMINI_API_KEY == "your_gemini_api_key_here"):
         print("❌ Error: GEMINI_API_KEY not set in .env file")
         print("   Please add your API key to .env file:")
         print("   GEMINI_API_KEY=your_actual_api_key")
@@ -23,51 +43,160 @@ def initialize_system(doc_folder: str = "docs", force_rebuild: bool = False):
     
     # Initialize vector store
     print("📚 Loading vector store...")
-    vector_store = VectorStore()
+    with timer.phase("vector store + embedding model"):
+        vector_store = VectorStore()
+    
+    if vector_store.read_only:
+        return _initialize_agents(vector_store, timer)
+    
+    manifest = IndexManifest.load()
+    
+    mismatches = vector_store.index_mismatches()
+    if mismatches and not force_rebuild:
+        print("⚠️  Stored index was built with different settings:")
+        for mismatch in mismatches:
+            print(f"   - {mismatch}")
+        force_rebuild = True
+    
+    if force_rebuild:
+        print("🔄 Rebuilding vector store...")
+        vector_store.delete_collection()
+        vector_store.update_collection()
+        manifest.clear()
+    elif vector_store.get_collection_info()["count"] == 0:
+        # The manifest describes an index that no longer exists
+        manifest.clear()
+    
+    # Embed only new or changed files, drop chunks of removed ones
+    print("📄 Syncing documents...")
+    with timer.phase("document sync"):
+        stats = ingest_documents(doc_folder, vector_store, manifest=manifest)
+        manifest.save()
+        vector_store.record_index_info()
     
-    # Check if collection is empty or needs rebuilding
     collection_info = vector_store.get_collection_info()
+    if collection_info["count"] == 0:
+        print(f"⚠️  No documents found in '{doc_folder}' folder")
+        return None, None
     
-    if collection_info["count"] == 0 or force_rebuild:
-        if force_rebuild:
-            print("🔄 Rebuilding vector store...")
-            vector_store.delete_collection()
-            vector_store = VectorStore()
-        else:
-            print("📄 Processing documents...")
-        
-        # Load and preprocess documents
-        documents_data = preprocess_documents(doc_folder)
-        
-        if not documents_data:
-            print(f"⚠️  No documents found in '{doc_folder}' folder")
-            return None, None
-        
-        # Extract texts and metadatas
-        texts = [doc["text"] for doc in documents_data]
-        metadatas = [doc["metadata"] for doc in documents_data]
-        
-        # Add to vector store
-        print(f"💾 Storing {len(texts)} document chunks...")
-        vector_store.add_documents(texts, metadatas)
-        print(f"✅ Vector store initialized with {len(texts)} chunks")
-    else:
-        print(f"✅ Vector store ready ({collection_info['count']} chunks)")
+    print(
+        f"✅ Vector store ready ({collection_info['count']} chunks; "
+        f"{stats.files_added} added, {stats.files_changed} changed, "
+        f"{stats.files_removed} removed, {stats.files_unchanged} unchanged files)"
+    )
+    cache_stats = vector_store.get_embedding_cache_stats()
+    if cache_stats["enabled"] and cache_stats["memory_hits"] + cache_stats["disk_hits"]:
+        print(
+            f"   Embedding cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits, "
+            f"{cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate)"
+        )
+    
+    if WATCH_CONFIG["enabled"] if watch is None else watch:
+        DocumentWatcher(doc_folder, vector_store, manifest=manifest).start()
+        print(f"👀 Watching '{doc_folder}' for changes")
+    
+    return _initialize_agents(vector_store, timer)
+
+
+def _initialize_agents(vector_store: VectorStore, timer: StartupTimer):
+    """Warm up and build the agents over a ready vector store"""
+    if vector_store.read_only:
+        # A prebuilt bundle is served as-is: no document sync, no rebuild
+        mismatches = vector_store.index_mismatches()
+        if mismatches:
+            print("❌ Error: index bundle was built with different settings:")
+            for mismatch in mismatches:
+                print(f"   - {mismatch}")
+            sys.exit(1)
+        print(f"✅ Serving index bundle ({vector_store.get_collection_info()['count']} chunks, read-only)")
+    
+    if STARTUP_CONFIG["warm_up"]:
+        with timer.phase("warm-up"):
+            vector_store.warm_up()
     
     # Initialize agents
     print("🤖 Initializing agents...")
-    basic_agent = BasicGeneratorAgent(vector_store)
-    advanced_agent = AdvancedGeneratorAgent(vector_store)
-    router_agent = RouterAgent(basic_agent, advanced_agent)
+    with timer.phase("agents"):
+        basic_agent = BasicGeneratorAgent(vector_store)
+        answer_cache = SemanticAnswerCache() if ANSWER_CACHE_CONFIG["enabled"] else None
+        if STARTUP_CONFIG["defer_advanced_agent"]:
+            router_agent = RouterAgent(
+                basic_agent,
+                advanced_agent_factory=lambda: AdvancedGeneratorAgent(vector_store),
+                answer_cache=answer_cache
+            )
+        else:
+            router_agent = RouterAgent(
+                basic_agent, AdvancedGeneratorAgent(vector_store), answer_cache=answer_cache
+            )
+    
+    if STARTUP_CONFIG["warm_up"] and hasattr(basic_agent.llm, "load"):
+        # Load the local model now rather than on the first question
+        with timer.phase("LLM load"):
+            try:
+                basic_agent.llm.load()
+            except ConnectionError as e:
+                print(f"⚠️  {e}")
+    
+    if STARTUP_CONFIG["report"]:
+        print("⏱️  Startup time by phase:")
+        print(timer.format())
     
     print("✅ System ready!\n")
     return router_agent, vector_store
 
 
-def format_output(result: dict, mode: str = "silent"):
-    """Format the output based on mode"""
+class AnswerPrinter:
+    """
+    Prints answer tokens as the router streams them, one framed section per answer
+
+    Routing status lines that arrive while an answer is open are held back
+    and printed after its frame closes.
+    """
+    
+    def __init__(self):
+        self.answers = 0
+        self.open = False
+        self.held = []
+    
+    def on_token(self, token: str):
+        if not self.open:
+            print("\n" + "="*60)
+            print("Answer:" if self.answers == 0 else "Refined answer (advanced retrieval):")
+            print("="*60)
+            token = token.lstrip()
+            self.open = True
+        print(token, end="", flush=True)
+    
+    def on_answer_end(self):
+        if self.open:
+            print("\n" + "="*60 + "\n")
+            self.open = False
+            self.answers += 1
+        for line in self.held:
+            print(line)
+        self.held = []
+    
+    def on_status(self, line: str):
+        if self.open:
+            self.held.append(line)
+        else:
+            print(line)
+
+
+def _format_latency(metadata: dict) -> str:
+    latency = metadata.get("latency", {})
+    first_token = latency.get("first_token_seconds")
+    first = f"{first_token:.2f}s" if first_token is not None else "n/a"
+    return f"first token {first}, total {latency.get('total_seconds', 0):.2f}s"
+
+
+def format_output(result: dict, mode: str = "silent", streamed: bool = False):
+    """Format the output based on mode (streamed: the answer was already printed token by token)"""
     if mode == "silent":
         # Only show final answer
+        if streamed:
+            return
         print("\n" + "="*60)
         print("Answer:")
         print("="*60)
@@ -83,6 +212,10 @@ def format_output(result: dict, mode: str = "silent"):
         print("Router Decision:")
         print("="*60)
         
+        if "answer_cache" in metadata:
+            cache_hit = metadata["answer_cache"]
+            print(f"✓ Served from answer cache (similarity {cache_hit['similarity']:.3f} "
+                  f"to \"{cache_hit['cached_query']}\")")
         if routing.get("strategy") == "basic_only":
             print("✓ Used Basic Generator Agent (answer sufficient)")
         else:
@@ -90,7 +223,11 @@ def format_output(result: dict, mode: str = "silent"):
             if "techniques_used" in metadata:
                 techniques = metadata["techniques_used"]
                 print(f"  Techniques: {', '.join(techniques)}")
+        print(f"⏱️  Latency: {_format_latency(metadata)}")
         
+        if streamed:
+            print("="*60 + "\n")
+            return
         print("\n" + "="*60)
         print("Answer:")
         print("="*60)
@@ -108,6 +245,17 @@ def format_output(result: dict, mode: str = "silent"):
         print("="*60)
         print(f"Agent Used: {agent_used}")
         print(f"Routing Strategy: {routing.get('strategy', 'unknown')}")
+        if "speculation" in routing:
+            speculation = routing["speculation"]
+            if speculation["used"]:
+                print(f"Speculative Advanced Context: used ({speculation['llm_calls']} LLM calls, "
+                      f"waited {speculation['wait_seconds']:.2f}s for it)")
+            else:
+                print("Speculative Advanced Context: cancelled (basic answer sufficient)")
+        if "answer_cache" in metadata:
+            cache_hit = metadata["answer_cache"]
+            print(f"Answer Cache: hit (similarity {cache_hit['similarity']:.3f}, "
+                  f"cached query: {cache_hit['cached_query']!r})")
         
         if "evaluation" in routing:
             eval_data = routing["evaluation"]
@@ -122,6 +270,15 @@ def format_output(result: dict, mode: str = "silent"):
                 print(f"  {tech}: {details}")
         
         print(f"\nRetrieved Chunks: {len(result['retrieved_chunks'])}")
+        print(f"Latency: {_format_latency(metadata)}")
+        if "generation" in metadata:
+            generation = metadata["generation"]
+            print(f"  - Final answer generation: first token {generation['first_token_seconds']:.2f}s, "
+                  f"total {generation['total_seconds']:.2f}s")
+        
+        if streamed:
+            print("="*60 + "\n")
+            return
         print("\n" + "="*60)
         print("Answer:")
         print("="*60)
@@ -129,6 +286,18 @@ def format_output(result: dict, mode: str = "silent"):
         print("="*60 + "\n")
 
 
+def print_speculation_stats(router_agent: RouterAgent):
+    """Summary of speculative routing for the session"""
+    stats = router_agent.get_speculation_stats()
+    if not stats["started"]:
+        return
+    print(
+        f"🔮 Speculative routing: {stats['started']} started, {stats['used']} used, "
+        f"{stats['wasted']} wasted ({stats['waste_rate']:.0%}), "
+        f"{stats['wasted_llm_calls']} LLM calls spent on wasted runs"
+    )
+
+
 def main():
     """Main CLI interface"""
     print("="*60)
@@ -151,6 +320,8 @@ def main():
     if mode not in ["silent", "verbose", "debug"]:
         mode = "verbose"
     
+    stream = LLM_CONFIG.get("stream_answers", True) and mode != "debug"
+    
     print(f"\nMode: {mode}\n")
     print("="*60)
     
@@ -160,6 +331,7 @@ def main():
             query = input("\nAsk your question (or 'quit' to exit): ").strip()
             
             if query.lower() in ['quit', 'exit', 'q']:
+                print_speculation_stats(router_agent)
                 print("\n👋 Goodbye!")
                 break
             
@@ -168,18 +340,25 @@ def main():
             
             print()  # Empty line for better formatting
             
-            # Route and generate
+            # Route and generate, printing the answer as it is generated
+            # (debug mode keeps its step-by-step trace in order instead)
+            printer = AnswerPrinter() if stream else None
             result = router_agent.route_and_generate(
                 query=query,
                 mode=mode,
-                debug=(mode == "debug")
+                debug=(mode == "debug"),
+                on_token=printer.on_token if printer else None,
+                on_answer_end=printer.on_answer_end if printer else None,
+                on_status=printer.on_status if printer else None
             )
             
             # Format and display output
-            format_output(result, mode=mode)
+            format_output(result, mode=mode, streamed=stream)
             
         except KeyboardInterrupt:
-            print("\n\n👋 Goodbye!")
+            print()
+            print_speculation_stats(router_agent)
+            print("\n👋 Goodbye!")
             break
         except Exception as e:
             print(f"\n❌ Error: {str(e)}")
@@ -11,23 +11,82 @@ from utils.prompt_templates import (
     ADVANCED_GENERATION_PROMPT,
     BASIC_GENERATOR_PROMPT
 )
+from utils.rank_fusion import reciprocal_rank_fusion
+from utils.mmr import maximal_marginal_relevance
 from config import ADVANCED_GENERATOR_CONFIG, AGENT_CONFIG
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple, Callable
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import numpy as np
+
+# (chunk id, distance) pairs of one retrieval, best first; distance is None for lexical-only hits
+Ranking = List[Tuple[str, Optional[float]]]
+
+
+class RunCancelled(Exception):
+    """Raised at the next LLM call of a cancelled TechniqueRun"""
+
+
+class TechniqueRun:
+    """
+    State shared by the technique threads of one prepare_context call
+    
+    Cancelling stops the run at its next LLM call (a call already in
+    flight completes and is discarded); llm_calls counts the calls started.
+    """
+    
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+    
+    def cancel(self):
+        self.cancelled.set()
+    
+    def start_call(self):
+        """Account for an LLM call about to start; raises RunCancelled once cancelled"""
+        if self.cancelled.is_set():
+            raise RunCancelled("technique run cancelled")
+        with self._lock:
+            self.llm_calls += 1
 
 
 class AdvancedGeneratorAgent(BaseAgent):
-    """Advanced generator agent using multiple RAG techniques"""
+    """
+    Advanced generator agent using multiple RAG techniques
+    
+    The techniques are independent chains of LLM calls and run concurrently,
+    as do the sub-answers of query decomposition; at most
+    config["concurrency"]["max_llm_calls"] LLM calls are in flight at once.
+    """
+    
+    TECHNIQUES = ["decomposition", "hyde", "multi_query"]
     
     def __init__(self, vector_store: VectorStore):
         super().__init__(config=AGENT_CONFIG)
         self.vector_store = vector_store
         self.config = ADVANCED_GENERATOR_CONFIG
+        max_llm_calls = max(1, self.config["concurrency"]["max_llm_calls"])
+        self._llm_slots = threading.BoundedSemaphore(max_llm_calls)
+        # Techniques wait on sub-query tasks, so the two levels get separate pools (no deadlock)
+        self._technique_executor = ThreadPoolExecutor(
+            max_workers=len(self.TECHNIQUES), thread_name_prefix="advanced-technique"
+        )
+        self._subquery_executor = ThreadPoolExecutor(max_workers=max_llm_calls, thread_name_prefix="advanced-subquery")
+    
+    def generate(self, prompt: str, run: Optional[TechniqueRun] = None, **kwargs) -> str:
+        """Generate response, waiting for a free slot under the concurrency limit"""
+        with self._llm_slots:
+            if run is not None:
+                run.start_call()
+            return super().generate(prompt, **kwargs)
     
     def generate_answer(
         self, 
         query: str,
         techniques: Optional[List[str]] = None,
-        debug: bool = False
+        debug: bool = False,
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """
         Generate answer using advanced techniques
@@ -37,52 +96,94 @@ class AdvancedGeneratorAgent(BaseAgent):
             techniques: List of techniques to use ['decomposition', 'hyde', 'multi_query']
                        If None, uses all techniques
             debug: Enable debug output
+            on_token: Called with each token of the final answer as it arrives
+        """
+        prepared = self.prepare_context(query, techniques=techniques, debug=debug)
+        return self.answer_from_context(query, prepared, debug=debug, on_token=on_token)
+    
+    def prepare_context(
+        self,
+        query: str,
+        techniques: Optional[List[str]] = None,
+        debug: bool = False,
+        run: Optional[TechniqueRun] = None
+    ) -> Dict[str, Any]:
         """
-        techniques = techniques or ["decomposition", "hyde", "multi_query"]
+        Planning and retrieval half of generate_answer: run the techniques and select the context
         
-        all_context = []
-        technique_metadata = {}
+        Args:
+            query: User query
+            techniques: Techniques to use (None = all)
+            debug: Enable debug output
+            run: Lets another thread cancel this call and see its LLM call count
         
-        # Technique 1: Query Decomposition
-        if "decomposition" in techniques:
-            if debug:
-                print("[Advanced] Using Query Decomposition technique...")
-            
-            decomp_result = self._query_decomposition(query, debug=debug)
-            if decomp_result:
-                all_context.extend(decomp_result["context_chunks"])
-                technique_metadata["decomposition"] = decomp_result["metadata"]
+        Returns:
+            Prepared context for answer_from_context
         
-        # Technique 2: HyDE
-        if "hyde" in techniques:
-            if debug:
-                print("[Advanced] Using HyDE technique...")
-            
-            hyde_result = self._hyde_retrieval(query, debug=debug)
-            if hyde_result:
-                all_context.extend(hyde_result["context_chunks"])
-                technique_metadata["hyde"] = hyde_result["metadata"]
+        Raises:
+            RunCancelled: If the run was cancelled
+        """
+        techniques = techniques or self.TECHNIQUES
+        runners = {
+            "decomposition": ("Query Decomposition", self._query_decomposition),
+            "hyde": ("HyDE", self._hyde_retrieval),
+            "multi_query": ("Multi-Query", self._multi_query_retrieval),
+        }
         
-        # Technique 3: Multi-Query
-        if "multi_query" in techniques:
+        # Run the requested techniques side by side
+        futures = []
+        for technique in self.TECHNIQUES:
+            if technique not in techniques:
+                continue
+            label, runner = runners[technique]
             if debug:
-                print("[Advanced] Using Multi-Query technique...")
-            
-            multi_result = self._multi_query_retrieval(query, debug=debug)
-            if multi_result:
-                all_context.extend(multi_result["context_chunks"])
-                technique_metadata["multi_query"] = multi_result["metadata"]
+                print(f"[Advanced] Using {label} technique...")
+            futures.append((technique, self._technique_executor.submit(runner, query, debug=debug, run=run)))
+        
+        # Collect in a fixed technique order so fusion does not depend on which finished first
+        rankings: List[Ranking] = []
+        documents: Dict[str, str] = {}  # Chunk id -> text
+        technique_metadata = {}
+        for technique, future in futures:
+            technique_result = future.result()
+            if technique_result:
+                rankings.extend(technique_result["rankings"])
+                documents.update(technique_result["documents"])
+                technique_metadata[technique] = technique_result["metadata"]
+        if run is not None and run.cancelled.is_set():
+            raise RunCancelled("technique run cancelled")
+        
+        # Fuse all rankings by chunk id, then keep a relevant but non-redundant subset
+        selected, selection_metadata = self._select_context(rankings)
         
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_context = []
-        for chunk in all_context:
-            chunk_hash = hash(chunk)
-            if chunk_hash not in seen:
-                seen.add(chunk_hash)
-                unique_context.append(chunk)
+        if debug and selected:
+            print(
+                f"[Advanced] Selected {len(selected)} of {selection_metadata['candidates']} "
+                f"unique chunks from {len(rankings)} retrievals"
+            )
+        
+        return {
+            "techniques": techniques,
+            "selected": selected,
+            "context_chunks": [documents[chunk_id] for chunk_id, _ in selected],
+            "context_selection": selection_metadata,
+            "technique_details": technique_metadata
+        }
+    
+    def answer_from_context(
+        self,
+        query: str,
+        prepared: Dict[str, Any],
+        debug: bool = False,
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """Final-answer half of generate_answer, from the output of prepare_context"""
+        context_chunks = prepared["context_chunks"]
+        selected = prepared["selected"]
+        techniques = prepared["techniques"]
+        technique_metadata = prepared["technique_details"]
         
-        if not unique_context:
+        if not context_chunks:
             return {
                 "answer": "I couldn't find relevant information to answer your question using advanced retrieval techniques.",
                 "context": "",
@@ -95,36 +196,85 @@ class AdvancedGeneratorAgent(BaseAgent):
             }
         
         if debug:
-            print(f"[Advanced] Combined {len(unique_context)} unique chunks from all techniques")
             print("[Advanced] Generating final answer...")
         
         # Generate final answer from combined context
-        combined_context = "\n\n".join(unique_context)
+        combined_context = "\n\n".join(context_chunks)
         prompt = ADVANCED_GENERATION_PROMPT.format(
             query=query,
             context=combined_context
         )
         
-        answer = self.generate(prompt)
+        answer, generation = self.stream_answer(prompt, on_token=on_token)
         
         return {
             "answer": answer,
             "context": combined_context,
-            "retrieved_chunks": unique_context,
+            "retrieved_chunks": context_chunks,
             "metadata": {
                 "agent": "advanced",
-                "n_chunks": len(unique_context),
+                "n_chunks": len(context_chunks),
+                "chunk_ids": [chunk_id for chunk_id, _ in selected],
+                "chunk_scores": [round(score, 6) for _, score in selected],
+                "context_selection": prepared["context_selection"],
                 "techniques_used": techniques,
-                "technique_details": technique_metadata
+                "technique_details": technique_metadata,
+                "generation": generation
             }
         }
     
-    def _query_decomposition(self, query: str, debug: bool = False) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _ranking(results: Dict[str, Any], documents: Dict[str, str]) -> Ranking:
+        """(id, distance) pairs of one query result; records the chunk texts in documents"""
+        documents.update(zip(results["ids"], results["documents"]))
+        return list(zip(results["ids"], results["distances"]))
+    
+    def _select_context(self, rankings: List[Ranking]) -> Tuple[List[Tuple[str, float]], Dict[str, Any]]:
+        """
+        Fuse retrieval rankings and pick the chunks for the final prompt
+        
+        Chunks are ranked by reciprocal rank fusion over every retrieval, so a
+        chunk found by several techniques or sub-queries rises to the top.
+        MMR over the stored chunk vectors then takes up to max_chunks of them,
+        skipping chunks that mostly repeat ones already taken.
+        
+        Returns:
+            ([(chunk id, fused score)] in prompt order, selection metadata)
+        """
+        settings = self.config["context_selection"]
+        fused = reciprocal_rank_fusion(
+            [[chunk_id for chunk_id, _ in ranking] for ranking in rankings],
+            k=settings["rrf_k"]
+        )
+        metadata = {"retrievals": len(rankings), "candidates": len(fused), "selected": 0}
+        if not fused:
+            return [], metadata
+        
+        # Chunks deleted since they were retrieved have no stored vector and drop out here
+        vectors = self.vector_store.get_embeddings([chunk_id for chunk_id, _ in fused])
+        candidates = [(chunk_id, score) for chunk_id, score in fused if chunk_id in vectors]
+        if not candidates:
+            return [], metadata
+        scores = np.array([score for _, score in candidates])
+        picked = maximal_marginal_relevance(
+            scores / scores.max(),
+            np.vstack([vectors[chunk_id] for chunk_id, _ in candidates]),
+            k=settings["max_chunks"],
+            lambda_=settings["mmr_lambda"],
+            redundancy_threshold=settings["redundancy_threshold"]
+        )
+        selected = [candidates[i] for i in picked]
+        metadata["selected"] = len(selected)
+        return selected, metadata
+    
+    def _query_decomposition(
+        self, query: str, debug: bool = False, run: Optional["TechniqueRun"] = None
+    ) -> Optional[Dict[str, Any]]:
         """Query Decomposition: Break complex query into sub-queries"""
         try:
             # Step 1: Decompose query
             decomp_prompt = DECOMPOSITION_PROMPT.format(query=query)
-            decomp_response = self.generate_json(decomp_prompt)
+            decomp_response = self.generate_json(decomp_prompt, run=run)
             
             sub_queries = decomp_response.get("sub_queries", [])
             
@@ -134,28 +284,32 @@ class AdvancedGeneratorAgent(BaseAgent):
             if not sub_queries:
                 return None
             
-            # Step 2: Retrieve for each sub-query
-            all_chunks = []
-            sub_answers = []
+            # Step 2: Retrieve for all sub-queries in one batch
+            rankings = []
+            documents = {}
             n_results = self.config["query_decomposition"]["n_results_per_query"]
+            batch_results = self.vector_store.query_batch(sub_queries, n_results=n_results)
+            
+            def answer_sub_query(i: int, sub_query: str, chunks: List[str]) -> str:
+                context = "\n\n".join(chunks)
+                sub_prompt = BASIC_GENERATOR_PROMPT.format(
+                    context=context,
+                    query=sub_query
+                )
+                sub_answer = self.generate(sub_prompt, run=run)
+                return f"Sub-question {i+1}: {sub_query}\nAnswer: {sub_answer}"
             
-            for i, sub_query in enumerate(sub_queries):
+            # Generate the sub-answers concurrently, kept in sub-query order
+            sub_answer_futures = []
+            for i, (sub_query, results) in enumerate(zip(sub_queries, batch_results)):
                 if debug:
                     print(f"[Advanced/Decomposition] Processing sub-query {i+1}: {sub_query[:50]}...")
                 
-                results = self.vector_store.query(sub_query, n_results=n_results)
                 chunks = results["documents"]
-                all_chunks.extend(chunks)
-                
-                # Generate answer for sub-query
+                rankings.append(self._ranking(results, documents))
                 if chunks:
-                    context = "\n\n".join(chunks)
-                    sub_prompt = BASIC_GENERATOR_PROMPT.format(
-                        context=context,
-                        query=sub_query
-                    )
-                    sub_answer = self.generate(sub_prompt)
-                    sub_answers.append(f"Sub-question {i+1}: {sub_query}\nAnswer: {sub_answer}")
+                    sub_answer_futures.append(self._subquery_executor.submit(answer_sub_query, i, sub_query, chunks))
+            sub_answers = [future.result() for future in sub_answer_futures]
             
             # Step 3: Synthesize final answer
             if sub_answers:
@@ -163,25 +317,30 @@ class AdvancedGeneratorAgent(BaseAgent):
                     query=query,
                     sub_answers="\n\n".join(sub_answers)
                 )
-                final_answer = self.generate(synthesis_prompt)
+                final_answer = self.generate(synthesis_prompt, run=run)
             else:
                 final_answer = "Could not generate answer from decomposed queries."
             
             return {
                 "answer": final_answer,
-                "context_chunks": all_chunks,
+                "rankings": rankings,
+                "documents": documents,
                 "metadata": {
                     "n_sub_queries": len(sub_queries),
                     "sub_queries": sub_queries,
-                    "n_chunks": len(all_chunks)
+                    "n_chunks": sum(len(ranking) for ranking in rankings)
                 }
             }
+        except RunCancelled:
+            return None
         except Exception as e:
             if debug:
                 print(f"[Advanced/Decomposition] Error: {str(e)}")
             return None
     
-    def _hyde_retrieval(self, query: str, debug: bool = False) -> Optional[Dict[str, Any]]:
+    def _hyde_retrieval(
+        self, query: str, debug: bool = False, run: Optional["TechniqueRun"] = None
+    ) -> Optional[Dict[str, Any]]:
         """HyDE: Generate hypothetical answer, then retrieve similar documents"""
         try:
             # Step 1: Generate hypothetical answer
@@ -190,7 +349,7 @@ class AdvancedGeneratorAgent(BaseAgent):
             if debug:
                 print("[Advanced/HyDE] Generating hypothetical answer...")
             
-            hypothetical_answer = self.generate(hyde_prompt)
+            hypothetical_answer = self.generate(hyde_prompt, run=run)
             
             if debug:
                 print(f"[Advanced/HyDE] Generated hypothetical answer ({len(hypothetical_answer)} chars)")
@@ -199,6 +358,8 @@ class AdvancedGeneratorAgent(BaseAgent):
             n_results = self.config["hyde"]["n_results"]
             results = self.vector_store.query(hypothetical_answer, n_results=n_results)
             retrieved_chunks = results["documents"]
+            documents = {}
+            ranking = self._ranking(results, documents)
             
             if debug:
                 print(f"[Advanced/HyDE] Retrieved {len(retrieved_chunks)} chunks based on hypothetical answer")
@@ -210,29 +371,34 @@ class AdvancedGeneratorAgent(BaseAgent):
                     query=query,
                     context=context
                 )
-                answer = self.generate(generation_prompt)
+                answer = self.generate(generation_prompt, run=run)
             else:
                 answer = "Could not find relevant documents using HyDE technique."
             
             return {
                 "answer": answer,
-                "context_chunks": retrieved_chunks,
+                "rankings": [ranking],
+                "documents": documents,
                 "metadata": {
                     "hypothetical_answer": hypothetical_answer[:200],  # Truncate for metadata
                     "n_chunks": len(retrieved_chunks)
                 }
             }
+        except RunCancelled:
+            return None
         except Exception as e:
             if debug:
                 print(f"[Advanced/HyDE] Error: {str(e)}")
             return None
     
-    def _multi_query_retrieval(self, query: str, debug: bool = False) -> Optional[Dict[str, Any]]:
+    def _multi_query_retrieval(
+        self, query: str, debug: bool = False, run: Optional["TechniqueRun"] = None
+    ) -> Optional[Dict[str, Any]]:
         """Multi-Query: Generate query variations and retrieve for each"""
         try:
             # Step 1: Generate query variations
             multi_prompt = MULTI_QUERY_PROMPT.format(query=query)
-            variations_response = self.generate_json(multi_prompt)
+            variations_response = self.generate_json(multi_prompt, run=run)
             
             variations = variations_response.get("variations", [])
             
@@ -248,17 +414,19 @@ class AdvancedGeneratorAgent(BaseAgent):
                     f"Explain {query}"
                 ]
             
-            # Step 2: Retrieve for each variation
+            # Step 2: Retrieve for all variations with one batched encode and query
             all_chunks = []
+            rankings = []
+            documents = {}
             n_results = self.config["multi_query"]["n_results_per_variation"]
             
-            for i, variation in enumerate(variations):
-                if debug:
+            if debug:
+                for i, variation in enumerate(variations):
                     print(f"[Advanced/Multi-Query] Retrieving for variation {i+1}: {variation[:50]}...")
-                
-                results = self.vector_store.query(variation, n_results=n_results)
-                chunks = results["documents"]
-                all_chunks.extend(chunks)
+            
+            for results in self.vector_store.query_batch(variations, n_results=n_results):
+                all_chunks.extend(results["documents"])
+                rankings.append(self._ranking(results, documents))
             
             # Step 3: Generate answer from combined results
             if all_chunks:
@@ -270,19 +438,22 @@ class AdvancedGeneratorAgent(BaseAgent):
                     query=query,
                     context=context
                 )
-                answer = self.generate(generation_prompt)
+                answer = self.generate(generation_prompt, run=run)
             else:
                 answer = "Could not find relevant documents using multi-query technique."
             
             return {
                 "answer": answer,
-                "context_chunks": all_chunks,
+                "rankings": rankings,
+                "documents": documents,
                 "metadata": {
                     "n_variations": len(variations),
                     "variations": variations,
                     "n_chunks": len(all_chunks)
                 }
             }
+        except RunCancelled:
+            return None
         except Exception as e:
             if debug:
                 print(f"[Advanced/Multi-Query] Error: {str(e)}")
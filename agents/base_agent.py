@@ -1,142 +1,82 @@
-"""Base Agent class with Gemini API wrapper"""
+"""Base Agent class over a pluggable LLM backend (Gemini API or local Ollama)"""
 
-import google.generativeai as genai
-from typing import Optional, Dict, Any
-from config import GEMINI_API_KEY, GEMINI_MODEL, AGENT_CONFIG
+import asyncio
+import time
+from typing import Optional, Dict, Any, AsyncIterator, Callable, Iterator, Tuple
+from agents.llm_backends import create_llm_backend
+from config import AGENT_CONFIG
 
 
 class BaseAgent:
-    """Base class for all agents with Gemini API integration"""
+    """Base class for all agents; generation is delegated to an LLM backend"""
     
-    def __init__(self, model_name: str = GEMINI_MODEL, config: Dict[str, Any] = None):
-        """Initialize the agent with Gemini API"""
-        if not GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY not found in environment variables. Please set it in .env file")
-        
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.model_name = model_name
+    def __init__(self, model_name: Optional[str] = None, config: Dict[str, Any] = None, llm=None):
+        """
+        Args:
+            model_name: Model to use (default: the backend's configured model)
+            config: Generation settings (temperature, max_output_tokens, ...)
+            llm: Backend instance to use instead of the one in LLM_CONFIG
+        """
         self.config = config or AGENT_CONFIG.copy()
-        
-        # Try to create model with fallback options
-        try:
-            self.model = genai.GenerativeModel(
-                model_name=model_name,
-                generation_config={
-                    "temperature": self.config.get("temperature", 0.7),
-                    "max_output_tokens": self.config.get("max_output_tokens", 2048),
-                    "top_p": self.config.get("top_p", 0.8),
-                    "top_k": self.config.get("top_k", 40),
-                }
-            )
-        except Exception as e:
-            # Try fallback models (order matters - try newer ones first)
-            fallback_models = [
-                "gemini-2.5-flash",
-                "gemini-2.0-flash",
-                "gemini-flash-latest",
-                "gemini-pro-latest",
-                "gemini-2.5-flash-lite"
-            ]
-            fallback_models = [m for m in fallback_models if m != model_name]
-            
-            for fallback in fallback_models:
-                try:
-                    print(f"⚠️  Model '{model_name}' not available. Trying fallback: {fallback}")
-                    self.model_name = fallback
-                    self.model = genai.GenerativeModel(
-                        model_name=fallback,
-                        generation_config={
-                            "temperature": self.config.get("temperature", 0.7),
-                            "max_output_tokens": self.config.get("max_output_tokens", 2048),
-                            "top_p": self.config.get("top_p", 0.8),
-                            "top_k": self.config.get("top_k", 40),
-                        }
-                    )
-                    print(f"✅ Using model: {fallback}")
-                    break
-                except:
-                    continue
-            else:
-                # If all fallbacks fail, raise original error with helpful message
-                available_models = self._list_available_models()
-                raise ValueError(
-                    f"Model '{model_name}' not found. Available models: {available_models}\n"
-                    f"Original error: {str(e)}"
-                )
+        self.llm = llm or create_llm_backend(model_name=model_name, config=self.config)
     
-    @staticmethod
-    def _list_available_models() -> list:
-        """List available models (for error messages)"""
-        try:
-            models = genai.list_models()
-            available = []
-            for m in models:
-                if 'generateContent' in m.supported_generation_methods:
-                    # Return just the model identifier (after models/)
-                    model_id = m.name.split('/')[-1] if '/' in m.name else m.name
-                    available.append(model_id)
-            return available
-        except:
-            return ["Unable to list models - check API key"]
+    @property
+    def model_name(self) -> str:
+        return self.llm.model_name
     
     def generate(self, prompt: str, **kwargs) -> str:
-        """Generate response from Gemini model"""
-        try:
-            response = self.model.generate_content(prompt, **kwargs)
-            if not response.text:
-                raise Exception("Empty response from model")
-            return response.text.strip()
-        except Exception as e:
-            error_msg = str(e)
-            # Check if it's a model not found error
-            if "not found" in error_msg.lower() or "404" in error_msg:
-                # Try to reinitialize with a fallback model
-                print(f"\n⚠️  Model '{self.model_name}' error. Attempting to switch to fallback model...")
-                fallback_models = [
-                    "gemini-2.5-flash",
-                    "gemini-2.0-flash",
-                    "gemini-flash-latest",
-                    "gemini-pro-latest",
-                    "gemini-2.5-flash-lite"
-                ]
-                for fallback in fallback_models:
-                    if fallback != self.model_name:
-                        try:
-                            self.model_name = fallback
-                            self.model = genai.GenerativeModel(
-                                model_name=fallback,
-                                generation_config={
-                                    "temperature": self.config.get("temperature", 0.7),
-                                    "max_output_tokens": self.config.get("max_output_tokens", 2048),
-                                    "top_p": self.config.get("top_p", 0.8),
-                                    "top_k": self.config.get("top_k", 40),
-                                }
-                            )
-                            print(f"✅ Switched to: {fallback}")
-                            # Retry generation
-                            response = self.model.generate_content(prompt, **kwargs)
-                            if not response.text:
-                                raise Exception("Empty response from model")
-                            return response.text.strip()
-                        except Exception as fallback_error:
-                            # Continue to next fallback
-                            continue
-                
-                # If fallbacks fail, provide helpful error
-                available = self._list_available_models()
-                raise Exception(
-                    f"Model '{self.model_name}' not available.\n"
-                    f"Available models: {available}\n"
-                    f"Please update GEMINI_MODEL in config.py\n"
-                    f"Original error: {error_msg}"
-                )
-            raise Exception(f"Error generating response: {error_msg}")
+        """Generate response from the LLM backend"""
+        return self.llm.generate(prompt, **kwargs)
     
-    def generate_json(self, prompt: str) -> Dict[str, Any]:
+    def generate_stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Yield the response token by token as the backend produces it"""
+        return self.llm.stream(prompt, **kwargs)
+    
+    async def agenerate_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Async version of generate_stream; the blocking reads run in a worker thread"""
+        tokens = self.generate_stream(prompt, **kwargs)
+        done = object()
+        while True:
+            token = await asyncio.to_thread(next, tokens, done)
+            if token is done:
+                return
+            yield token
+    
+    def stream_answer(
+        self,
+        prompt: str,
+        on_token: Optional[Callable[[str], None]] = None,
+        **kwargs
+    ) -> Tuple[str, Dict[str, float]]:
+        """
+        Generate a response through generate_stream, handing each token to a callback
+        
+        Args:
+            prompt: Prompt to complete
+            on_token: Called with each token as it arrives
+            
+        Returns:
+            (full response text, {"first_token_seconds", "total_seconds"})
+        """
+        start = time.perf_counter()
+        first_token = None
+        parts = []
+        for token in self.generate_stream(prompt, **kwargs):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            parts.append(token)
+            if on_token:
+                on_token(token)
+        text = "".join(parts).strip()
+        if not text:
+            raise Exception("Error generating response: Empty response from model")
+        return text, {"first_token_seconds": first_token, "total_seconds": time.perf_counter() - start}
+    
+    def generate_json(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """Generate structured JSON response"""
         # Add JSON format instruction to prompt
         json_prompt = f"{prompt}\n\nRespond only with valid JSON, no additional text."
-        response = self.generate(json_prompt)
+        response = self.generate(json_prompt, **kwargs)
         
         # Try to extract JSON from response
         import json
@@ -156,13 +96,4 @@ class BaseAgent:
     def update_config(self, **kwargs):
         """Update agent configuration"""
         self.config.update(kwargs)
-        self.model = genai.GenerativeModel(
-            model_name=self.model_name,
-            generation_config={
-                "temperature": self.config.get("temperature", 0.7),
-                "max_output_tokens": self.config.get("max_output_tokens", 2048),
-                "top_p": self.config.get("top_p", 0.8),
-                "top_k": self.config.get("top_k", 40),
-            }
-        )
-
+        self.llm.configure(self.config)
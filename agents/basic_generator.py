@@ -4,7 +4,7 @@ from agents.base_agent import BaseAgent
 from vector_store import VectorStore
 from utils.prompt_templates import BASIC_GENERATOR_PROMPT
 from config import BASIC_GENERATOR_CONFIG, AGENT_CONFIG
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable
 
 
 class BasicGeneratorAgent(BaseAgent):
@@ -19,9 +19,10 @@ class BasicGeneratorAgent(BaseAgent):
         self, 
         query: str, 
         n_results: Optional[int] = None,
-        debug: bool = False
+        debug: bool = False,
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
-        """Generate answer for a query using basic RAG"""
+        """Generate answer for a query using basic RAG; answer tokens go to on_token as they arrive"""
         n_results = n_results or self.n_results
         
         if debug:
@@ -58,7 +59,7 @@ class BasicGeneratorAgent(BaseAgent):
             query=query
         )
         
-        answer = self.generate(prompt)
+        answer, generation = self.stream_answer(prompt, on_token=on_token)
         
         if debug:
             print(f"[Basic] Answer generated")
@@ -70,7 +71,8 @@ class BasicGeneratorAgent(BaseAgent):
             "metadata": {
                 "agent": "basic",
                 "n_chunks": len(retrieved_docs),
-                "technique": "simple_retrieval"
+                "technique": "simple_retrieval",
+                "generation": generation
             }
         }
 
@@ -0,0 +1,382 @@
+"""LLM backends: Gemini API or a local Ollama server over pooled keep-alive HTTP"""
+
+import http.client
+import json
+import queue
+import threading
+import urllib.parse
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from config import GEMINI_API_KEY, GEMINI_MODEL, LLM_CONFIG, OLLAMA_CONFIG
+
+BACKENDS = ("gemini", "ollama")
+
+# Tried in order when the configured Gemini model is unavailable (newer ones first)
+GEMINI_FALLBACK_MODELS = [
+    "gemini-2.5-flash",
+    "gemini-2.0-flash",
+    "gemini-flash-latest",
+    "gemini-pro-latest",
+    "gemini-2.5-flash-lite"
+]
+
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def get_genai():
+    """Import and configure google.generativeai once, on first use (the import alone takes ~1s)"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=GEMINI_API_KEY)
+                _genai = genai
+    return _genai
+
+
+class GeminiBackend:
+    """Gemini API model, switching to a fallback model if the configured one is unavailable"""
+
+    name = "gemini"
+
+    def __init__(self, model_name: str = None, config: Dict[str, Any] = None):
+        if not GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY not found in environment variables. Please set it in .env file")
+        self.model_name = model_name or GEMINI_MODEL
+        self.config = config or {}
+
+        try:
+            self.model = self._create_model(self.model_name)
+        except Exception as e:
+            for fallback in [m for m in GEMINI_FALLBACK_MODELS if m != self.model_name]:
+                try:
+                    print(f"⚠️  Model '{self.model_name}' not available. Trying fallback: {fallback}")
+                    self.model = self._create_model(fallback)
+                    self.model_name = fallback
+                    print(f"✅ Using model: {fallback}")
+                    break
+                except Exception:
+                    continue
+            else:
+                # If all fallbacks fail, raise original error with helpful message
+                raise ValueError(
+                    f"Model '{self.model_name}' not found. Available models: {self.list_available_models()}\n"
+                    f"Original error: {str(e)}"
+                )
+
+    def _create_model(self, model_name: str):
+        return get_genai().GenerativeModel(
+            model_name=model_name,
+            generation_config={
+                "temperature": self.config.get("temperature", 0.7),
+                "max_output_tokens": self.config.get("max_output_tokens", 2048),
+                "top_p": self.config.get("top_p", 0.8),
+                "top_k": self.config.get("top_k", 40),
+            }
+        )
+
+    def configure(self, config: Dict[str, Any]):
+        """Apply new generation settings"""
+        self.config = config
+        self.model = self._create_model(self.model_name)
+
+    @staticmethod
+    def list_available_models() -> list:
+        """List available models (for error messages)"""
+        try:
+            available = []
+            for m in get_genai().list_models():
+                if 'generateContent' in m.supported_generation_methods:
+                    # Return just the model identifier (after models/)
+                    available.append(m.name.split('/')[-1] if '/' in m.name else m.name)
+            return available
+        except Exception:
+            return ["Unable to list models - check API key"]
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        try:
+            response = self.model.generate_content(prompt, **kwargs)
+            if not response.text:
+                raise Exception("Empty response from model")
+            return response.text.strip()
+        except Exception as e:
+            error_msg = str(e)
+            if "not found" not in error_msg.lower() and "404" not in error_msg:
+                raise Exception(f"Error generating response: {error_msg}")
+            # Model not found: switch to a fallback model and retry
+            print(f"\n⚠️  Model '{self.model_name}' error. Attempting to switch to fallback model...")
+            for fallback in [m for m in GEMINI_FALLBACK_MODELS if m != self.model_name]:
+                try:
+                    self.model_name = fallback
+                    self.model = self._create_model(fallback)
+                    print(f"✅ Switched to: {fallback}")
+                    response = self.model.generate_content(prompt, **kwargs)
+                    if not response.text:
+                        raise Exception("Empty response from model")
+                    return response.text.strip()
+                except Exception:
+                    continue
+            raise Exception(
+                f"Model '{self.model_name}' not available.\n"
+                f"Available models: {self.list_available_models()}\n"
+                f"Please update GEMINI_MODEL in config.py\n"
+                f"Original error: {error_msg}"
+            )
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Yield the response text chunk by chunk as the API produces it"""
+        started = False
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True, **kwargs):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    continue  # Chunk without text parts (e.g. only finish metadata)
+                if text:
+                    started = True
+                    yield text
+        except Exception as e:
+            if started:
+                raise Exception(f"Error generating response: {str(e)}")
+            # Nothing delivered yet: generate() handles fallback models and errors
+            yield self.generate(prompt, **kwargs)
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP connections to one server, shared by every caller
+
+    Idle connections are reused most-recently-used first, so a burst of
+    calls runs over warm sockets; at most `size` idle connections are kept
+    and concurrent callers beyond that get extra, short-lived ones. A
+    reused connection the server has meanwhile closed is retried once on a
+    fresh one.
+    """
+
+    _RETRYABLE = (http.client.RemoteDisconnected, http.client.CannotSendRequest, ConnectionResetError, BrokenPipeError)
+
+    def __init__(self, base_url: str, size: int = 4, timeout: float = 300):
+        parsed = urllib.parse.urlsplit(base_url)
+        self._connection_class = (
+            http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        )
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=max(1, size))
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "connections_opened": 0, "reused": 0, "retried": 0}
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            with self._lock:
+                self.stats["connections_opened"] += 1
+            return self._connection_class(self.host, self.port, timeout=self.timeout), False
+
+    def _release(self, connection):
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None) -> http.client.HTTPResponse:
+        """
+        Send a request and return its response; the body must be read
+        (fully) before calling `release(response)`, which returns the
+        connection to the pool
+        """
+        for attempt in (0, 1):
+            connection, reused = self._acquire()
+            try:
+                connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+                response = connection.getresponse()
+            except self._RETRYABLE:
+                connection.close()
+                if reused and attempt == 0:
+                    with self._lock:
+                        self.stats["retried"] += 1
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats["reused"] += int(reused)
+            response.pool_connection = connection
+            return response
+
+    def release(self, response: http.client.HTTPResponse):
+        """Return a fully read response's connection to the pool (or close it)"""
+        if response.will_close or not response.isclosed():
+            response.pool_connection.close()
+        else:
+            self._release(response.pool_connection)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(base_url: str, size: int = None, timeout: float = None) -> ConnectionPool:
+    """The process-wide pool for a server, so all agents share its connections"""
+    with _pools_lock:
+        if base_url not in _pools:
+            _pools[base_url] = ConnectionPool(
+                base_url,
+                size=size or OLLAMA_CONFIG["pool_size"],
+                timeout=timeout or OLLAMA_CONFIG["timeout"]
+            )
+        return _pools[base_url]
+
+
+class OllamaBackend:
+    """
+    Model served by a local `ollama serve`, called over its HTTP API
+
+    Calls go over a shared pool of keep-alive connections and pass
+    `keep_alive`, so the model stays loaded in the server between calls:
+    no process is started and no model is reloaded per generation.
+    """
+
+    name = "ollama"
+
+    def __init__(
+        self,
+        model_name: str = None,
+        config: Dict[str, Any] = None,
+        base_url: str = None,
+        keep_alive=None
+    ):
+        self.model_name = model_name or OLLAMA_CONFIG["model"]
+        self.base_url = (base_url or OLLAMA_CONFIG["base_url"]).rstrip("/")
+        self.keep_alive = OLLAMA_CONFIG["keep_alive"] if keep_alive is None else keep_alive
+        self.pool = get_connection_pool(self.base_url)
+        self.configure(config or {})
+
+    def configure(self, config: Dict[str, Any]):
+        """Apply new generation settings (mapped to Ollama's option names)"""
+        self.config = config
+        self.options = {
+            "temperature": config.get("temperature", 0.7),
+            "num_predict": config.get("max_output_tokens", 2048),
+            "top_p": config.get("top_p", 0.8),
+            "top_k": config.get("top_k", 40),
+        }
+
+    def _open(self, path: str, payload: Dict[str, Any]) -> http.client.HTTPResponse:
+        try:
+            return self.pool.request("POST", path, json.dumps(payload).encode("utf-8"))
+        except OSError as e:
+            raise ConnectionError(
+                f"Request to the Ollama server at {self.base_url} failed ({e}); is `ollama serve` running?"
+            ) from e
+
+    @staticmethod
+    def _check(path: str, status: int, body: bytes) -> Dict[str, Any]:
+        data = json.loads(body or b"{}")
+        if status != 200:
+            raise Exception(f"Error generating response: Ollama {path} returned {status}: "
+                            f"{data.get('error', body[:200])}")
+        return data
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        response = self._open(path, payload)
+        try:
+            body = response.read()
+        finally:
+            self.pool.release(response)
+        return self._check(path, response.status, body)
+
+    def _stream(self, path: str, payload: Dict[str, Any], extract: Callable[[Dict[str, Any]], str]) -> Iterator[str]:
+        """Yield the text of each NDJSON chunk of a streaming call"""
+        response = self._open(path, {**payload, "stream": True})
+        try:
+            if response.status != 200:
+                self._check(path, response.status, response.read())
+            for line in response:
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                if "error" in data:
+                    raise Exception(f"Error generating response: {data['error']}")
+                text = extract(data)
+                if text:
+                    yield text
+                if data.get("done"):
+                    break
+            response.read()  # Drain the end of the body so the connection can be reused
+        finally:
+            self.pool.release(response)
+
+    def _payload(self, **fields) -> Dict[str, Any]:
+        options = {**self.options, **fields.pop("options", {})}
+        return {"model": self.model_name, "stream": False, "keep_alive": self.keep_alive, "options": options, **fields}
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        """Completion of a prompt via /api/generate"""
+        text = self._post("/api/generate", self._payload(prompt=prompt, **kwargs)).get("response", "")
+        if not text:
+            raise Exception("Error generating response: Empty response from model")
+        return text.strip()
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Yield the completion of a prompt token by token as the server produces it"""
+        return self._stream("/api/generate", self._payload(prompt=prompt, **kwargs), lambda d: d.get("response", ""))
+
+    def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """Reply to a [{"role", "content"}] conversation via /api/chat"""
+        data = self._post("/api/chat", self._payload(messages=messages, **kwargs))
+        text = data.get("message", {}).get("content", "")
+        if not text:
+            raise Exception("Error generating response: Empty response from model")
+        return text.strip()
+
+    def chat_stream(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        """Yield the reply to a conversation token by token"""
+        return self._stream(
+            "/api/chat", self._payload(messages=messages, **kwargs), lambda d: d.get("message", {}).get("content", "")
+        )
+
+    def load(self):
+        """Load the model into the server now (an empty generate) so the first call does not wait"""
+        self._post("/api/generate", {"model": self.model_name, "keep_alive": self.keep_alive})
+
+    def unload(self):
+        """Ask the server to release the model's memory"""
+        self._post("/api/generate", {"model": self.model_name, "keep_alive": 0})
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Requests and connection reuse of the shared pool"""
+        return dict(self.pool.stats)
+
+
+def create_llm_backend(backend: str = None, model_name: str = None, config: Dict[str, Any] = None):
+    """
+    Build the LLM backend selected in LLM_CONFIG
+
+    Args:
+        backend: "gemini" or "ollama"
+        model_name: Model to use (default GEMINI_MODEL / OLLAMA_CONFIG["model"])
+        config: Generation settings (temperature, max_output_tokens, top_p, top_k)
+
+    Returns:
+        Backend with `model_name`, `generate(prompt) -> str`, `stream(prompt) -> Iterator[str]`
+        and `configure(config)`
+    """
+    backend = backend or LLM_CONFIG["backend"]
+    if backend == "gemini":
+        return GeminiBackend(model_name, config)
+    if backend == "ollama":
+        return OllamaBackend(model_name, config)
+    raise ValueError(f"Unknown LLM backend '{backend}', expected one of {BACKENDS}")
@@ -2,10 +2,16 @@
 
 from agents.base_agent import BaseAgent
 from agents.basic_generator import BasicGeneratorAgent
-from agents.advanced_generator import AdvancedGeneratorAgent
+from agents.advanced_generator import AdvancedGeneratorAgent, TechniqueRun, RunCancelled
 from utils.evaluator import AnswerEvaluator
-from config import ROUTER_CONFIG
-from typing import Dict, Any, Optional
+from utils.answer_cache import SemanticAnswerCache
+from config import ROUTER_CONFIG, SPECULATIVE_ROUTING_CONFIG
+from typing import Dict, Any, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+ADVANCED_TECHNIQUES = ["decomposition", "hyde", "multi_query"]
 
 
 class RouterAgent(BaseAgent):
@@ -14,40 +20,238 @@ class RouterAgent(BaseAgent):
     def __init__(
         self, 
         basic_agent: BasicGeneratorAgent,
-        advanced_agent: AdvancedGeneratorAgent
+        advanced_agent: Optional[AdvancedGeneratorAgent] = None,
+        advanced_agent_factory: Optional[Callable[[], AdvancedGeneratorAgent]] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        speculative: Optional[bool] = None
     ):
+        """
+        Args:
+            basic_agent: Agent tried first for every query
+            advanced_agent: Agent used when the basic answer is insufficient
+            advanced_agent_factory: Builds the advanced agent on first use
+                                    instead (skips its setup at startup)
+            answer_cache: Serves answers of earlier, near-identical queries
+                          without calling the agents
+            speculative: Prepare the advanced context concurrently with the
+                         basic answer and its evaluation, and drop it if the
+                         basic answer suffices (default SPECULATIVE_ROUTING_CONFIG)
+        """
+        if advanced_agent is None and advanced_agent_factory is None:
+            raise ValueError("RouterAgent needs advanced_agent or advanced_agent_factory")
         super().__init__(config=ROUTER_CONFIG)
         self.basic_agent = basic_agent
-        self.advanced_agent = advanced_agent
+        self._advanced_agent = advanced_agent
+        self._advanced_agent_factory = advanced_agent_factory
+        self.answer_cache = answer_cache
         self.evaluator = AnswerEvaluator(self)
+        self.speculative = SPECULATIVE_ROUTING_CONFIG["enabled"] if speculative is None else speculative
+        self._speculation_executor = None
+        self._speculation_lock = threading.Lock()
+        self.speculation_stats = {
+            "started": 0,
+            "used": 0,  # Escalated: the prepared context was used
+            "wasted": 0,  # Basic answer sufficed: the run was cancelled
+            "failed": 0,
+            "used_llm_calls": 0,
+            "wasted_llm_calls": 0,  # LLM calls of cancelled runs (extra cost of speculating)
+            "wait_seconds": 0.0,  # Time escalations still waited for their prepared context
+        }
+    
+    @property
+    def advanced_agent(self) -> AdvancedGeneratorAgent:
+        """The advanced agent, constructed on first access when deferred"""
+        if self._advanced_agent is None:
+            self._advanced_agent = self._advanced_agent_factory()
+        return self._advanced_agent
     
     def route_and_generate(
         self, 
         query: str,
         mode: str = "silent",  # silent, verbose, debug
-        debug: bool = False
+        debug: bool = False,
+        on_token: Optional[Callable[[str], None]] = None,
+        on_answer_end: Optional[Callable[[], None]] = None,
+        on_status: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """
         Route query through agents and generate answer
         
-        Strategy: Always try basic first, use advanced if basic is insufficient
+        Strategy: Serve a cached answer to an equivalent query if there is one,
+        otherwise try basic first and use advanced if basic is insufficient
+        
+        Args:
+            on_token: Called with each answer token as it is generated; an
+                      escalated query streams a second (advanced) answer
+            on_answer_end: Called after each streamed answer is complete
+            on_status: Called with the verbose/debug routing lines instead of
+                       printing them, so a streaming caller can keep them out
+                       of an answer in progress
+        
+        The result's metadata["latency"] has the time to the first answer
+        token and the total time, both measured from the call.
         """
         debug_mode = (debug or mode == "debug")
         verbose_mode = (mode == "verbose" or mode == "debug")
+        start = time.perf_counter()
+        first_token = []
+        status = on_status or print
+        
+        def emit(token: str):
+            if not first_token:
+                first_token.append(time.perf_counter() - start)
+            if on_token:
+                on_token(token)
+        
+        result = self._cached_or_route(query, debug_mode, verbose_mode, emit, on_answer_end, status)
+        result["metadata"] = {
+            **result["metadata"],
+            "latency": {
+                "first_token_seconds": first_token[0] if first_token else None,
+                "total_seconds": time.perf_counter() - start
+            }
+        }
+        return result
+    
+    def _cached_or_route(
+        self,
+        query: str,
+        debug_mode: bool,
+        verbose_mode: bool,
+        emit: Callable[[str], None],
+        on_answer_end: Optional[Callable[[], None]],
+        status: Callable[[str], None]
+    ) -> Dict[str, Any]:
+        if self.answer_cache is None:
+            return self._route(query, debug_mode, verbose_mode, emit, on_answer_end, status)
+        
+        vector_store = self.basic_agent.vector_store
+        embedding = vector_store.embed_text(query)
+        index_version = vector_store.index_version
+        cached = self.answer_cache.lookup(query, embedding, index_version)
+        if cached is not None:
+            if verbose_mode:
+                status(f"[Router] ✓ Answer cache hit (similarity {cached['similarity']:.3f})")
+            result = dict(cached["result"])
+            result["metadata"] = {
+                **result["metadata"],
+                "answer_cache": {
+                    "hit": True,
+                    "similarity": cached["similarity"],
+                    "cached_query": cached["cached_query"]
+                }
+            }
+            emit(result["answer"])
+            if on_answer_end:
+                on_answer_end()
+            return result
+        
+        result = self._route(query, debug_mode, verbose_mode, emit, on_answer_end, status)
+        self.answer_cache.store(query, embedding, index_version, result)
+        return result
+    
+    @staticmethod
+    def _streamed(generate_answer: Callable[..., Dict[str, Any]], emit, on_answer_end, **kwargs) -> Dict[str, Any]:
+        """Run an agent with its answer tokens going to emit (in one piece if it did not stream)"""
+        streamed = []
+        
+        def on_token(token: str):
+            streamed.append(token)
+            emit(token)
         
+        result = generate_answer(on_token=on_token, **kwargs)
+        if not streamed:
+            emit(result["answer"])  # Fixed reply, e.g. when nothing relevant was retrieved
+        if on_answer_end:
+            on_answer_end()
+        return result
+    
+    def _route(
+        self,
+        query: str,
+        debug_mode: bool,
+        verbose_mode: bool,
+        emit: Callable[[str], None],
+        on_answer_end: Optional[Callable[[], None]] = None,
+        status: Callable[[str], None] = print
+    ) -> Dict[str, Any]:
+        """Basic answer, escalated to the advanced agent when insufficient"""
+        if debug_mode:
+            status("[Router] Analyzing query...")
+            status(f"[Router] Routing to Basic Agent first (strategy: try-basic-then-advanced)")
+        
+        speculation = self._start_speculation(query, debug_mode, status) if self.speculative else None
+        try:
+            return self._route_with(query, debug_mode, verbose_mode, emit, on_answer_end, speculation, status)
+        finally:
+            if speculation is not None:
+                self._finish_speculation(speculation)
+    
+    def _start_speculation(self, query: str, debug_mode: bool, status: Callable[[str], None] = print) -> Dict[str, Any]:
+        """Start preparing the advanced context in the background"""
         if debug_mode:
-            print("[Router] Analyzing query...")
-            print(f"[Router] Routing to Basic Agent first (strategy: try-basic-then-advanced)")
+            status("[Router] Speculatively starting advanced retrieval")
+        advanced_agent = self.advanced_agent
+        with self._speculation_lock:
+            if self._speculation_executor is None:
+                # Cancelled runs wind down in the background, so allow one alongside the current run
+                self._speculation_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculation")
+            self.speculation_stats["started"] += 1
+        run = TechniqueRun()
+        future = self._speculation_executor.submit(
+            advanced_agent.prepare_context, query, ADVANCED_TECHNIQUES, debug_mode, run
+        )
+        return {"run": run, "future": future, "used": False}
+    
+    def _finish_speculation(self, speculation: Dict[str, Any]):
+        """Cancel a speculative run that was not used, and record its outcome once it has stopped"""
+        run = speculation["run"]
+        if not speculation["used"]:
+            run.cancel()  # Stops at its next LLM call
         
+        def record(future):
+            error = future.exception()
+            with self._speculation_lock:
+                if speculation["used"]:
+                    self.speculation_stats["used"] += 1
+                    self.speculation_stats["used_llm_calls"] += run.llm_calls
+                elif error is None or isinstance(error, RunCancelled):
+                    self.speculation_stats["wasted"] += 1
+                    self.speculation_stats["wasted_llm_calls"] += run.llm_calls
+                else:
+                    self.speculation_stats["failed"] += 1
+        
+        speculation["future"].add_done_callback(record)
+    
+    def get_speculation_stats(self) -> Dict[str, Any]:
+        """Outcomes of speculative routing, including the share of runs that were wasted"""
+        with self._speculation_lock:
+            stats = dict(self.speculation_stats)
+        finished = stats["used"] + stats["wasted"]
+        stats["waste_rate"] = stats["wasted"] / finished if finished else 0.0
+        return stats
+    
+    def _route_with(
+        self,
+        query: str,
+        debug_mode: bool,
+        verbose_mode: bool,
+        emit: Callable[[str], None],
+        on_answer_end: Optional[Callable[[], None]],
+        speculation: Optional[Dict[str, Any]],
+        status: Callable[[str], None] = print
+    ) -> Dict[str, Any]:
         # Step 1: Try Basic Generator
         if verbose_mode:
-            print("[Router] → Using Basic Generator Agent")
+            status("[Router] → Using Basic Generator Agent")
         
-        basic_result = self.basic_agent.generate_answer(query, debug=debug_mode)
+        basic_result = self._streamed(
+            self.basic_agent.generate_answer, emit, on_answer_end, query=query, debug=debug_mode
+        )
         
         # Step 2: Evaluate basic answer
         if debug_mode:
-            print("[Router] Evaluating basic answer...")
+            status("[Router] Evaluating basic answer...")
         
         evaluation = self.evaluator.evaluate_answer_sufficiency(
             query=query,
@@ -58,15 +262,22 @@ class RouterAgent(BaseAgent):
         is_sufficient = self.evaluator.is_sufficient(evaluation)
         
         if debug_mode:
-            print(f"[Router] Basic answer evaluation:")
-            print(f"  - Sufficient: {is_sufficient}")
-            print(f"  - Completeness: {evaluation.get('completeness_score', 0):.2f}")
-            print(f"  - Confidence: {evaluation.get('confidence_score', 0):.2f}")
+            status(f"[Router] Basic answer evaluation:")
+            status(f"  - Sufficient: {is_sufficient}")
+            status(f"  - Completeness: {evaluation.get('completeness_score', 0):.2f}")
+            status(f"  - Confidence: {evaluation.get('confidence_score', 0):.2f}")
         
         # Step 3: If sufficient, return basic answer
         if is_sufficient:
             if verbose_mode:
-                print("[Router] ✓ Basic answer is sufficient")
+                status("[Router] ✓ Basic answer is sufficient")
+            routing = {
+                "strategy": "basic_only",
+                "evaluation": evaluation
+            }
+            if speculation is not None:
+                speculation["run"].cancel()  # Before anything else, so it makes no further calls
+                routing["speculation"] = {"used": False}
             
             return {
                 "answer": basic_result["answer"],
@@ -74,30 +285,58 @@ class RouterAgent(BaseAgent):
                 "retrieved_chunks": basic_result["retrieved_chunks"],
                 "metadata": {
                     **basic_result["metadata"],
-                    "routing": {
-                        "strategy": "basic_only",
-                        "evaluation": evaluation
-                    }
+                    "routing": routing
                 }
             }
         
         # Step 4: Basic insufficient, use Advanced Generator
         if verbose_mode:
-            print("[Router] ✗ Basic answer insufficient")
-            print("[Router] → Using Advanced Generator Agent")
+            status("[Router] ✗ Basic answer insufficient")
+            status("[Router] → Using Advanced Generator Agent")
         
         if debug_mode:
-            print("[Router] Activating Advanced Agent with all techniques...")
+            status("[Router] Activating Advanced Agent with all techniques...")
         
-        advanced_result = self.advanced_agent.generate_answer(
-            query=query,
-            techniques=["decomposition", "hyde", "multi_query"],
-            debug=debug_mode
-        )
+        speculation_metadata = None
+        prepared = None
+        if speculation is not None:
+            wait_start = time.perf_counter()
+            try:
+                prepared = speculation["future"].result()
+            except Exception as e:
+                if debug_mode:
+                    status(f"[Router] Speculative advanced retrieval failed ({e}); running it again")
+            else:
+                waited = time.perf_counter() - wait_start
+                speculation["used"] = True
+                with self._speculation_lock:
+                    self.speculation_stats["wait_seconds"] += waited
+                speculation_metadata = {
+                    "used": True,
+                    "llm_calls": speculation["run"].llm_calls,
+                    "wait_seconds": waited
+                }
+                if debug_mode:
+                    status(f"[Router] Using speculative advanced context (waited {waited:.2f}s)")
+        
+        if prepared is not None:
+            advanced_result = self._streamed(
+                self.advanced_agent.answer_from_context, emit, on_answer_end,
+                query=query,
+                prepared=prepared,
+                debug=debug_mode
+            )
+        else:
+            advanced_result = self._streamed(
+                self.advanced_agent.generate_answer, emit, on_answer_end,
+                query=query,
+                techniques=ADVANCED_TECHNIQUES,
+                debug=debug_mode
+            )
         
         # Step 5: Evaluate advanced answer
         if debug_mode:
-            print("[Router] Evaluating advanced answer...")
+            status("[Router] Evaluating advanced answer...")
         
         adv_evaluation = self.evaluator.evaluate_answer_sufficiency(
             query=query,
@@ -108,16 +347,16 @@ class RouterAgent(BaseAgent):
         adv_is_sufficient = self.evaluator.is_sufficient(adv_evaluation)
         
         if debug_mode:
-            print(f"[Router] Advanced answer evaluation:")
-            print(f"  - Sufficient: {adv_is_sufficient}")
-            print(f"  - Completeness: {adv_evaluation.get('completeness_score', 0):.2f}")
-            print(f"  - Confidence: {adv_evaluation.get('confidence_score', 0):.2f}")
+            status(f"[Router] Advanced answer evaluation:")
+            status(f"  - Sufficient: {adv_is_sufficient}")
+            status(f"  - Completeness: {adv_evaluation.get('completeness_score', 0):.2f}")
+            status(f"  - Confidence: {adv_evaluation.get('confidence_score', 0):.2f}")
         
         if verbose_mode:
             if adv_is_sufficient:
-                print("[Router] ✓ Advanced answer is sufficient")
+                status("[Router] ✓ Advanced answer is sufficient")
             else:
-                print("[Router] ⚠ Advanced answer may still have limitations")
+                status("[Router] ⚠ Advanced answer may still have limitations")
         
         return {
             "answer": advanced_result["answer"],
@@ -129,7 +368,8 @@ class RouterAgent(BaseAgent):
                     "strategy": "basic_then_advanced",
                     "basic_evaluation": evaluation,
                     "advanced_evaluation": adv_evaluation,
-                    "advanced_used": True
+                    "advanced_used": True,
+                    **({"speculation": speculation_metadata} if speculation_metadata else {})
                 }
             }
         }
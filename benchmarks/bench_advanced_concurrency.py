@@ -0,0 +1,101 @@
+"""Benchmark: advanced-path wall-clock with sequential vs concurrent LLM calls
+
+Runs AdvancedGeneratorAgent.generate_answer against the bundled Ollama stub
+(utils/ollama_stub.py), paced per token so every LLM call takes real time.
+Retrieval is a fixed in-memory corpus so only the LLM calls are measured.
+With max_llm_calls=1 the ~11 calls of decomposition, HyDE and multi-query
+run one after another; with more slots the wall-clock approaches the
+longest chain (decomposition: plan, sub-answers, synthesis, then the final
+answer).
+
+Usage:
+    python benchmarks/bench_advanced_concurrency.py [--limits 1 2 4 8] [--sub-queries 4] [--token-seconds 0.005]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import config
+from utils.ollama_stub import OllamaStubServer
+
+WORDS = 40  # Tokens per generated answer
+
+
+class StaticRetriever:
+    """The retrieval calls the advanced agent makes, answered from a small fixed corpus"""
+
+    def __init__(self, n_chunks: int = 50, dim: int = 32):
+        rng = np.random.default_rng(0)
+        self.ids = [f"chunk_{i}" for i in range(n_chunks)]
+        self.texts = [f"Document chunk {i} about topic {i % 7}." for i in range(n_chunks)]
+        self.vectors = rng.normal(size=(n_chunks, dim)).astype(np.float32)
+
+    def query_batch(self, queries, n_results=3, *args, **kwargs):
+        results = []
+        for query in queries:
+            rows = [hash(query) % len(self.ids)]
+            rows = [(rows[0] + i) % len(self.ids) for i in range(n_results)]
+            results.append({
+                "ids": [self.ids[r] for r in rows],
+                "documents": [self.texts[r] for r in rows],
+                "distances": [0.1 * (i + 1) for i in range(n_results)],
+            })
+        return results
+
+    def query(self, query, n_results=3, *args, **kwargs):
+        return self.query_batch([query], n_results)[0]
+
+    def get_embeddings(self, ids):
+        return {chunk_id: self.vectors[self.ids.index(chunk_id)] for chunk_id in ids}
+
+
+def make_reply(n_sub_queries: int):
+    def reply(prompt: str) -> str:
+        if '"sub_queries"' in prompt:
+            return json.dumps({"sub_queries": [f"aspect {i} of the question" for i in range(n_sub_queries)]})
+        if '"variations"' in prompt:
+            return json.dumps({"variations": [f"rephrasing {i}" for i in range(4)]})
+        return " ".join(["word"] * WORDS)
+    return reply
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limits", type=int, nargs="+", default=[1, 2, 4, 8], help="max_llm_calls values")
+    parser.add_argument("--sub-queries", type=int, default=4)
+    parser.add_argument("--token-seconds", type=float, default=0.005)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    stub = OllamaStubServer(reply=make_reply(args.sub_queries), token_seconds=args.token_seconds).start()
+    config.LLM_CONFIG["backend"] = "ollama"
+    config.OLLAMA_CONFIG["base_url"] = stub.url
+    from agents.advanced_generator import AdvancedGeneratorAgent
+
+    retriever = StaticRetriever()
+    call_seconds = WORDS * args.token_seconds
+    print(f"Advanced path, {args.sub_queries} sub-queries, ~{call_seconds * 1000:.0f} ms per answer-sized LLM call")
+    print(f"  {'max_llm_calls':>13} {'seconds':>8} {'LLM calls':>10}")
+    for limit in args.limits:
+        config.ADVANCED_GENERATOR_CONFIG["concurrency"]["max_llm_calls"] = limit
+        agent = AdvancedGeneratorAgent(retriever)
+        agent.generate_answer("warm-up question")
+        requests_before = stub.stats["requests"]
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            agent.generate_answer("How do the parts of the system interact?")
+        seconds = (time.perf_counter() - start) / args.runs
+        calls = (stub.stats["requests"] - requests_before) // args.runs
+        print(f"  {limit:>13} {seconds:8.3f} {calls:>10}")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
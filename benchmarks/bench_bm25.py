@@ -0,0 +1,63 @@
+"""Benchmark: BM25 index build and query latency on a synthetic corpus
+
+Chunks draw words from a Zipf-distributed vocabulary and each carries one
+unique identifier, so both natural-language-like and identifier queries
+can be timed.
+
+Usage:
+    python benchmarks/bench_bm25.py [--chunks 100000] [--words 100] [--queries 500]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes.bm25 import BM25Index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--words", type=int, default=100, help="Words per chunk")
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vocabulary = np.array([f"w{i}" for i in range(args.vocabulary)])
+    ids = [f"chunk_{i}" for i in range(args.chunks)]
+    documents = []
+    for i in range(args.chunks):
+        words = vocabulary[np.minimum(rng.zipf(1.2, args.words), args.vocabulary) - 1]
+        documents.append(f"ticket-{i:07d} " + " ".join(words))
+
+    index = BM25Index()
+    start = time.perf_counter()
+    for batch in range(0, args.chunks, 5000):
+        index.add(ids[batch:batch + 5000], documents[batch:batch + 5000])
+    build_seconds = time.perf_counter() - start
+    stats = index.get_stats()
+
+    picks = rng.integers(0, args.chunks, args.queries)
+    workloads = {
+        "identifier": [f"ticket-{i:07d}" for i in picks],
+        "5 words": [" ".join(documents[i].split()[1:6]) for i in picks],
+    }
+    print(f"{args.chunks} chunks, {stats['terms']} terms, built in {build_seconds:.1f}s")
+    print(f"  {'queries':<12} {'ms/query':>9} {'top-1 hit':>10}")
+    for name, queries in workloads.items():
+        start = time.perf_counter()
+        found, _ = index.search(queries, args.k)
+        ms_per_query = 1000 * (time.perf_counter() - start) / len(queries)
+        hit_rate = np.mean([bool(row) and row[0] == ids[i] for row, i in zip(found, picks)])
+        print(f"  {name:<12} {ms_per_query:9.2f} {hit_rate:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark: cold start and per-worker memory when serving an index bundle
+
+A persisted NumpyCollection is exported as a bundle, then both are opened
+from disk and timed, and several worker processes serve queries from the
+same bundle. Each worker reports its proportional set size (PSS, Linux
+only): memory-mapped bundle pages are shared between the workers, so PSS
+stays well below what a private copy of the vectors would cost.
+
+Usage:
+    python benchmarks/bench_bundle.py [--vectors 200000] [--dim 384] [--workers 4]
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes.numpy_collection import NumpyCollection
+from indexes.bundle import BundleCollection, write_bundle
+
+
+def pss_mb() -> float:
+    """Proportional set size of this process in MB (nan where unavailable)"""
+    try:
+        with open("/proc/self/smaps_rollup", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def worker(path: str, queries: np.ndarray, k: int, loaded, ready, results):
+    collection = BundleCollection(path, verify=False)
+    start = time.perf_counter()
+    for query in queries:
+        collection.query(query_embeddings=[query], n_results=k)
+    query_ms = (time.perf_counter() - start) / len(queries) * 1000
+    loaded.put(None)
+    ready.wait()  # Measure while every worker has the bundle mapped
+    results.put((pss_mb(), query_ms))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.vectors, args.dim)).astype(np.float32)
+    queries = vectors[rng.integers(0, args.vectors, args.queries)]
+    root = tempfile.mkdtemp(prefix="bench_bundle_")
+    try:
+        source = NumpyCollection("bench", os.path.join(root, "numpy"))
+        for batch in range(0, args.vectors, 5000):
+            source.add(
+                ids=[f"doc_{i}" for i in range(batch, min(batch + 5000, args.vectors))],
+                embeddings=vectors[batch:batch + 5000],
+                documents=[f"chunk {i}" for i in range(batch, min(batch + 5000, args.vectors))],
+                metadatas=[{"source": f"file_{i % 50}.txt"} for i in range(batch, min(batch + 5000, args.vectors))]
+            )
+        del source
+
+        start = time.perf_counter()
+        manifest = write_bundle(NumpyCollection("bench", os.path.join(root, "numpy")), os.path.join(root, "bundle"))
+        export_seconds = time.perf_counter() - start
+        size_mb = sum(entry["bytes"] for entry in manifest["files"].values()) / 1e6
+        vectors_mb = args.vectors * args.dim * 4 / 1e6
+
+        start = time.perf_counter()
+        NumpyCollection("bench", os.path.join(root, "numpy"))
+        numpy_open = time.perf_counter() - start
+        start = time.perf_counter()
+        BundleCollection(os.path.join(root, "bundle"))
+        verified_open = time.perf_counter() - start
+        start = time.perf_counter()
+        BundleCollection(os.path.join(root, "bundle"), verify=False)
+        bundle_open = time.perf_counter() - start
+
+        print(f"{args.vectors} x {args.dim} vectors ({vectors_mb:.0f} MB float32), bundle {size_mb:.0f} MB, "
+              f"exported in {export_seconds:.2f}s")
+        print(f"  open persisted numpy collection: {numpy_open * 1000:8.1f} ms")
+        print(f"  open bundle (checksums):         {verified_open * 1000:8.1f} ms")
+        print(f"  open bundle (no checksums):      {bundle_open * 1000:8.1f} ms")
+
+        context = multiprocessing.get_context("spawn")
+        loaded, ready, results = context.Queue(), context.Event(), context.Queue()
+        processes = [
+            context.Process(
+                target=worker, args=(os.path.join(root, "bundle"), queries, args.k, loaded, ready, results)
+            )
+            for _ in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            loaded.get()
+        ready.set()
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        print(f"  {args.workers} workers serving the same bundle:")
+        for i, (pss, query_ms) in enumerate(reports):
+            print(f"    worker {i}: PSS {pss:7.1f} MB, {query_ms:6.2f} ms/query")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
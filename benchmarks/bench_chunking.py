@@ -0,0 +1,94 @@
+"""Benchmark: split/join chunk_text vs offset-based word and token chunking
+
+Usage:
+    python benchmarks/bench_chunking.py [--words 2000000] [--repeat 3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocess import chunk_text, word_chunk_spans, token_chunk_spans, get_tokenizer
+from config import CHUNK_CONFIG
+
+
+def make_text(n_words: int, seed: int = 0) -> str:
+    """Cleaned-looking text with a realistic mix of short, long and rare words"""
+    rng = random.Random(seed)
+    vocabulary = [
+        "the", "model", "patient", "retrieval", "of", "and", "to", "in", "data",
+        "neural", "network", "financial", "risk", "education", "learning",
+        "hyperparameterization", "electroencephalography", "AI-driven", "2024-Q3",
+        "ID-7f3a9c", "e.g.,", "(see", "section)", "x-ray", "diagnostics",
+    ]
+    return ' '.join(rng.choice(vocabulary) for _ in range(n_words))
+
+
+def measure(label: str, fn, repeat: int):
+    """Run fn `repeat` times and report best wall time and peak traced memory"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"  {label:<28} {best * 1000:9.1f} ms  {len(result):8d} chunks  peak {peak / 1e6:8.1f} MB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=2_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text = make_text(args.words)
+    max_words, overlap_words = CHUNK_CONFIG["max_words"], CHUNK_CONFIG["overlap_words"]
+    max_tokens, overlap_tokens = CHUNK_CONFIG["max_tokens"], CHUNK_CONFIG["overlap_tokens"]
+
+    print(f"Input: {args.words:,} words, {len(text) / 1e6:.1f} MB")
+    measure("legacy split/join", lambda: chunk_text(text, max_words, overlap_words), args.repeat)
+    measure("word spans (offsets)", lambda: word_chunk_spans(text, max_words, overlap_words), args.repeat)
+    measure(
+        "word spans + slices",
+        lambda: [text[s:e] for s, e in word_chunk_spans(text, max_words, overlap_words)],
+        args.repeat
+    )
+
+    try:
+        tokenizer = get_tokenizer()
+    except Exception as e:
+        print(f"  token spans: skipped (tokenizer unavailable: {e})")
+        return
+
+    spans = measure(
+        "token spans (offsets)",
+        lambda: token_chunk_spans(text, max_tokens, overlap_tokens, tokenizer=tokenizer),
+        args.repeat
+    )
+
+    # How much of the legacy chunks the embedding model never sees
+    limit = 256 - 2  # [CLS] and [SEP]
+    sample = chunk_text(text, max_words, overlap_words)[:2000]
+    lengths = [len(ids) for ids in tokenizer(sample, add_special_tokens=False, verbose=False)["input_ids"]]
+    truncated = sum(1 for n in lengths if n > limit)
+    print(f"\nLegacy chunks over {limit} tokens: {truncated}/{len(lengths)} "
+          f"(max {max(lengths)} tokens)")
+    token_sample = [text[s:e] for s, e in spans[:2000]]
+    token_lengths = [len(ids) for ids in tokenizer(token_sample, add_special_tokens=False, verbose=False)["input_ids"]]
+    print(f"Token chunks max length: {max(token_lengths)} tokens (window {max_tokens})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark: torch vs ONNX vs int8 ONNX embedding backends (parity and throughput)
+
+Parity is the cosine between each backend's vectors and the torch vectors of
+the same texts, plus how many of each text's top-k torch neighbours survive.
+
+Usage:
+    python benchmarks/bench_embedding_backends.py [--texts 1000] [--model all-MiniLM-L6-v2]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import VECTOR_STORE_CONFIG
+from embeddings import BACKENDS, create_embedding_backend
+from preprocess import list_document_paths, process_file
+
+
+def load_texts(doc_folder: str, n_texts: int):
+    """Chunks from the docs folder, repeated up to n_texts"""
+    texts = [chunk["text"] for path in list_document_paths(doc_folder) for chunk in process_file(path)]
+    if not texts:
+        raise SystemExit(f"No chunks found in '{doc_folder}'")
+    return (texts * (n_texts // len(texts) + 1))[:n_texts]
+
+
+def top_k(vectors: np.ndarray, k: int) -> np.ndarray:
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    similarities = normed @ normed.T
+    np.fill_diagonal(similarities, -np.inf)
+    return np.argsort(-similarities, axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=VECTOR_STORE_CONFIG["embedding_model"])
+    parser.add_argument("--docs", default="docs")
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = load_texts(args.docs, args.texts)
+    unique = list(dict.fromkeys(texts))
+    print(f"Model: {args.model}  texts: {len(texts)} ({len(unique)} unique)")
+    print(f"  {'backend':<10} {'load s':>7} {'texts/s':>9} {'mean cos':>9} {'min cos':>9} {f'top-{args.k}':>7}")
+
+    reference = reference_neighbours = None
+    for name in BACKENDS:
+        start = time.perf_counter()
+        backend = create_embedding_backend(name, args.model)
+        load_seconds = time.perf_counter() - start
+        backend.encode(texts[:8])  # Warm-up
+
+        start = time.perf_counter()
+        backend.encode(texts)
+        throughput = len(texts) / (time.perf_counter() - start)
+
+        vectors = backend.encode(unique)
+        vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        neighbours = top_k(vectors, args.k)
+        if reference is None:
+            reference, reference_neighbours = vectors, neighbours
+        cosines = np.sum(vectors * reference, axis=1)
+        overlap = np.mean([
+            len(set(a) & set(b)) / args.k for a, b in zip(neighbours, reference_neighbours)
+        ])
+        print(
+            f"  {name:<10} {load_seconds:7.1f} {throughput:9.0f} "
+            f"{cosines.mean():9.5f} {cosines.min():9.5f} {overlap:7.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark: IVF-PQ vs exact numpy search as the corpus grows
+
+For each corpus size the IVF-PQ collection is trained (nprobe tuned to the
+configured recall target) and single-query latency and recall@10 are
+compared with exact brute-force search over the same vectors.
+
+Usage:
+    python benchmarks/bench_ivfpq.py [--sizes 50000 100000 200000] [--dim 384] [--queries 200]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes.ivfpq import IVFPQCollection
+from indexes.numpy_collection import NumpyCollection
+
+
+def make_vectors(n: int, dim: int, n_clusters: int = 2000, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 50000):
+        size = min(50000, n - start)
+        vectors[start:start + size] = centers[rng.integers(0, n_clusters, size)] + 0.7 * rng.normal(size=(size, dim))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def per_query_ms(collection, queries: np.ndarray, k: int) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        collection.query(query[None, :], k, include=[])
+    return 1000 * (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50000, 100000, 200000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = make_vectors(max(args.sizes), args.dim)
+    rng = np.random.default_rng(1)
+
+    print(f"{args.dim}-dim vectors, {args.queries} single queries, recall@{args.k}")
+    print(f"  {'vectors':>8} {'train s':>8} {'nlist':>6} {'nprobe':>6} {'exact ms':>9} {'ivfpq ms':>9} {'recall':>7}")
+    for size in args.sizes:
+        queries = vectors[rng.integers(0, size, args.queries)] + rng.normal(scale=0.05, size=(args.queries, args.dim))
+        queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+        ids = [str(i) for i in range(size)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            exact = NumpyCollection("exact", os.path.join(tmp, "exact"))
+            ivfpq = IVFPQCollection("ivfpq", os.path.join(tmp, "ivfpq"), min_train_size=size)
+            exact.add(ids, vectors[:size])
+            start = time.perf_counter()
+            ivfpq.add(ids, vectors[:size])  # Reaching min_train_size starts training and nprobe tuning
+            ivfpq.wait_for_training()
+            train_seconds = time.perf_counter() - start
+
+            stats = ivfpq.get_index_stats()
+            exact_ms = per_query_ms(exact, queries, args.k)
+            ivfpq_ms = per_query_ms(ivfpq, queries, args.k)
+            recall = ivfpq.recall(queries, args.k)
+            print(
+                f"  {size:8d} {train_seconds:8.1f} {stats['nlist']:6d} {stats['nprobe']:6d} "
+                f"{exact_ms:9.2f} {ivfpq_ms:9.2f} {recall:7.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark: peak memory of streaming vs in-memory preprocessing of one large file
+
+Usage:
+    python benchmarks/bench_large_file.py [--mb 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from preprocess import process_file, iter_file_chunks
+
+
+def write_file(path: str, megabytes: int, seed: int = 0):
+    """Write an HTML-sprinkled log-like file of roughly the requested size"""
+    rng = random.Random(seed)
+    words = ["request", "served", "in", "12ms", "user", "<b>", "</b>", "error", "retrying",
+             "<div class='row'>", "</div>", "cache", "miss", "\n", "\t", "ok"]
+    line = ' '.join(rng.choice(words) for _ in range(2000)) + "\n"
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(megabytes * 1024 * 1024 // len(line) + 1):
+            f.write(line)
+
+
+def measure(label: str, fn):
+    """Time fn untraced, then run it again under tracemalloc for peak memory"""
+    start = time.perf_counter()
+    n_chunks = fn()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<12} {elapsed:8.1f} s  {n_chunks:9d} chunks  peak {peak / 1e6:9.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=int, default=200)
+    args = parser.parse_args()
+
+    # Word windows keep the benchmark independent of tokenizer downloads
+    config.CHUNK_CONFIG["strategy"] = "words"
+    window_bytes = config.INGEST_CONFIG["stream_window_bytes"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "large.txt")
+        write_file(path, args.mb)
+        print(f"Input: {os.path.getsize(path) / 1e6:.0f} MB")
+        measure("streaming", lambda: sum(1 for _ in iter_file_chunks(path, window_bytes=window_bytes)))
+        measure("in-memory", lambda: len(process_file(path)))
+
+
+if __name__ == "__main__":
+    main()
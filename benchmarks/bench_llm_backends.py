@@ -0,0 +1,88 @@
+"""Benchmark: per-call overhead of ways to reach an Ollama server
+
+Runs against the bundled stub server (utils/ollama_stub.py, with a
+simulated model load) unless --url points at a real `ollama serve`:
+
+  process      a new client process per call (what `ollama run` costs)
+  unloaded     a new connection per call and keep_alive=0, so the model
+               is reloaded every time
+  connection   a new connection per call, model kept resident
+  pooled       OllamaBackend: pooled keep-alive connections, model resident
+
+Usage:
+    python benchmarks/bench_llm_backends.py [--calls 50] [--load-seconds 0.5] [--url http://localhost:11434]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.llm_backends import OllamaBackend
+from utils.ollama_stub import OllamaStubServer
+
+_CLIENT = """
+import json, sys, urllib.request
+request = urllib.request.Request(sys.argv[1] + "/api/generate", data=sys.argv[2].encode(),
+                                 headers={"Content-Type": "application/json"})
+print(json.loads(urllib.request.urlopen(request).read())["response"])
+"""
+
+
+def post_once(url: str, payload: dict) -> str:
+    """One request on a fresh connection"""
+    request = urllib.request.Request(
+        f"{url}/api/generate", data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())["response"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--load-seconds", type=float, default=0.5, help="Simulated model load (stub only)")
+    parser.add_argument("--url", default=None, help="Real Ollama server to use instead of the stub")
+    parser.add_argument("--model", default="llama3.1")
+    args = parser.parse_args()
+
+    stub = None if args.url else OllamaStubServer(load_seconds=args.load_seconds).start()
+    url = args.url or stub.url
+    options = {"num_predict": 1}  # Measure the call, not the generation
+    payload = {"model": args.model, "prompt": "Say OK.", "stream": False, "options": options}
+
+    backend = OllamaBackend(args.model, base_url=url, keep_alive="10m")
+    backend.load()
+
+    modes = {
+        "process": lambda: subprocess.run(
+            [sys.executable, "-c", _CLIENT, url, json.dumps({**payload, "keep_alive": "10m"})],
+            check=True, capture_output=True
+        ),
+        "unloaded": lambda: post_once(url, {**payload, "keep_alive": 0}),
+        "connection": lambda: post_once(url, {**payload, "keep_alive": "10m"}),
+        "pooled": lambda: backend.generate("Say OK.", options=options),
+    }
+    print(f"{args.calls} calls against {'Ollama at ' + url if args.url else f'the stub ({args.load_seconds}s model load)'}")
+    print(f"  {'mode':>10} {'ms/call':>9}")
+    for mode, call in modes.items():
+        calls = max(1, args.calls // 10) if mode == "unloaded" else args.calls
+        call()  # Warm-up
+        start = time.perf_counter()
+        for _ in range(calls):
+            call()
+        print(f"  {mode:>10} {(time.perf_counter() - start) / calls * 1000:9.2f}")
+        if mode == "unloaded":
+            backend.load()
+    print(f"  pool: {backend.get_stats()}")
+    if stub is not None:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
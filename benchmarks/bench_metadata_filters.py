@@ -0,0 +1,77 @@
+"""Benchmark: filtered query latency by filter selectivity (numpy backend)
+
+Chunks carry `source`, `document_type` and `chunk_index` metadata like
+ingested ones. Each filter is timed for single queries; pass --chroma to
+time the same filters against an in-memory Chroma collection.
+
+Usage:
+    python benchmarks/bench_metadata_filters.py [--vectors 200000] [--dim 384] [--queries 100] [--chroma]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes.numpy_collection import NumpyCollection
+
+FILTERS = {
+    "none": None,
+    "source (0.1%)": {"source": "file_7.txt"},
+    "type (25%)": {"document_type": "finance"},
+    "$in 3 sources": {"source": {"$in": ["file_1.txt", "file_2.txt", "file_3.txt"]}},
+    "chunk_index < 5": {"chunk_index": {"$lt": 5}},
+    "type & range": {"$and": [{"document_type": "finance"}, {"chunk_index": {"$gte": 100}}]},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chroma", action="store_true", help="Also time an in-memory Chroma collection")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.vectors, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.integers(0, args.vectors, args.queries)]
+    ids = [f"doc_{i}" for i in range(args.vectors)]
+    types = ["finance", "healthcare", "education", "general"]
+    n_sources = max(1, args.vectors // 200)
+    metadatas = [
+        {"source": f"file_{i % n_sources}.txt", "document_type": types[(i % n_sources) % 4], "chunk_index": i // n_sources}
+        for i in range(args.vectors)
+    ]
+
+    collections = {"numpy": NumpyCollection("bench_filters")}
+    if args.chroma:
+        import chromadb
+        from chromadb.config import Settings
+        collections["chroma"] = chromadb.Client(Settings(anonymized_telemetry=False)).get_or_create_collection("bench_filters")
+    for collection in collections.values():
+        for start in range(0, args.vectors, 5000):
+            batch = slice(start, start + 5000)
+            collection.add(ids=ids[batch], embeddings=vectors[batch], metadatas=metadatas[batch])
+
+    print(f"{args.vectors} x {args.dim} vectors, {args.queries} single queries, k={args.k}  (ms per query)")
+    print(f"  {'filter':<18} {'matches':>8} " + " ".join(f"{name:>8}" for name in collections))
+    for label, where in FILTERS.items():
+        matches = len(collections["numpy"].get(where=where, include=[])["ids"]) if where else args.vectors
+        timings = []
+        for collection in collections.values():
+            start = time.perf_counter()
+            for query in queries:
+                collection.query(query_embeddings=query[None, :], n_results=args.k, where=where)
+            timings.append(1000 * (time.perf_counter() - start) / args.queries)
+        print(f"  {label:<18} {matches:8d} " + " ".join(f"{ms:8.2f}" for ms in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark: recall and memory of the int8 / float16 "quantized" backend vs float32 search
+
+Vectors are synthetic, clustered and unit-normalized like sentence embeddings.
+Resident bytes count what the collection keeps in RAM per vector; the
+float32 rows stay memory-mapped on disk for rescoring.
+
+Usage:
+    python benchmarks/bench_quantized_index.py [--vectors 100000] [--dim 384] [--queries 200]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes.numpy_collection import NumpyCollection
+from indexes.quantized import QuantizedCollection
+
+
+def make_vectors(n: int, dim: int, n_clusters: int = 500, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    vectors = centers[rng.integers(0, n_clusters, n)] + 0.6 * rng.normal(size=(n, dim))
+    vectors = vectors.astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, args.vectors, args.queries)] + 0.05 * rng.normal(size=(args.queries, args.dim))
+    queries = queries.astype(np.float32)
+    ids = [str(i) for i in range(args.vectors)]
+
+    print(f"{args.vectors} x {args.dim} vectors, {args.queries} queries, recall@{args.k}")
+    print(f"  {'storage':<18} {'bytes/vec':>9} {'ms/query':>9} {'recall':>7}")
+    print(f"  {'float32 (exact)':<18} {args.dim * 4:9d} {'':>9} {1.0:7.3f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype in ("int8", "float16"):
+            collection = QuantizedCollection(dtype, os.path.join(tmp, dtype), dtype=dtype,
+                                             rescore_factor=args.rescore_factor)
+            for start in range(0, args.vectors, 10000):
+                collection.add(ids[start:start + 10000], vectors[start:start + 10000])
+            expected = NumpyCollection.query(collection, queries, args.k, include=[])["ids"]
+            bytes_per_vector = collection.get_index_stats()["resident_bytes_per_vector"]
+
+            for rescore in (False, True):
+                start = time.perf_counter()
+                found = collection.query(queries, args.k, include=[], rescore=rescore)["ids"]
+                ms_per_query = 1000 * (time.perf_counter() - start) / args.queries
+                recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, expected)])
+                label = f"{dtype}{' + rescore' if rescore else ''}"
+                print(f"  {label:<18} {bytes_per_vector:9d} {ms_per_query:9.2f} {recall:7.3f}")
+
+
+if __name__ == "__main__":
+    main()
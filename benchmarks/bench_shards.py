@@ -0,0 +1,69 @@
+"""Benchmark: ingest and query latency of sharded collections
+
+The same synthetic unit vectors are written to 1..N hash-partitioned shard
+collections (written and queried concurrently by ShardedCollection) and
+timed for batched ingest and single queries.
+
+Usage:
+    python benchmarks/bench_shards.py [--vectors 200000] [--dim 384] [--shards 1 2 4] [--backend numpy]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes.numpy_collection import NumpyCollection
+from indexes.sharded import ShardedCollection
+
+
+def make_collection(backend: str, name: str):
+    if backend == "numpy":
+        return NumpyCollection(name)
+    import chromadb
+    from chromadb.config import Settings
+    return chromadb.Client(Settings(anonymized_telemetry=False)).get_or_create_collection(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--backend", choices=["numpy", "chroma"], default="numpy")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.vectors, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.integers(0, args.vectors, args.queries)]
+    ids = [f"doc_{i}" for i in range(args.vectors)]
+    metadatas = [{"source": f"file_{i % 50}.txt"} for i in range(args.vectors)]
+
+    print(f"{args.vectors} x {args.dim} vectors ({args.backend}), {args.queries} single queries, k={args.k}")
+    print(f"  {'shards':>6} {'ingest s':>9} {'query ms':>9}")
+    for n_shards in args.shards:
+        shards = [make_collection(args.backend, f"bench_shards_{n_shards}_{i}") for i in range(n_shards)]
+        collection = ShardedCollection(shards) if n_shards > 1 else shards[0]
+
+        start = time.perf_counter()
+        for batch in range(0, args.vectors, 5000):
+            collection.add(ids=ids[batch:batch + 5000], embeddings=vectors[batch:batch + 5000],
+                           metadatas=metadatas[batch:batch + 5000])
+        ingest_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for query in queries:
+            collection.query(query_embeddings=query[None, :], n_results=args.k)
+        query_ms = 1000 * (time.perf_counter() - start) / args.queries
+        print(f"  {n_shards:6d} {ingest_seconds:9.2f} {query_ms:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark: serial vs speculative routing at different escalation rates
+
+Routes a mix of queries through RouterAgent against the bundled Ollama stub
+(utils/ollama_stub.py, paced per token), with the evaluator escalating a
+given fraction of them. Speculative routing starts the advanced retrieval
+alongside the basic answer: escalated queries get faster, and queries the
+basic answer settles pay for the cancelled run's LLM calls. Retrieval is
+the fixed in-memory corpus of bench_advanced_concurrency.py.
+
+Usage:
+    python benchmarks/bench_speculative_routing.py [--queries 10] [--escalation-rates 0 0.3 0.7 1] [--token-seconds 0.005]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from utils.ollama_stub import OllamaStubServer
+from bench_advanced_concurrency import StaticRetriever, make_reply
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--escalation-rates", type=float, nargs="+", default=[0.0, 0.3, 0.7, 1.0])
+    parser.add_argument("--token-seconds", type=float, default=0.005)
+    args = parser.parse_args()
+
+    technique_reply = make_reply(4)
+
+    def reply(prompt: str) -> str:
+        if '"completeness_score"' in prompt:  # Answer evaluation
+            sufficient = "[escalate]" not in prompt
+            return json.dumps({"sufficient": sufficient, "completeness_score": 0.9, "confidence_score": 0.9})
+        return technique_reply(prompt)
+
+    stub = OllamaStubServer(reply=reply, token_seconds=args.token_seconds).start()
+    config.LLM_CONFIG["backend"] = "ollama"
+    config.OLLAMA_CONFIG["base_url"] = stub.url
+    from agents.basic_generator import BasicGeneratorAgent
+    from agents.advanced_generator import AdvancedGeneratorAgent
+    from agents.router_agent import RouterAgent
+
+    retriever = StaticRetriever()
+    print(f"{args.queries} queries per run")
+    print(f"  {'escalated':>9} {'mode':>11} {'s/query':>8} {'LLM calls':>10} {'wasted runs':>12}")
+    for rate in args.escalation_rates:
+        escalated = round(rate * args.queries)
+        queries = [f"question {i}" + (" [escalate]" if i < escalated else "") for i in range(args.queries)]
+        for speculative in (False, True):
+            router = RouterAgent(
+                BasicGeneratorAgent(retriever), advanced_agent=AdvancedGeneratorAgent(retriever), speculative=speculative
+            )
+            requests_before = stub.stats["requests"]
+            start = time.perf_counter()
+            for query in queries:
+                router.route_and_generate(query)
+            seconds = (time.perf_counter() - start) / len(queries)
+            time.sleep(0.5)  # Let cancelled runs finish their in-flight calls before counting
+            stats = router.get_speculation_stats()
+            print(f"  {escalated:>9} {'speculative' if speculative else 'serial':>11} {seconds:8.3f} "
+                  f"{stub.stats['requests'] - requests_before:>10} {stats['wasted']:>12}")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark: time until the user sees an answer, blocking vs streamed generation
+
+Runs against the bundled stub server (utils/ollama_stub.py, generating at a
+configurable pace) unless --url points at a real `ollama serve`. A blocking
+generate() shows nothing until the whole answer is done; streaming shows the
+first token after roughly one token's generation time.
+
+Usage:
+    python benchmarks/bench_streaming.py [--calls 5] [--token-seconds 0.02] [--url http://localhost:11434]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.base_agent import BaseAgent
+from agents.llm_backends import OllamaBackend
+from utils.ollama_stub import OllamaStubServer
+
+PROMPT = "Explain in a few sentences why streaming a long answer improves perceived latency. " * 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--token-seconds", type=float, default=0.02, help="Generation pace per token (stub only)")
+    parser.add_argument("--url", default=None, help="Real Ollama server to use instead of the stub")
+    parser.add_argument("--model", default="llama3.1")
+    args = parser.parse_args()
+
+    stub = None if args.url else OllamaStubServer(token_seconds=args.token_seconds).start()
+    url = args.url or stub.url
+    agent = BaseAgent(llm=OllamaBackend(args.model, {"max_output_tokens": 256}, base_url=url, keep_alive="10m"))
+    agent.llm.load()
+    agent.generate(PROMPT)  # Warm-up
+
+    blocking = []
+    for _ in range(args.calls):
+        start = time.perf_counter()
+        agent.generate(PROMPT)
+        blocking.append(time.perf_counter() - start)
+    streamed = [agent.stream_answer(PROMPT)[1] for _ in range(args.calls)]
+
+    def ms(values):
+        return sum(values) / len(values) * 1000
+
+    print(f"{args.calls} answers from {'Ollama at ' + url if args.url else f'the stub ({args.token_seconds}s/token)'}")
+    print(f"  {'mode':>9} {'first visible ms':>17} {'complete ms':>12}")
+    print(f"  {'blocking':>9} {ms(blocking):17.1f} {ms(blocking):12.1f}")
+    print(f"  {'streamed':>9} {ms([s['first_token_seconds'] for s in streamed]):17.1f} "
+          f"{ms([s['total_seconds'] for s in streamed]):12.1f}")
+    if stub is not None:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark: query latency of the Chroma and numpy vector store backends
+
+Both collections hold the same synthetic unit vectors and metadata; queries
+are timed one at a time, as one batch, and with a metadata filter.
+
+Usage:
+    python benchmarks/bench_vector_backends.py [--vectors 20000] [--dim 384] [--queries 200]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes.numpy_collection import NumpyCollection
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return 1000 * (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    import chromadb
+    from chromadb.config import Settings
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.vectors, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.integers(0, args.vectors, args.queries)]
+    ids = [f"doc_{i}" for i in range(args.vectors)]
+    documents = [f"document {i}" for i in range(args.vectors)]
+    metadatas = [{"source": f"file_{i % 50}.txt", "chunk_index": i // 50} for i in range(args.vectors)]
+    where = {"source": "file_7.txt"}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chroma = chromadb.Client(Settings(anonymized_telemetry=False)).get_or_create_collection("bench_backends")
+        numpy_collection = NumpyCollection("bench_backends", os.path.join(tmp, "numpy"))
+        for start in range(0, args.vectors, 5000):
+            batch = slice(start, start + 5000)
+            for collection in (chroma, numpy_collection):
+                collection.add(ids=ids[batch], embeddings=vectors[batch].tolist(), documents=documents[batch],
+                               metadatas=metadatas[batch])
+
+        print(f"{args.vectors} x {args.dim} vectors, {args.queries} queries, k={args.k}  (ms per query)")
+        print(f"  {'backend':<8} {'single':>8} {'batched':>8} {'filtered':>9}")
+        for name, collection in (("chroma", chroma), ("numpy", numpy_collection)):
+            single = timed(lambda: [
+                collection.query(query_embeddings=[q.tolist()], n_results=args.k) for q in queries
+            ], 1) / args.queries
+            batched = timed(lambda: collection.query(query_embeddings=queries.tolist(), n_results=args.k), 1) / args.queries
+            filtered = timed(lambda: [
+                collection.query(query_embeddings=[q.tolist()], n_results=args.k, where=where) for q in queries
+            ], 1) / args.queries
+            print(f"  {name:<8} {single:8.2f} {batched:8.2f} {filtered:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Export the index as a prebuilt bundle, import one into the local index without re-embedding, or verify one"""
+
+import argparse
+
+from config import BUNDLE_CONFIG
+
+
+def export_bundle(path: str):
+    from vector_store import VectorStore
+    from ingest import IndexManifest
+    from indexes.bundle import write_bundle
+
+    vector_store = VectorStore()
+    if vector_store.read_only:
+        print("❌ The configured backend already serves a bundle; export from a writable backend")
+        return
+    count = vector_store.get_collection_info()["count"]
+    if count == 0:
+        print("❌ Index is empty; run agentic_rag.py to build it first")
+        return
+    vector_store.index_version  # Recorded in the collection metadata, so the bundle carries it
+    print(f"📦 Exporting {count} chunks to '{path}'...")
+    manifest = write_bundle(vector_store.collection, path, info={
+        "collection_name": vector_store.collection_name,
+        "ingest_files": IndexManifest.load().files,
+    })
+    size = sum(entry["bytes"] for entry in manifest["files"].values())
+    print(f"✅ Bundle written ({manifest['count']} chunks, dim {manifest['dim']}, {size / 1e6:.1f} MB)")
+    print("   Serve it read-only with VECTOR_STORE_CONFIG['backend'] = 'bundle', or load it with `import`")
+
+
+def import_bundle(path: str, verify: bool, page_size: int = 5000):
+    from vector_store import VectorStore
+    from ingest import IndexManifest
+    from indexes.bundle import BundleCollection
+
+    bundle = BundleCollection(path, verify=verify)
+    vector_store = VectorStore()
+    if vector_store.read_only:
+        print("❌ The configured backend serves the bundle directly; nothing to import into")
+        return
+    recorded = bundle.metadata or {}
+    mismatches = [
+        f"{key}: bundle has {recorded[key]}, configured {value}"
+        for key, value in vector_store.index_info().items()
+        if key in recorded and recorded[key] != value
+    ]
+    if mismatches:
+        print("❌ Bundle was built with different settings:")
+        for mismatch in mismatches:
+            print(f"   - {mismatch}")
+        return
+
+    print(f"📥 Importing {bundle.count()} chunks from '{path}' (replacing the local index)...")
+    # Until the import completes, nothing may claim the documents are indexed: an
+    # interrupted import then reads as a settings mismatch and is rebuilt on startup
+    manifest_path = IndexManifest.load().path
+    IndexManifest(manifest_path).save()
+    vector_store.delete_collection()
+    vector_store.update_collection()
+    vector_store.mark_import_started(path)
+    offset = 0
+    with vector_store.deferred_index_version():
+        while True:
+            page = bundle.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            vector_store.add_documents(page["documents"], page["metadatas"], page["ids"], embeddings=page["embeddings"])
+            offset += len(page["ids"])
+    vector_store.record_index_info()
+    IndexManifest(manifest_path, bundle.manifest.get("ingest_files", {})).save()
+    print(f"✅ Imported {vector_store.get_collection_info()['count']} chunks")
+
+
+def verify_bundle(path: str):
+    from indexes.bundle import BundleError, read_manifest
+
+    try:
+        manifest = read_manifest(path, verify=True)
+    except BundleError as e:
+        print(f"❌ {e}")
+        return False
+    print(f"✅ Bundle '{path}' is intact ({manifest['count']} chunks, {len(manifest['files'])} files checked)")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("command", choices=["export", "import", "verify"])
+    parser.add_argument(
+        "--path", default=BUNDLE_CONFIG["path"],
+        help="Bundle directory (default: BUNDLE_CONFIG['path'])"
+    )
+    parser.add_argument(
+        "--no-verify", action="store_true",
+        help="Skip checksum verification when importing"
+    )
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_bundle(args.path)
+    elif args.command == "verify":
+        if not verify_bundle(args.path):
+            raise SystemExit(1)
+    else:
+        import_bundle(args.path, verify=not args.no_verify and BUNDLE_CONFIG["verify_checksums"])
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,21 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 # Model names should match what's available in the API (with or without models/ prefix)
 GEMINI_MODEL = "gemini-2.5-flash"
 
+# LLM Backend used by the agents
+LLM_CONFIG = {
+    "backend": "gemini",  # "gemini" (API, needs GEMINI_API_KEY) or "ollama" (local server, see OLLAMA_CONFIG)
+    "stream_answers": True,  # CLI prints answer tokens as they are generated (silent/verbose modes)
+}
+
+# Local Ollama Server
+OLLAMA_CONFIG = {
+    "base_url": "http://localhost:11434",
+    "model": "llama3.1",
+    "keep_alive": "30m",  # How long the server keeps the model loaded after a call (-1 = forever, 0 = unload)
+    "timeout": 300,  # Seconds per request, generation included
+    "pool_size": 4,  # Idle keep-alive connections kept open to the server
+}
+
 # Agent Parameters
 AGENT_CONFIG = {
     "temperature": 0.7,
@@ -26,10 +41,88 @@ ROUTER_CONFIG = {
     "max_output_tokens": 256,
 }
 
+# Speculative Routing: prepare the advanced context while the basic answer is generated and evaluated
+SPECULATIVE_ROUTING_CONFIG = {
+    "enabled": False,  # Saves the advanced retrieval time on escalations, wastes its LLM calls otherwise
+}
+
 # Vector Store Configuration
 VECTOR_STORE_CONFIG = {
     "collection_name": "knowledge_base",
     "embedding_model": "all-MiniLM-L6-v2",
+    "embedding_backend": "torch",  # "torch", "onnx" or "onnx-int8" (CPU, dynamically quantized)
+    "onnx_dir": ".rag_index/onnx",  # Exported ONNX models, one subfolder per model
+    "backend": "chroma",  # "chroma", "numpy" (in-process brute force), "ivfpq" (approximate, large corpora),
+                          # "quantized" (int8/float16 codes in RAM, float32 memory-mapped for rescoring)
+                          # or "bundle" (serve a prebuilt bundle read-only, see BUNDLE_CONFIG)
+    "shards": 1,  # Hash-partitioned collections queried in parallel (change with rebalance_shards.py)
+    "persist_directory": ".rag_index/chroma",  # None = in-memory (re-embedded every start)
+    "numpy_dir": ".rag_index/numpy",  # Where the numpy/ivfpq/quantized backends persist (if persisting)
+    "quantization": "int8",  # Codes of the "quantized" backend: "int8" or "float16"
+    "rescore_factor": 4,  # Quantized candidates per result rescored with float32 vectors
+}
+
+# IVF-PQ Approximate Search (VECTOR_STORE_CONFIG["backend"] = "ivfpq")
+IVFPQ_CONFIG = {
+    "min_train_size": 50000,  # Exact search below this many vectors
+    "nlist": None,  # Inverted lists; None = sqrt(vectors at training time)
+    "m": 48,  # PQ sub-quantizers (one byte each); must divide the embedding dimension
+    "nprobe": 8,  # Lists scanned per query (overridden by recall_target tuning)
+    "recall_target": 0.95,  # Tune nprobe after training to reach this recall@10 (None = keep nprobe)
+    "rescore_factor": 10,  # Candidates per result rescored with float32 vectors
+    "train_sample_per_list": 64,  # Training vectors per list
+    "kmeans_iterations": 10,
+    "background_training": True,  # Train off the ingest path; False = inside the add reaching min_train_size
+}
+
+# Lexical (BM25) Index and Hybrid Retrieval
+LEXICAL_CONFIG = {
+    "enabled": True,
+    "bm25_dir": ".rag_index/bm25",  # One subfolder per collection (in-memory when not persisting)
+    "k1": 1.2,
+    "b": 0.75,
+    "query_mode": "dense",  # Default VectorStore.query mode: "dense", "lexical" or "hybrid" (BM25 + vectors)
+    "candidates_per_result": 4,  # Candidates fetched from each ranking per requested result
+    "rrf_k": 60,  # Reciprocal rank fusion constant
+    "decisive_ratio": 2.0,  # Hybrid skips embedding when every returned BM25 hit scores this many times the next one
+}
+
+# Embedding Cache (document and query encodes)
+EMBEDDING_CACHE_CONFIG = {
+    "enabled": True,
+    "path": ".rag_index/embedding_cache.sqlite",  # None = in-memory only
+    "max_memory_items": 10000,  # LRU entries kept in RAM
+}
+
+# Semantic Answer Cache (in front of the router)
+ANSWER_CACHE_CONFIG = {
+    "enabled": True,
+    "path": ".rag_index/answer_cache.sqlite",  # None = in-memory only
+    "similarity_threshold": 0.95,  # Cosine similarity for a query to reuse a cached answer
+    "max_items": 1000,  # Least recently used answers are evicted beyond this
+    "ttl_seconds": 7 * 24 * 3600,  # None = answers never expire (they still follow the index version)
+    "index_version_refresh_seconds": 5.0,  # Re-read a shared (persistent Chroma) index's version this often; None = never
+}
+
+# Index Bundle Settings (bundle_index.py export/import, "bundle" backend)
+BUNDLE_CONFIG = {
+    "path": ".rag_index/bundle",  # Bundle directory written by export and served by the "bundle" backend
+    "verify_checksums": True,  # Hash every bundle file before importing it (`bundle_index.py verify` checks a copied one)
+    "verify_on_serve": False,  # Also hash them whenever the "bundle" backend opens the bundle (every worker start)
+}
+
+# Startup Settings
+STARTUP_CONFIG = {
+    "warm_up": True,  # Dummy encode (and local LLM load) before the first query
+    "defer_advanced_agent": True,  # Build the advanced agent on first use
+    "report": True,  # Print the cold-start time per phase
+}
+
+# Embedding Executor Settings (micro-batches concurrent encode requests)
+EMBEDDING_EXECUTOR_CONFIG = {
+    "enabled": True,
+    "max_batch_size": 64,  # Texts per forward pass
+    "max_wait_ms": 5.0,  # How long the first request waits for company
 }
 
 # Basic Generator Settings
@@ -50,14 +143,59 @@ ADVANCED_GENERATOR_CONFIG = {
         "n_variations": 4,
         "n_results_per_variation": 2,
     },
+    "context_selection": {
+        "max_chunks": 8,  # Chunks in the final prompt, chosen from every technique's results
+        "rrf_k": 60,  # Reciprocal rank fusion damping over all retrieval rankings
+        "mmr_lambda": 0.7,  # 1.0 = fused relevance order only, lower = favour diverse chunks
+        "redundancy_threshold": 0.95,  # Chunks this cosine-similar to a selected one are dropped
+    },
+    "concurrency": {
+        "max_llm_calls": 4,  # LLM calls in flight at once across techniques and sub-queries (1 = sequential)
+    },
 }
 
 # Chunking Settings
 CHUNK_CONFIG = {
+    "strategy": "tokens",  # "tokens" (embedding-model tokens) or "words"
+    # all-MiniLM-L6-v2 truncates at 256 word-pieces, so token windows must stay below that
+    "max_tokens": 128,
+    "overlap_tokens": 25,  # ~20% overlap
     "max_words": 100,
     "overlap_words": 20,  # 20% overlap
 }
 
+# Ingestion Pipeline Settings
+INGEST_CONFIG = {
+    "workers": None,  # Preprocessing processes (None = one per CPU core)
+    "embedding_batch_size": 256,  # Chunks per embedding/write batch
+    "queue_size": 4,  # Max batches waiting for the writer (bounds memory)
+    "progress_interval": 5.0,  # Seconds between progress reports
+    "manifest_path": ".rag_index/manifest.json",  # Per-file content hashes for incremental re-indexing
+    "large_file_bytes": 64 * 1024 * 1024,  # Files above this are memory-mapped and streamed
+    "stream_window_bytes": 1024 * 1024,  # Bytes cleaned/chunked per step when streaming
+}
+
+# Live Watch-Folder Ingestion
+WATCH_CONFIG = {
+    "enabled": False,  # Start a watcher from initialize_system
+    "poll_interval": 1.0,  # Seconds between folder scans
+    "debounce_seconds": 2.0,  # A file must be quiet this long before it is indexed
+    "max_batch_files": 64,  # Files applied per micro-batch
+    "max_delay_seconds": 30.0,  # A file that keeps changing is indexed at least this often anyway
+    "retry_seconds": 5.0,  # Back-off after a file fails to index, doubled per consecutive failure
+    "max_retry_seconds": 600.0,  # Cap on that back-off
+    "workers": 1,  # Preprocessing processes per micro-batch
+}
+
+# Near-Duplicate Chunk Elimination (MinHash + LSH, applied at ingest)
+DEDUPE_CONFIG = {
+    "enabled": False,  # Runs with work to do also read the indexed chunks to seed the filter
+    "threshold": 0.85,  # Estimated Jaccard similarity of word shingles
+    "num_perm": 64,  # MinHash signature length
+    "bands": 16,  # LSH bands (num_perm / bands rows each)
+    "shingle_size": 5,  # Words per shingle
+}
+
 # Answer Evaluation Thresholds
 EVALUATION_CONFIG = {
     "min_confidence_score": 0.6,
@@ -0,0 +1,188 @@
+"""Embedding backends: PyTorch SentenceTransformer or exported ONNX Runtime models"""
+
+import inspect
+import json
+import os
+from typing import List
+import numpy as np
+from config import VECTOR_STORE_CONFIG
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+class TorchEmbeddingBackend:
+    """Full-precision SentenceTransformer on PyTorch (the reference backend)"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.name = model_name  # Embedding cache namespace
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts), dtype=np.float32)
+
+
+class OnnxEmbeddingBackend:
+    """
+    SentenceTransformer exported to ONNX and run with ONNX Runtime on CPU
+
+    The whole module pipeline (transformer, pooling, normalization) is
+    exported, so vectors match the torch backend up to float error. With
+    `quantize=True` weights are dynamically quantized to int8.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        quantize: bool = False,
+        onnx_dir: str = None,
+        batch_size: int = 32,
+        threads: int = None
+    ):
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError("ONNX embedding backends require `pip install onnxruntime transformers`") from e
+
+        self.model_name = model_name
+        self.name = f"{model_name}:{'onnx-int8' if quantize else 'onnx'}"
+        self.batch_size = batch_size
+        export_dir = os.path.join(onnx_dir or VECTOR_STORE_CONFIG["onnx_dir"], model_name.replace("/", "__"))
+        model_path = export_onnx_model(model_name, export_dir, quantize=quantize)
+
+        with open(os.path.join(export_dir, "export_info.json"), encoding="utf-8") as f:
+            info = json.load(f)
+        self.input_names = info["input_names"]
+        self.max_seq_length = info["max_seq_length"]
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Batch texts of similar length together to keep padding short
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            encoded = self.tokenizer(
+                [texts[i] for i in batch],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+            output = self.session.run(None, feeds)[0]
+            for i, vector in zip(batch, output):
+                vectors[i] = vector
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def export_onnx_model(model_name: str, export_dir: str, quantize: bool = False) -> str:
+    """
+    Export a SentenceTransformer to ONNX (once) and optionally quantize it
+
+    Args:
+        model_name: SentenceTransformer model name or local path
+        export_dir: Folder for model.onnx, the tokenizer and export_info.json
+        quantize: Also produce (and return) the int8 dynamically quantized model
+
+    Returns:
+        Path of the ONNX model to load
+    """
+    fp32_path = os.path.join(export_dir, "model.onnx")
+    int8_path = os.path.join(export_dir, "model.int8.onnx")
+
+    if not os.path.exists(fp32_path):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        print(f"📦 Exporting '{model_name}' to ONNX...")
+        os.makedirs(export_dir, exist_ok=True)
+        model = SentenceTransformer(model_name, device="cpu").eval()
+        model.tokenizer.save_pretrained(export_dir)
+        sample = model.tokenizer(["export sample text"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["sentence_embedding"] = {0: "batch"}
+        options = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            options["dynamo"] = False  # Traced export supports dynamic_axes everywhere
+        tmp_path = fp32_path + ".tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                _sentence_embedding_module(model, input_names),
+                tuple(sample[name] for name in input_names),
+                tmp_path,
+                input_names=input_names,
+                output_names=["sentence_embedding"],
+                dynamic_axes=dynamic_axes,
+                opset_version=17,
+                **options
+            )
+        with open(os.path.join(export_dir, "export_info.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "model_name": model_name,
+                "input_names": input_names,
+                "max_seq_length": model.max_seq_length,
+            }, f, indent=2)
+        os.replace(tmp_path, fp32_path)
+
+    if not quantize:
+        return fp32_path
+
+    if not os.path.exists(int8_path):
+        try:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+        except ImportError as e:
+            raise ImportError("The onnx-int8 backend requires `pip install onnx onnxruntime`") from e
+        print(f"📦 Quantizing '{model_name}' to int8...")
+        quantize_dynamic(fp32_path, int8_path + ".tmp", weight_type=QuantType.QInt8)
+        os.replace(int8_path + ".tmp", int8_path)
+    return int8_path
+
+
+def _sentence_embedding_module(model, input_names: List[str]):
+    """Wrap a SentenceTransformer so positional tensors map to its feature dict"""
+    import torch
+
+    class SentenceEmbeddingModule(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *tensors):
+            return self.model(dict(zip(input_names, tensors)))["sentence_embedding"]
+
+    return SentenceEmbeddingModule()
+
+
+def create_embedding_backend(backend: str = None, model_name: str = None, **kwargs):
+    """
+    Build the embedding backend selected in VECTOR_STORE_CONFIG
+
+    Args:
+        backend: "torch", "onnx" or "onnx-int8"
+        model_name: SentenceTransformer model name or local path
+
+    Returns:
+        Backend with `name` and `encode(texts) -> np.ndarray`
+    """
+    backend = backend or VECTOR_STORE_CONFIG.get("embedding_backend", "torch")
+    model_name = model_name or VECTOR_STORE_CONFIG["embedding_model"]
+    if backend == "torch":
+        return TorchEmbeddingBackend(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbeddingBackend(model_name, quantize=backend == "onnx-int8", **kwargs)
+    raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
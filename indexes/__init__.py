@@ -0,0 +1 @@
+"""Vector and lexical index accelerators for the retrieval layer"""
@@ -0,0 +1,298 @@
+"""BM25 inverted index over chunk text for lexical and hybrid retrieval"""
+
+import json
+import math
+import os
+import re
+import shutil
+import threading
+from array import array
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple, Collection
+import numpy as np
+from indexes.buffers import grow
+
+# Words plus identifiers joined by - . : / (e.g. "user-014", "v1.2.3", "a/b");
+# compounds are indexed whole and as their parts so either form matches
+_TOKEN = re.compile(r"\w+(?:[-.:/]\w+)*")
+_PART = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms of a text, compounds followed by their parts"""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an in-memory inverted index
+
+    Each term maps to parallel arrays of rows and term frequencies; rows are
+    append-only and replaced or deleted rows are masked out, so document
+    frequencies and the average length only ever count live chunks. Scoring
+    touches the postings of the query terms only, never the whole corpus.
+
+    Files (when persisted; append-only, compacted once most rows are dead):
+        log.jsonl    ["add", id, {term: tf}] / ["del", id] entries, in order
+
+    Entries appended by other processes are applied by refresh().
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            path: Directory to persist to; None keeps the index in memory
+            k1: Term-frequency saturation
+            b: Document-length normalization
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._reset()
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    def _reset(self):
+        self._ids: List[str] = []  # Row -> id
+        self._rows: Dict[str, int] = {}  # Id -> live row
+        self._postings: Dict[str, Tuple[array, array]] = {}  # Term -> (rows, term frequencies)
+        self._alive = np.zeros(0, dtype=bool)
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._live_length = 0.0
+        self._log_offset = 0  # Bytes of log.jsonl applied
+        self._log_inode = None
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        """Apply the complete log entries past the ones already applied"""
+        try:
+            f = open(self._file("log.jsonl"), "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            self._log_inode = os.fstat(f.fileno()).st_ino
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Being written (or torn by a crash): applied once complete
+                self._log_offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn line completed by a later append
+                if record[0] == "add":
+                    self._add_counts([record[1]], [record[2]])
+                else:
+                    self._delete_rows([record[1]])
+
+    def refresh(self) -> bool:
+        """
+        Pick up log entries written by other processes
+
+        New entries are applied incrementally; a log replaced by another
+        process's compaction or clear is reloaded from scratch.
+
+        Returns:
+            Whether the log had changed
+        """
+        if not self.path:
+            return False
+        with self._lock:
+            try:
+                stat = os.stat(self._file("log.jsonl"))
+            except FileNotFoundError:
+                stat = None
+            if stat is None and self._log_inode is None:
+                return False
+            if stat is not None and stat.st_ino == self._log_inode and stat.st_size == self._log_offset:
+                return False
+            if stat is None or stat.st_ino != self._log_inode or stat.st_size < self._log_offset:
+                self._reset()
+            self._load()
+            return True
+
+    def _log(self, records: List[list]):
+        if self.path:
+            data = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+            with open(self._file("log.jsonl"), "ab") as f:
+                start = f.tell()
+                f.write(data)
+                f.flush()
+                # Skip our own entries on refresh, unless another process's are interleaved
+                if start == self._log_offset and f.tell() == start + len(data):
+                    self._log_offset = f.tell()
+                    self._log_inode = os.fstat(f.fileno()).st_ino
+
+    def clear(self):
+        """Drop all documents"""
+        with self._lock:
+            if self.path:
+                shutil.rmtree(self.path, ignore_errors=True)
+                os.makedirs(self.path, exist_ok=True)
+            self._reset()
+
+    # ---------------------------------------------------------------- writes
+
+    def _add_counts(self, ids: List[str], counts: List[Dict[str, int]]):
+        start = len(self._ids)
+        self._alive = grow(self._alive, start, len(ids), fill=False)
+        self._lengths = grow(self._lengths, start, len(ids))
+        self._delete_rows(ids)
+        for row, (chunk_id, terms) in enumerate(zip(ids, counts), start):
+            previous = self._rows.get(chunk_id)
+            if previous is not None:  # Repeated id within the batch: last one wins
+                self._alive[previous] = False
+                self._live_length -= self._lengths[previous]
+            for term, tf in terms.items():
+                posting = self._postings.get(term)
+                if posting is None:
+                    posting = self._postings[term] = (array("i"), array("i"))
+                posting[0].append(row)
+                posting[1].append(tf)
+            self._ids.append(chunk_id)
+            self._rows[chunk_id] = row
+            self._alive[row] = True
+            self._lengths[row] = sum(terms.values())
+            self._live_length += self._lengths[row]
+
+    def _delete_rows(self, ids: List[str]) -> List[str]:
+        deleted = []
+        for chunk_id in ids:
+            row = self._rows.pop(chunk_id, None)
+            if row is not None:
+                self._alive[row] = False
+                self._live_length -= self._lengths[row]
+                deleted.append(chunk_id)
+        return deleted
+
+    def add(self, ids: List[str], documents: List[str]):
+        """Insert or replace documents by id"""
+        if not ids:
+            return
+        counts = [dict(Counter(tokenize(document or ""))) for document in documents]
+        with self._lock:
+            self._add_counts(ids, counts)
+            self._log([["add", chunk_id, terms] for chunk_id, terms in zip(ids, counts)])
+
+    def delete(self, ids: List[str]):
+        """Delete documents by id (unknown ids are ignored)"""
+        with self._lock:
+            deleted = self._delete_rows(ids)
+            if not deleted:
+                return
+            self._log([["del", chunk_id] for chunk_id in deleted])
+            if len(self._rows) < 0.5 * len(self._ids):
+                self._compact()
+
+    def _compact(self):
+        """Rebuild the postings (and log) without dead rows"""
+        live_rows = {row: chunk_id for chunk_id, row in self._rows.items()}
+        counts: Dict[int, Dict[str, int]] = {row: {} for row in live_rows}
+        for term, (rows, tfs) in self._postings.items():
+            for row, tf in zip(rows, tfs):
+                if row in counts:
+                    counts[row][term] = tf
+        ordered = sorted(live_rows)
+        self.clear()
+        self._add_counts([live_rows[row] for row in ordered], [counts[row] for row in ordered])
+        self._log([["add", live_rows[row], counts[row]] for row in ordered])
+
+    # ---------------------------------------------------------------- search
+
+    def _allowed_rows(self, allowed_ids: Collection[str]) -> np.ndarray:
+        """Row mask of the live rows among `allowed_ids`"""
+        mask = np.zeros(len(self._ids), dtype=bool)
+        rows = [self._rows[chunk_id] for chunk_id in allowed_ids if chunk_id in self._rows]
+        mask[rows] = True
+        return mask
+
+    def _score(self, terms: List[str], allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows matching any term (and `allowed`, if given) and their BM25 scores (unsorted)"""
+        n_live = len(self._rows)
+        average_length = self._live_length / n_live
+        scores = None
+        for term in set(terms):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            rows = np.array(posting[0], dtype=np.int64)
+            tfs = np.array(posting[1], dtype=np.float32)
+            alive = self._alive[rows]
+            rows, tfs = rows[alive], tfs[alive]
+            if not len(rows):
+                continue
+            # Document frequency counts every live chunk, so filtered scores equal unfiltered ones
+            idf = math.log(1.0 + (n_live - len(rows) + 0.5) / (len(rows) + 0.5))
+            if allowed is not None:
+                rows, tfs = rows[allowed[rows]], tfs[allowed[rows]]
+                if not len(rows):
+                    continue
+            norm = self.k1 * (1.0 - self.b + self.b * self._lengths[rows] / average_length)
+            if scores is None:
+                scores = np.zeros(len(self._ids), dtype=np.float32)
+            # Rows are unique within a posting, so fancy-index accumulation is safe
+            scores[rows] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+        if scores is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        rows = np.flatnonzero(scores)  # idf is always positive, so matches score > 0
+        return rows, scores[rows]
+
+    def search(
+        self,
+        queries: List[str],
+        n_results: int,
+        allowed_ids: Optional[Collection[str]] = None
+    ) -> Tuple[List[List[str]], List[List[float]]]:
+        """
+        Best BM25 matches of each query
+
+        Args:
+            queries: Query strings
+            n_results: Matches per query (fewer when fewer chunks share a term)
+            allowed_ids: Only score these chunks (e.g. the ones matching a
+                         metadata filter); None = all
+
+        Returns:
+            (ids, scores), one list per query, best first
+        """
+        all_ids, all_scores = [], []
+        for query in queries:
+            with self._lock:
+                if not self._rows or n_results <= 0:
+                    rows, scores = np.zeros(0, dtype=np.int64), np.zeros(0)
+                else:
+                    allowed = self._allowed_rows(allowed_ids) if allowed_ids is not None else None
+                    rows, scores = self._score(tokenize(query), allowed)
+                ids = self._ids
+            n = min(n_results, len(rows))
+            top = np.argpartition(-scores, n - 1)[:n] if n else np.zeros(0, dtype=np.int64)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            all_ids.append([ids[row] for row in rows[top]])
+            all_scores.append(scores[top].astype(float).tolist())
+        return all_ids, all_scores
+
+    # ----------------------------------------------------------------- stats
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Document and vocabulary counts"""
+        n_live = len(self._rows)
+        return {
+            "documents": n_live,
+            "dead_rows": len(self._ids) - n_live,
+            "terms": len(self._postings),
+            "average_length": round(float(self._live_length) / n_live, 1) if n_live else 0.0,
+            "persisted": bool(self.path),
+        }
@@ -0,0 +1,19 @@
+"""Growable row buffers shared by the in-process indexes"""
+
+import numpy as np
+
+
+def grow(buffer: np.ndarray, used: int, extra: int, fill=None) -> np.ndarray:
+    """
+    Buffer with room for `extra` more rows, doubling capacity when full
+
+    Rows past `used` are left as they are (or set to `fill` in a new
+    buffer), so readers holding a slice of the first `used` rows keep valid data.
+    """
+    if used + extra <= len(buffer):
+        return buffer
+    grown = np.empty((max(used + extra, 2 * len(buffer), 1024),) + buffer.shape[1:], dtype=buffer.dtype)
+    grown[:used] = buffer[:used]
+    if fill is not None:
+        grown[used:] = fill
+    return grown
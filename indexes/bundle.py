@@ -0,0 +1,249 @@
+"""Self-describing, memory-mappable index bundles for shipping prebuilt indexes"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import time
+from typing import List, Dict, Any
+import numpy as np
+from indexes.numpy_collection import NumpyCollection, _Column
+
+BUNDLE_FORMAT = 1
+MANIFEST = "manifest.json"
+_FILES = ("vectors.npy", "ids.bin", "ids.offsets.npy", "documents.bin", "documents.offsets.npy", "metadata.json")
+
+
+class BundleError(ValueError):
+    """A bundle is missing, of an unknown format or fails its checksums"""
+
+
+def _sha256(path: str, window_bytes: int = 16 * 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(window_bytes)
+            if not block:
+                return digest.hexdigest()
+            digest.update(block)
+
+
+class _StringWriter:
+    """Appends UTF-8 strings to `<name>.bin` and records their end offsets"""
+
+    def __init__(self, path: str, name: str, n_items: int):
+        self._data = open(os.path.join(path, f"{name}.bin"), "wb")
+        self._offsets = np.lib.format.open_memmap(
+            os.path.join(path, f"{name}.offsets.npy"), mode="w+", dtype=np.int64, shape=(n_items + 1,)
+        )
+        self._offsets[0] = 0
+        self._count = 0
+        self._size = 0
+
+    def extend(self, strings: List[str]):
+        for text in strings:
+            encoded = (text or "").encode("utf-8")
+            self._data.write(encoded)
+            self._size += len(encoded)
+            self._count += 1
+            self._offsets[self._count] = self._size
+
+    def close(self):
+        self._data.close()
+        self._offsets.flush()
+        del self._offsets
+
+
+def _read_strings(path: str, name: str) -> List[str]:
+    """All strings of a `<name>.bin` / `<name>.offsets.npy` pair"""
+    offsets = np.load(os.path.join(path, f"{name}.offsets.npy")).tolist()
+    with open(os.path.join(path, f"{name}.bin"), "rb") as f:
+        data = f.read()
+    return [data[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+
+
+class _MappedStrings:
+    """Read-only sequence over a `<name>.bin` / `<name>.offsets.npy` pair, decoded on access"""
+
+    def __init__(self, path: str, name: str):
+        self._offsets = np.load(os.path.join(path, f"{name}.offsets.npy"))
+        self._file = open(os.path.join(path, f"{name}.bin"), "rb")
+        # Zero-length files cannot be mapped
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._offsets[-1] else b""
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        return self._data[self._offsets[row]:self._offsets[row + 1]].decode("utf-8")
+
+
+def write_bundle(
+    collection,
+    path: str,
+    info: Dict[str, Any] = None,
+    page_size: int = 5000
+) -> Dict[str, Any]:
+    """
+    Export a collection (any Chroma-compatible one, sharded or not) as a bundle
+
+    Layout of the bundle directory:
+        vectors.npy            unit-normalized float32 (count, dim) matrix
+        ids.bin / documents.bin + *.offsets.npy
+                               UTF-8 strings back to back, int64 end offsets
+        metadata.json          one value list per metadata key (null = missing)
+        manifest.json          format, count, dim, collection metadata, `info`,
+                               and size + sha256 of every file above
+
+    The bundle is written next to `path` and renamed into place, so a
+    reader never sees a half-written one.
+
+    Args:
+        collection: Collection to export
+        path: Bundle directory (replaced if it exists)
+        info: Extra manifest fields (e.g. the ingest manifest's files)
+        page_size: Records read from the collection at a time
+
+    Returns:
+        The manifest
+    """
+    tmp_path = f"{path.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    n_items = collection.count()
+    ids = _StringWriter(tmp_path, "ids", n_items)
+    documents = _StringWriter(tmp_path, "documents", n_items)
+    columns: Dict[str, List[Any]] = {}
+    vectors = None
+    written = 0
+    while written < n_items:
+        page = collection.get(
+            include=["embeddings", "documents", "metadatas"], limit=min(page_size, n_items - written), offset=written
+        )
+        if not page["ids"]:
+            break
+        block = np.asarray(page["embeddings"], dtype=np.float32)
+        if vectors is None:
+            vectors = np.lib.format.open_memmap(
+                os.path.join(tmp_path, "vectors.npy"), mode="w+", dtype=np.float32, shape=(n_items, block.shape[1])
+            )
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors[written:written + len(block)] = block / norms
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        for row, metadata in enumerate(page["metadatas"] or [None] * len(page["ids"])):
+            for key, value in (metadata or {}).items():
+                if key not in columns:
+                    columns[key] = [None] * (written + row)
+                columns[key].append(value)
+            for column in columns.values():
+                if len(column) < written + row + 1:
+                    column.append(None)
+        written += len(page["ids"])
+    if written != n_items:
+        raise BundleError(f"Collection changed during export ({n_items} records expected, {written} read)")
+    ids.close()
+    documents.close()
+    if vectors is None:
+        vectors = np.lib.format.open_memmap(
+            os.path.join(tmp_path, "vectors.npy"), mode="w+", dtype=np.float32, shape=(0, 0)
+        )
+    dim = int(vectors.shape[1])
+    vectors.flush()
+    del vectors
+    with open(os.path.join(tmp_path, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(columns, f)
+
+    # Shard layout is a property of the exporting store, not of the data
+    collection_metadata = {key: value for key, value in (collection.metadata or {}).items() if key != "shards"}
+    manifest = {
+        **(info or {}),
+        "format": BUNDLE_FORMAT,
+        "created_at": time.time(),
+        "count": n_items,
+        "dim": dim,
+        "collection_metadata": collection_metadata,
+        "files": {
+            name: {"bytes": os.path.getsize(os.path.join(tmp_path, name)), "sha256": _sha256(os.path.join(tmp_path, name))}
+            for name in _FILES
+        },
+    }
+    with open(os.path.join(tmp_path, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def read_manifest(path: str, verify: bool = True) -> Dict[str, Any]:
+    """
+    Load a bundle's manifest, checking its format and (optionally) checksums
+
+    Raises:
+        BundleError: If the bundle is missing, of another format, or corrupt
+    """
+    try:
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise BundleError(f"No readable bundle manifest in '{path}': {e}") from e
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise BundleError(f"Bundle '{path}' has format {manifest.get('format')}, expected {BUNDLE_FORMAT}")
+    for name, expected in manifest["files"].items():
+        file_path = os.path.join(path, name)
+        if not os.path.exists(file_path) or os.path.getsize(file_path) != expected["bytes"]:
+            raise BundleError(f"Bundle file '{name}' is missing or has the wrong size")
+        if verify and _sha256(file_path) != expected["sha256"]:
+            raise BundleError(f"Bundle file '{name}' fails its checksum")
+    return manifest
+
+
+class BundleCollection(NumpyCollection):
+    """
+    Read-only NumpyCollection served straight from a bundle
+
+    Vectors and document texts are memory-mapped, so worker processes
+    opening the same bundle share its pages through the OS page cache and
+    only ids and metadata columns are held per process. Queries, filters
+    and gets behave exactly as on a NumpyCollection; writes raise.
+    Collection metadata can still be modified, in memory only.
+    """
+
+    def __init__(self, path: str, verify: bool = True):
+        self.manifest = read_manifest(path, verify=verify)
+        super().__init__(self.manifest.get("collection_name", "bundle"))
+        self.bundle_path = path
+        self.metadata = dict(self.manifest["collection_metadata"]) or None
+
+        n_rows = self.manifest["count"]
+        self.dim = self.manifest["dim"] or None
+        self._vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self._documents = _MappedStrings(path, "documents")
+        self._ids = _read_strings(path, "ids")
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._alive = np.ones(n_rows, dtype=bool)
+        with open(os.path.join(path, "metadata.json"), encoding="utf-8") as f:
+            columns = json.load(f)
+        self._columns = {key: _Column.from_values(values) for key, values in columns.items()}
+
+    def _read_only(self, *args, **kwargs):
+        raise BundleError(f"Index bundle '{self.bundle_path}' is read-only")
+
+    _write = update = delete = drop = _read_only
+
+
+class BundleClient:
+    """Chroma-client stand-in over one bundle; its collection answers to any name"""
+
+    def __init__(self, path: str, verify: bool = True):
+        self.collection = BundleCollection(path, verify=verify)
+
+    def get_or_create_collection(self, name: str) -> BundleCollection:
+        return self.collection
+
+    def delete_collection(self, name: str):
+        self.collection.drop()
@@ -0,0 +1,421 @@
+"""Approximate nearest-neighbour search: inverted file (IVF) + product quantization (PQ)"""
+
+import copy
+import json
+import math
+import os
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from indexes.buffers import grow
+from indexes.numpy_collection import NumpyCollection
+from config import IVFPQ_CONFIG
+
+_ASSIGN_BLOCK_ROWS = 16384
+
+
+def _assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid of every row, in blocks to bound the distance matrix"""
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), _ASSIGN_BLOCK_ROWS):
+        block = x[start:start + _ASSIGN_BLOCK_ROWS]
+        labels[start:start + len(block)] = np.argmin(centroid_norms - 2.0 * block @ centroids.T, axis=1)
+    return labels
+
+
+def kmeans(x: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means with random initial centroids; empty clusters are reseeded"""
+    rng = np.random.default_rng(seed)
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    centroids = x[rng.choice(len(x), size=k, replace=len(x) < k)].copy()
+    for _ in range(iterations):
+        labels = _assign(x, centroids)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        centroids[empty] = x[rng.choice(len(x), size=int(empty.sum()))]
+    return centroids
+
+
+class IVFPQIndex:
+    """
+    IVF-PQ index over row numbers
+
+    A k-means coarse quantizer splits vectors into `nlist` inverted lists;
+    the residual of each vector to its list centroid is product-quantized
+    into `m` one-byte codes. A query scans only its `nprobe` nearest lists,
+    scoring entries with per-list lookup tables (asymmetric distance), so
+    its cost grows with nprobe * N / nlist instead of N.
+    """
+
+    def __init__(self, dim: int, nlist: int, m: int, nprobe: int):
+        if dim % m:
+            raise ValueError(f"Vector dimension {dim} must be a multiple of m={m}")
+        self.dim, self.nlist, self.m = dim, nlist, m
+        self.nprobe = nprobe
+        self.sub_dim = dim // m
+        self.centroids: Optional[np.ndarray] = None  # (nlist, dim)
+        self.codebooks: Optional[np.ndarray] = None  # (m, 256, sub_dim)
+        self._reset_lists()
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def snapshot(self) -> "IVFPQIndex":
+        """
+        Copy to search without holding the collection lock
+
+        It shares the list arrays: adds only write past a list's recorded
+        size or grow it into a new array, and resets and training replace
+        the arrays, so the copy keeps seeing exactly the entries it started with.
+        """
+        view = copy.copy(self)
+        view._list_rows = list(self._list_rows)
+        view._list_codes = list(self._list_codes)
+        view._list_sizes = self._list_sizes.copy()
+        return view
+
+    def _reset_lists(self):
+        self._list_rows = [np.zeros(0, dtype=np.int64) for _ in range(self.nlist)]
+        self._list_codes = [np.zeros((0, self.m), dtype=np.uint8) for _ in range(self.nlist)]
+        self._list_sizes = np.zeros(self.nlist, dtype=np.int64)
+
+    def train(self, sample: np.ndarray, iterations: int = 10, seed: int = 0):
+        """Learn the coarse centroids and the PQ codebooks of the residuals"""
+        self.centroids = kmeans(sample, self.nlist, iterations, seed)
+        residuals = sample - self.centroids[_assign(sample, self.centroids)]
+        self.codebooks = np.stack([
+            kmeans(residuals[:, j * self.sub_dim:(j + 1) * self.sub_dim], 256, iterations, seed + j + 1)
+            for j in range(self.m)
+        ])
+        self._reset_lists()
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(list numbers, PQ codes) of vectors"""
+        lists = _assign(vectors, self.centroids)
+        residuals = vectors - self.centroids[lists]
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = _assign(residuals[:, j * self.sub_dim:(j + 1) * self.sub_dim], self.codebooks[j])
+        return lists, codes
+
+    def add_encoded(self, rows: np.ndarray, lists: np.ndarray, codes: np.ndarray):
+        """Append pre-encoded rows to their inverted lists"""
+        order = np.argsort(lists, kind="stable")
+        lists, rows, codes = lists[order], rows[order], codes[order]
+        boundaries = np.flatnonzero(np.diff(lists)) + 1
+        for group in np.split(np.arange(len(lists)), boundaries):
+            if not len(group):
+                continue
+            l, size = lists[group[0]], self._list_sizes[lists[group[0]]]
+            self._list_rows[l] = grow(self._list_rows[l], size, len(group))
+            self._list_codes[l] = grow(self._list_codes[l], size, len(group))
+            self._list_rows[l][size:size + len(group)] = rows[group]
+            self._list_codes[l][size:size + len(group)] = codes[group]
+            self._list_sizes[l] = size + len(group)
+
+    def search(self, query: np.ndarray, n_candidates: int, nprobe: int = None) -> np.ndarray:
+        """Rows of the approximate nearest candidates of one query, best first"""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        coarse = np.einsum("ij,ij->i", self.centroids, self.centroids) - 2.0 * self.centroids @ query
+        probed = np.argpartition(coarse, nprobe - 1)[:nprobe]
+
+        all_rows, all_distances = [], []
+        sub_queries = query.reshape(self.m, self.sub_dim)
+        for l in probed:
+            size = self._list_sizes[l]
+            if not size:
+                continue
+            residual = (sub_queries - self.centroids[l].reshape(self.m, self.sub_dim))[:, None, :]
+            table = np.sum((self.codebooks - residual) ** 2, axis=2)  # (m, 256)
+            codes = self._list_codes[l][:size]
+            all_distances.append(table[np.arange(self.m), codes].sum(axis=1))
+            all_rows.append(self._list_rows[l][:size])
+        if not all_rows:
+            return np.zeros(0, dtype=np.int64)
+
+        rows, distances = np.concatenate(all_rows), np.concatenate(all_distances)
+        if len(rows) > n_candidates:
+            keep = np.argpartition(distances, n_candidates - 1)[:n_candidates]
+            rows, distances = rows[keep], distances[keep]
+        return rows[np.argsort(distances)]
+
+    def save(self, path: str):
+        """Write the quantizers (temporary file + rename, so `path` is never half-written)"""
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, centroids=self.centroids, codebooks=self.codebooks)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str, nprobe: int) -> "IVFPQIndex":
+        """Index with the quantizers saved at `path` (nlist and m follow from them) and empty lists"""
+        with np.load(path) as data:
+            centroids, codebooks = data["centroids"], data["codebooks"]
+        index = cls(centroids.shape[1], len(centroids), len(codebooks), nprobe)
+        index.centroids, index.codebooks = centroids, codebooks
+        return index
+
+
+class IVFPQCollection(NumpyCollection):
+    """
+    NumpyCollection whose unfiltered queries go through an IVF-PQ index
+
+    Until `min_train_size` vectors are stored (and for filtered queries)
+    search stays exact. Training then runs once on a snapshot of the stored
+    vectors, in a background thread unless `background_training` is off,
+    and the trained index is swapped in under the lock; later adds are
+    encoded incrementally with the trained quantizers. Candidates from the
+    probed lists are rescored exactly against the memory-mapped vectors.
+    Codes are persisted row-aligned in `ivfpq_codes.bin` next to the
+    collection's own files, the quantizers in `ivfpq.npz` and the tuned
+    nprobe in `ivfpq.json`. A missing json falls back to the configured
+    nprobe, and missing code rows are re-encoded on open.
+    """
+
+    def __init__(self, name: str, path: Optional[str] = None, **params):
+        self.params = {**IVFPQ_CONFIG, **params}
+        self.ivf: Optional[IVFPQIndex] = None
+        self._encoded_rows = 0
+        self._layout = 0  # Bumped whenever rows are renumbered or removed (compaction, drop)
+        self._training_thread: Optional[threading.Thread] = None
+        super().__init__(name, path)
+        self._restore_index()
+
+    # ---------------------------------------------------------------- files
+
+    def _ivf_file(self, name: str) -> Optional[str]:
+        return os.path.join(self.path, name) if self.path else None
+
+    def _restore_index(self):
+        """Load persisted quantizers and codes, encoding rows added since"""
+        if not self.path or not os.path.exists(self._ivf_file("ivfpq.npz")):
+            self._maybe_train()
+            return
+        try:
+            with open(self._ivf_file("ivfpq.json"), encoding="utf-8") as f:
+                nprobe = json.load(f)["nprobe"]
+        except (OSError, ValueError, KeyError):
+            nprobe = self.params["nprobe"]  # Lost before it was written: only the tuning is lost
+        self.ivf = IVFPQIndex.load(self._ivf_file("ivfpq.npz"), nprobe)
+
+        record = 4 + self.ivf.m
+        codes_file = self._ivf_file("ivfpq_codes.bin")
+        with open(codes_file, "ab") as f:  # Created empty if missing: every row is re-encoded
+            n_rows = min(len(self._ids), f.tell() // record)
+            f.truncate(n_rows * record)
+        raw = np.fromfile(codes_file, dtype=np.uint8, count=n_rows * record).reshape(n_rows, record)
+        lists = raw[:, :4].copy().view(np.int32).ravel().astype(np.int64)
+        self.ivf.add_encoded(np.arange(n_rows), lists, raw[:, 4:])
+        self._encoded_rows = n_rows
+        self._encode_pending()
+
+    def _save_quantizers(self):
+        if self.path:
+            self.ivf.save(self._ivf_file("ivfpq.npz"))
+            self._save_nprobe()
+
+    def _save_nprobe(self):
+        if self.path:
+            with open(self._ivf_file("ivfpq.json.tmp"), "w", encoding="utf-8") as f:
+                json.dump({"nlist": self.ivf.nlist, "m": self.ivf.m, "nprobe": self.ivf.nprobe}, f)
+            os.replace(self._ivf_file("ivfpq.json.tmp"), self._ivf_file("ivfpq.json"))
+
+    # --------------------------------------------------------------- writes
+
+    def _rows_added(self, start: int, vectors: np.ndarray):
+        if self.ivf is not None and self.ivf.is_trained:
+            self._encode_pending()
+        else:
+            self._maybe_train()
+
+    def _encode_pending(self, block_rows: int = 65536):
+        """Encode stored rows that are not in the inverted lists yet"""
+        matrix = self._matrix()
+        while self._encoded_rows < len(self._ids):
+            start = self._encoded_rows
+            end = min(start + block_rows, len(self._ids))
+            lists, codes = self.ivf.encode(np.asarray(matrix[start:end]))
+            self.ivf.add_encoded(np.arange(start, end), lists, codes)
+            if self.path:
+                with open(self._ivf_file("ivfpq_codes.bin"), "ab") as f:
+                    f.write(np.hstack([lists.astype(np.int32)[:, None].view(np.uint8), codes]).tobytes())
+            self._encoded_rows = end
+
+    def _maybe_train(self):
+        """Start training once min_train_size vectors are stored (called with the lock held)"""
+        if self.count() < self.params["min_train_size"]:
+            return
+        if self._training_thread is not None and self._training_thread.is_alive():
+            return
+        if not self.params["background_training"]:
+            self._train()
+            return
+        self._training_thread = threading.Thread(target=self._train, name=f"ivfpq-train-{self.name}", daemon=True)
+        self._training_thread.start()
+
+    def train(self) -> bool:
+        """Train now (e.g. after an ingest), waiting for a background training in progress first"""
+        self.wait_for_training()
+        if self.ivf is not None and self.ivf.is_trained:
+            return True
+        return self._train()
+
+    def wait_for_training(self, timeout: float = None):
+        """Block until a background training, if one is running, has finished"""
+        thread = self._training_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _train(self, block_rows: int = 65536) -> bool:
+        """
+        Train and encode on a snapshot of the stored vectors, then swap the
+        index in under the lock
+
+        Returns:
+            False if rows were renumbered meanwhile (the next add retrains)
+        """
+        with self._lock:
+            layout, n_rows = self._layout, len(self._ids)
+            matrix = self._matrix()
+            live = np.flatnonzero(self._alive[:n_rows])
+        if not len(live):
+            return False
+        nlist = self.params["nlist"] or max(16, int(round(math.sqrt(len(live)))))
+        m = max(d for d in range(1, min(self.params["m"], self.dim) + 1) if self.dim % d == 0)
+        ivf = IVFPQIndex(self.dim, nlist, m, self.params["nprobe"])
+
+        rng = np.random.default_rng(0)
+        sample_size = min(len(live), self.params["train_sample_per_list"] * nlist)
+        sample = np.asarray(matrix[np.sort(rng.choice(live, size=sample_size, replace=False))])
+        ivf.train(sample, iterations=self.params["kmeans_iterations"])
+        encoded = []
+        for start in range(0, n_rows, block_rows):
+            lists, codes = ivf.encode(np.asarray(matrix[start:start + block_rows]))
+            ivf.add_encoded(np.arange(start, start + len(lists)), lists, codes)
+            encoded.append(np.hstack([lists.astype(np.int32)[:, None].view(np.uint8), codes]))
+        try:
+            if self.path:
+                with open(self._ivf_file("ivfpq_codes.tmp"), "wb") as f:
+                    for block in encoded:
+                        f.write(block.tobytes())
+        except OSError:
+            return False  # Collection dropped meanwhile
+
+        with self._lock:
+            if self._layout != layout:
+                if self.path and os.path.exists(self._ivf_file("ivfpq_codes.tmp")):
+                    os.remove(self._ivf_file("ivfpq_codes.tmp"))
+                return False
+            if self.path:
+                os.replace(self._ivf_file("ivfpq_codes.tmp"), self._ivf_file("ivfpq_codes.bin"))
+            self.ivf, self._encoded_rows = ivf, n_rows
+            self._encode_pending()  # Rows added while training
+            self._save_quantizers()
+        if self.params["recall_target"]:
+            self.tune_nprobe(self.params["recall_target"])
+        return True
+
+    def _compact(self):
+        super()._compact()
+        self._layout += 1
+        ivf = self.ivf
+        if ivf is not None and ivf.is_trained:
+            ivf._reset_lists()
+            self._encoded_rows = 0
+            self._save_quantizers()
+            self._encode_pending()
+
+    def drop(self):
+        with self._lock:
+            super().drop()
+            self._layout += 1
+            self.ivf, self._encoded_rows = None, 0
+
+    # ---------------------------------------------------------------- reads
+
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        where: Dict[str, Any] = None,
+        include: List[str] = ("metadatas", "documents", "distances"),
+        nprobe: int = None
+    ) -> Dict[str, Any]:
+        """Approximate k nearest records; exact when filtered or untrained"""
+        if where or self.ivf is None or not self.ivf.is_trained:
+            return super().query(query_embeddings, n_results, where, include)
+
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        with self._lock:
+            # Lists, matrix and row state as of one moment, so rows resolve consistently
+            ivf = self.ivf.snapshot()
+            matrix = self._matrix()
+            # Not copied: deletes clear rows in place (dropping them here too, which is
+            # fine) and growth or compaction swap in a new array, leaving this one intact
+            alive, n_rows = self._alive, len(self._ids)
+            state = self._row_state()
+        n_candidates = max(n_results * self.params["rescore_factor"], n_results)
+
+        rows_per_query, scores_per_query = [], []
+        for query in queries:
+            rows = ivf.search(query, n_candidates, nprobe)
+            rows = np.sort(rows[rows < n_rows])  # Sorted for sequential memmap reads
+            rows = rows[alive[rows]]  # Only the probed candidates' flags are read
+            scores = np.asarray(matrix[rows]) @ query
+            top = np.argsort(-scores)[:n_results]
+            rows_per_query.append(rows[top])
+            scores_per_query.append(scores[top])
+        return self._format_results(queries, rows_per_query, scores_per_query, include, state)
+
+    def recall(self, queries: np.ndarray, k: int = 10, nprobe: int = None) -> float:
+        """Fraction of the exact top-k found by the approximate search"""
+        approx = self.query(queries, k, include=[], nprobe=nprobe)["ids"]
+        exact = super().query(queries, k, include=[])["ids"]
+        hits = sum(len(set(a) & set(b)) for a, b in zip(approx, exact))
+        total = sum(len(b) for b in exact)
+        return hits / total if total else 1.0
+
+    def tune_nprobe(self, recall_target: float, n_queries: int = 200, k: int = 10) -> int:
+        """
+        Smallest nprobe (doubling from 1) whose recall@k on perturbed stored
+        vectors reaches `recall_target`
+
+        Returns:
+            The chosen nprobe, which is also stored for later queries
+        """
+        rng = np.random.default_rng(1)
+        with self._lock:
+            live = np.flatnonzero(self._alive[:len(self._ids)])
+            matrix = self._matrix()
+        queries = np.asarray(matrix[np.sort(rng.choice(live, size=min(n_queries, len(live)), replace=False))])
+        queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        nprobe = 1
+        while nprobe < self.ivf.nlist and self.recall(queries, k, nprobe) < recall_target:
+            nprobe *= 2
+        with self._lock:
+            self.ivf.nprobe = min(nprobe, self.ivf.nlist)
+            self._save_nprobe()
+            return self.ivf.nprobe
+
+    def get_index_stats(self) -> Dict[str, Any]:
+        """Training state, list layout and code size"""
+        if self.ivf is None or not self.ivf.is_trained:
+            return {"trained": False, "vectors": self.count(), "min_train_size": self.params["min_train_size"]}
+        sizes = self.ivf._list_sizes
+        return {
+            "trained": True,
+            "vectors": self.count(),
+            "nlist": self.ivf.nlist,
+            "nprobe": self.ivf.nprobe,
+            "m": self.ivf.m,
+            "code_bytes_per_vector": self.ivf.m + 8,  # PQ codes + row number
+            "mean_list_size": float(sizes.mean()),
+            "max_list_size": int(sizes.max()),
+            "scanned_fraction": round(self.ivf.nprobe / self.ivf.nlist, 4),
+        }
@@ -0,0 +1,564 @@
+"""In-process brute-force vector collection over a memory-mapped float32 matrix"""
+
+import json
+import os
+import shutil
+import threading
+from array import array
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from indexes.buffers import grow
+
+# Metadata value kinds; Chroma never matches a bool against a number
+_MISSING, _BOOL, _NUMBER, _STRING = 0, 1, 2, 3
+_GATHER_FRACTION = 0.2  # Filters matching more of the rows are scored against the whole matrix
+
+
+def _kind(value) -> int:
+    if isinstance(value, bool):
+        return _BOOL
+    if isinstance(value, (int, float)):
+        return _NUMBER
+    return _STRING
+
+
+class _Column:
+    """
+    One metadata key: values plus their kinds, row-aligned with the collection,
+    and the indexes filters are answered from
+
+    `postings` maps each (kind, value) to the rows that were given it, in
+    row order; rows whose value changed since stay listed until the postings
+    are rebuilt, so lookups re-check them while `stale` is non-zero.
+    `numbers` holds numeric values as float64 (NaN otherwise) for range
+    predicates; it is only allocated once a number is stored.
+    """
+
+    def __init__(self, capacity: int):
+        self.values = np.full(capacity, None, dtype=object)
+        self.kinds = np.zeros(capacity, dtype=np.int8)
+        self.numbers: Optional[np.ndarray] = None
+        self.postings: Dict[Tuple[int, Any], array] = {}
+        self.entries = 0  # Posting entries, stale ones included
+        self.stale = 0
+
+    @classmethod
+    def from_values(cls, values: List[Any]) -> "_Column":
+        """Column holding row-aligned `values` (None = missing), indexed in one pass"""
+        column = cls(len(values))
+        kinds = [_MISSING if value is None else _kind(value) for value in values]
+        column.values[:] = values
+        column.kinds[:] = kinds
+        if _NUMBER in kinds:
+            column.numbers = np.array(
+                [value if kind == _NUMBER else np.nan for kind, value in zip(kinds, values)], dtype=np.float64
+            )
+        groups: Dict[Tuple[int, Any], List[int]] = {}
+        for row, key in enumerate(zip(kinds, values)):
+            if key[0] != _MISSING:
+                groups.setdefault(key, []).append(row)
+        column.postings = {key: array("i", rows) for key, rows in groups.items()}
+        column.entries = len(values) - kinds.count(_MISSING)
+        return column
+
+    def ensure(self, used: int, extra: int):
+        self.values = grow(self.values, used, extra, fill=None)
+        self.kinds = grow(self.kinds, used, extra, fill=_MISSING)
+        if self.numbers is not None:
+            self.numbers = grow(self.numbers, used, extra, fill=np.nan)
+
+    def set(self, row: int, value):
+        kind = _MISSING if value is None else _kind(value)
+        if self.kinds[row] != _MISSING:
+            if self.kinds[row] == kind and self.values[row] == value:
+                return
+            self.stale += 1
+        self.values[row] = value
+        self.kinds[row] = kind
+        if kind == _NUMBER and self.numbers is None:
+            self.numbers = np.full(len(self.values), np.nan)
+        if self.numbers is not None:
+            self.numbers[row] = value if kind == _NUMBER else np.nan
+        if kind != _MISSING:
+            rows = self.postings.get((kind, value))
+            if rows is None:
+                rows = self.postings[(kind, value)] = array("i")
+            rows.append(row)
+            self.entries += 1
+        if self.stale > 1024 and self.stale > self.entries // 2:
+            self.rebuild_postings(len(self.values))
+
+    def rebuild_postings(self, n_rows: int):
+        """Drop stale posting entries"""
+        self.postings = {}
+        for row in np.flatnonzero(self.kinds[:n_rows] != _MISSING):
+            key = (int(self.kinds[row]), self.values[row])
+            rows = self.postings.get(key)
+            if rows is None:
+                rows = self.postings[key] = array("i")
+            rows.append(row)
+        self.entries = sum(len(rows) for rows in self.postings.values())
+        self.stale = 0
+
+    def equal_rows(self, value, n_rows: int) -> np.ndarray:
+        """Rows (below n_rows) whose value equals `value`"""
+        kind = _kind(value)
+        rows = self.postings.get((kind, value))
+        if not rows:
+            return np.zeros(0, dtype=np.int64)
+        rows = np.array(rows, dtype=np.int64)
+        rows = rows[rows < n_rows]
+        if self.stale:
+            rows = rows[(self.kinds[rows] == kind) & (self.values[rows] == value)]
+        return rows
+
+    def range_mask(self, op: str, value, n_rows: int) -> np.ndarray:
+        """Rows holding a number that compares true against `value`"""
+        if self.numbers is None:
+            return np.zeros(n_rows, dtype=bool)
+        compare = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}[op]
+        return compare(self.numbers[:n_rows], value)  # NaN (non-number) compares false
+
+
+class NumpyCollection:
+    """
+    Chroma-compatible collection answered with one matrix multiply
+
+    Embeddings are unit-normalized into a float32 matrix (memory-mapped from
+    `vectors.f32` when persisted) and queries are scored with Q @ V.T plus an
+    argpartition top-k. Metadata lives in per-key columns so `where` filters
+    are evaluated as vectorized masks. Distances are squared L2 between unit
+    vectors (Chroma's default space for normalized embeddings).
+
+    Supports the subset of the Chroma collection API used by VectorStore:
+    add, upsert, update (metadata merge), delete, get, query, count, modify.
+
+    Row storage (ids, documents, metadata columns, vector file) is only ever
+    appended to; compaction builds new storage and swaps it in. A reader
+    can therefore take references to it under the lock and keep using them
+    after releasing it, without rows being renumbered underneath.
+    """
+
+    def __init__(self, name: str, path: Optional[str] = None):
+        self.name = name
+        self.path = path
+        self.metadata: Optional[Dict[str, Any]] = None
+        self._lock = threading.RLock()
+        self._reset()
+        if path:
+            self._recover_compaction()
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    def _reset(self):
+        self.dim: Optional[int] = None
+        self._ids: List[str] = []  # Row -> id
+        self._rows: Dict[str, int] = {}  # Id -> live row
+        self._documents: List[Optional[str]] = []
+        self._columns: Dict[str, _Column] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._vectors = np.zeros((0, 0), dtype=np.float32)  # In-memory mode only
+        self._mapped = None  # Memmap of vectors.f32 when persisted
+        self._mapped_rows = 0
+
+    # ----------------------------------------------------------------- files
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _sibling(self, suffix: str) -> str:
+        return f"{self.path.rstrip(os.sep)}.{suffix}"
+
+    def _recover_compaction(self):
+        """Finish or roll back a compaction that was interrupted (see _compact)"""
+        previous = self._sibling("old")
+        if os.path.isdir(previous):
+            if os.path.isdir(self.path):
+                shutil.rmtree(previous)  # The compacted directory was already in place
+            else:
+                os.replace(previous, self.path)  # Interrupted between the two renames
+        shutil.rmtree(self._sibling("compact"), ignore_errors=True)
+
+    def _load(self):
+        if os.path.exists(self._file("collection.json")):
+            with open(self._file("collection.json"), encoding="utf-8") as f:
+                info = json.load(f)
+            self.metadata = info.get("metadata")
+            self.dim = info.get("dim")
+        if self.dim is None or not os.path.exists(self._file("log.jsonl")):
+            return
+
+        n_vectors = os.path.getsize(self._file("vectors.f32")) // (self.dim * 4)
+        records = []
+        with open(self._file("log.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break  # Torn final line after a crash
+        for record in records:
+            op = record["op"]
+            if op == "add":
+                if len(self._ids) >= n_vectors:
+                    break  # Vector row never made it to disk
+                self._append_row(record["id"], record["document"], record["metadata"])
+            elif op == "update":
+                row = self._rows.get(record["id"])
+                if row is not None:
+                    self._merge_metadata(row, record["metadata"])
+            elif op == "delete":
+                self._delete_rows([record["id"]])
+
+        with open(self._file("vectors.f32"), "r+b") as f:
+            f.truncate(len(self._ids) * self.dim * 4)
+
+    def _save_info(self):
+        if self.path:
+            with open(self._file("collection.json"), "w", encoding="utf-8") as f:
+                json.dump({"name": self.name, "metadata": self.metadata, "dim": self.dim}, f)
+
+    def _log(self, records: List[Dict[str, Any]]):
+        if self.path and records:
+            with open(self._file("log.jsonl"), "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+
+    def _matrix(self) -> np.ndarray:
+        """The (rows, dim) vector matrix including dead rows"""
+        n_rows = len(self._ids)
+        if not self.path:
+            return self._vectors[:n_rows]
+        if self._mapped is None or self._mapped_rows != n_rows:
+            if n_rows == 0:
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            self._mapped = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(n_rows, self.dim))
+            self._mapped_rows = n_rows
+        return self._mapped
+
+    def drop(self):
+        """Remove everything, including files"""
+        with self._lock:
+            if self.path:
+                shutil.rmtree(self.path, ignore_errors=True)
+                shutil.rmtree(self._sibling("compact"), ignore_errors=True)
+            self.metadata = None
+            self._reset()
+
+    # ---------------------------------------------------------------- writes
+
+    def _append_row(self, chunk_id: str, document: Optional[str], metadata: Optional[Dict[str, Any]]):
+        row = len(self._ids)
+        self._alive = grow(self._alive, row, 1, fill=False)
+        for column in self._columns.values():
+            column.ensure(row, 1)
+        previous = self._rows.get(chunk_id)
+        if previous is not None:
+            self._alive[previous] = False
+        self._ids.append(chunk_id)
+        self._documents.append(document)
+        self._rows[chunk_id] = row
+        self._alive[row] = True
+        for key, value in (metadata or {}).items():
+            self._column(key).set(row, value)
+
+    def _column(self, key: str) -> _Column:
+        column = self._columns.get(key)
+        if column is None:
+            column = _Column(len(self._alive))
+            self._columns[key] = column
+        return column
+
+    def _metadata(self, row: int, columns: Dict[str, _Column] = None) -> Optional[Dict[str, Any]]:
+        metadata = {
+            key: column.values[row]
+            for key, column in (self._columns if columns is None else columns).items()
+            if column.kinds[row] != _MISSING
+        }
+        return metadata or None
+
+    def _merge_metadata(self, row: int, metadata: Optional[Dict[str, Any]]):
+        for key, value in (metadata or {}).items():
+            self._column(key).set(row, value)
+
+    def _write(self, ids: List[str], embeddings, documents, metadatas, existing: str):
+        """Append rows; `existing` ids are 'skip'ped (add) or 'merge'd (upsert)"""
+        if not ids:
+            return
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._vectors = self._vectors.reshape(0, self.dim)
+                self._save_info()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match collection dimensionality {self.dim}")
+
+            keep, rows = [], []
+            for i, chunk_id in enumerate(ids):
+                row = self._rows.get(chunk_id)
+                if row is not None:
+                    if existing == "skip":
+                        continue
+                    # Chroma's upsert merges metadata into the existing record's
+                    metadata = self._metadata(row) or {}
+                    metadata.update(metadatas[i] or {})
+                    metadatas[i] = metadata
+                keep.append(i)
+            if not keep:
+                return
+
+            block = vectors[keep]
+            if self.path:
+                with open(self._file("vectors.f32"), "ab") as f:
+                    f.write(block.tobytes())
+            else:
+                self._vectors = grow(self._vectors, len(self._ids), len(keep))
+                self._vectors[len(self._ids):len(self._ids) + len(keep)] = block
+            start = len(self._ids)
+            for i in keep:
+                self._append_row(ids[i], documents[i], metadatas[i])
+                rows.append({"op": "add", "id": ids[i], "document": documents[i], "metadata": metadatas[i]})
+            self._log(rows)
+            self._rows_added(start, block)
+
+    def _rows_added(self, start: int, vectors: np.ndarray):
+        """Hook for subclasses that index rows [start, start + len(vectors))"""
+
+    def add(self, ids: List[str], embeddings, documents: List[str] = None, metadatas: List[Dict] = None):
+        """Insert records; ids that already exist are ignored (as in Chroma)"""
+        self._write(list(ids), embeddings, documents, list(metadatas) if metadatas else None, existing="skip")
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str] = None, metadatas: List[Dict] = None):
+        """Insert records or replace existing ones (metadata is merged)"""
+        self._write(list(ids), embeddings, documents, list(metadatas) if metadatas else None, existing="merge")
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Merge metadata into existing records (unknown ids are ignored)"""
+        with self._lock:
+            records = []
+            for chunk_id, metadata in zip(ids, metadatas):
+                row = self._rows.get(chunk_id)
+                if row is not None:
+                    self._merge_metadata(row, metadata)
+                    records.append({"op": "update", "id": chunk_id, "metadata": metadata})
+            self._log(records)
+
+    def delete(self, ids: List[str] = None, where: Dict[str, Any] = None):
+        """Delete records by id and/or metadata filter"""
+        with self._lock:
+            rows = self._select(ids, where)
+            deleted = [self._ids[row] for row in rows]
+            self._delete_rows(deleted)
+            self._log([{"op": "delete", "id": chunk_id} for chunk_id in deleted])
+            if self.path and len(self._rows) < 0.5 * len(self._ids):
+                self._compact()
+
+    def _delete_rows(self, ids: List[str]):
+        for chunk_id in ids:
+            row = self._rows.pop(chunk_id, None)
+            if row is not None:
+                self._alive[row] = False
+
+    def _compact(self, block_rows: int = 65536):
+        """
+        Rewrite the files without dead rows
+
+        The live rows are written to a sibling directory, which then replaces
+        the collection's (the old one is kept as `<path>.old` until the new
+        one is in place, and _recover_compaction completes or undoes an
+        interrupted swap). The in-memory state is swapped in as new objects,
+        so readers holding the old ones are unaffected.
+        """
+        live = np.flatnonzero(self._alive[:len(self._ids)])
+        matrix = self._matrix()
+        compact_path, previous = self._sibling("compact"), self._sibling("old")
+        shutil.rmtree(compact_path, ignore_errors=True)
+        compacted = NumpyCollection(self.name, compact_path)
+        compacted.metadata, compacted.dim = self.metadata, self.dim
+        compacted._save_info()
+        for start in range(0, len(live), block_rows):
+            rows = live[start:start + block_rows]
+            compacted.add(
+                [self._ids[row] for row in rows],
+                np.asarray(matrix[rows]),
+                [self._documents[row] for row in rows],
+                [self._metadata(row) for row in rows]
+            )
+
+        shutil.rmtree(previous, ignore_errors=True)
+        os.replace(self.path, previous)
+        os.replace(compact_path, self.path)
+        shutil.rmtree(previous, ignore_errors=True)
+
+        self._ids, self._rows, self._documents = compacted._ids, compacted._rows, compacted._documents
+        self._columns, self._alive = compacted._columns, compacted._alive
+        self._mapped, self._mapped_rows = None, 0
+
+    def modify(self, metadata: Dict[str, Any] = None, name: str = None):
+        """Replace the collection-level metadata"""
+        with self._lock:
+            if metadata is not None:
+                self.metadata = dict(metadata)
+            if self.path:
+                os.makedirs(self.path, exist_ok=True)
+                self._save_info()
+
+    # ----------------------------------------------------------------- reads
+
+    def count(self) -> int:
+        return len(self._rows)
+
+    def _row_state(self) -> Tuple[List[str], Any, Dict[str, _Column]]:
+        """Ids, documents and metadata columns to resolve rows with after the lock is released"""
+        return self._ids, self._documents, self._columns
+
+    def _where_mask(self, where: Dict[str, Any], n_rows: int) -> np.ndarray:
+        """Boolean row mask of a Chroma `where` filter"""
+        if len(where) != 1:
+            raise ValueError(f"Expected where to have exactly one operator, got {where}")
+        key, condition = next(iter(where.items()))
+        if key in ("$and", "$or"):
+            masks = [self._where_mask(clause, n_rows) for clause in condition]
+            return np.logical_and.reduce(masks) if key == "$and" else np.logical_or.reduce(masks)
+
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        if len(condition) != 1:
+            raise ValueError(f"Expected operator expression to have exactly one operator, got {condition}")
+        op, value = next(iter(condition.items()))
+
+        column = self._columns.get(key)
+        if op in ("$eq", "$ne", "$in", "$nin"):
+            mask = np.zeros(n_rows, dtype=bool)
+            if column is not None:
+                for item in (value if op in ("$in", "$nin") else [value]):
+                    mask[column.equal_rows(item, n_rows)] = True
+            return mask if op in ("$eq", "$in") else ~mask  # $ne / $nin also match rows missing the key
+        if op in ("$gt", "$gte", "$lt", "$lte"):
+            if column is None:
+                return np.zeros(n_rows, dtype=bool)
+            return column.range_mask(op, value, n_rows)
+        raise ValueError(f"Unsupported where operator {op}")
+
+    def _select(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """Live rows matching ids and where, in storage order"""
+        n_rows = len(self._ids)
+        mask = self._alive[:n_rows].copy()
+        if ids is not None:
+            wanted = np.zeros(n_rows, dtype=bool)
+            wanted[[self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows]] = True
+            mask &= wanted
+        if where:
+            mask &= self._where_mask(where, n_rows)
+        return np.flatnonzero(mask)
+
+    def get(
+        self,
+        ids: List[str] = None,
+        where: Dict[str, Any] = None,
+        limit: int = None,
+        offset: int = None,
+        include: List[str] = ("metadatas", "documents")
+    ) -> Dict[str, Any]:
+        """Records by id and/or filter, in storage order"""
+        with self._lock:
+            rows = self._select(ids, where)[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+            return {
+                "ids": [self._ids[row] for row in rows],
+                "documents": [self._documents[row] for row in rows] if "documents" in include else None,
+                "metadatas": [self._metadata(row) for row in rows] if "metadatas" in include else None,
+                "embeddings": np.array(self._matrix()[rows]) if "embeddings" in include else None,
+                "included": list(include),
+            }
+
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        where: Dict[str, Any] = None,
+        include: List[str] = ("metadatas", "documents", "distances")
+    ) -> Dict[str, Any]:
+        """k nearest records of each query embedding (one matrix multiply for all queries)"""
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        with self._lock:
+            n_rows = len(self._ids)
+            matrix = self._matrix()
+            filtered = self._select(where=where) if where else None
+            alive = self._alive[:n_rows].copy()
+            state = self._row_state()
+
+        if filtered is not None and len(filtered) <= _GATHER_FRACTION * n_rows:
+            scores = queries @ np.asarray(matrix[filtered]).T  # Score only the filtered rows
+            n_live = len(filtered)
+        else:
+            # Broad filters: one pass over the matrix beats gathering most of its rows
+            scores = queries @ matrix.T
+            if filtered is not None:
+                alive = np.zeros(n_rows, dtype=bool)
+                alive[filtered] = True
+                filtered = None
+            scores[:, ~alive] = -np.inf
+            n_live = int(alive.sum())
+        k = min(n_results, n_live)
+
+        rows_per_query, scores_per_query = [], []
+        for row_scores in scores:
+            top = np.argpartition(-row_scores, k - 1)[:k] if k else np.zeros(0, dtype=np.int64)
+            top = top[np.argsort(-row_scores[top])]
+            rows_per_query.append(filtered[top] if filtered is not None else top)
+            scores_per_query.append(row_scores[top])
+        return self._format_results(queries, rows_per_query, scores_per_query, include, state)
+
+    def _format_results(
+        self,
+        queries: np.ndarray,
+        rows_per_query: List[np.ndarray],
+        scores_per_query: List[np.ndarray],
+        include,
+        state: Tuple[List[str], Any, Dict[str, _Column]]
+    ) -> Dict[str, Any]:
+        """
+        Chroma-shaped query results from ranked rows and their dot products
+
+        Rows are resolved against `state`, the _row_state() taken together
+        with the matrix they were scored on.
+        """
+        ids, documents, columns = state
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        results = {"ids": [], "distances": [], "documents": [], "metadatas": []}
+        for i, (rows, scores) in enumerate(zip(rows_per_query, scores_per_query)):
+            results["ids"].append([ids[row] for row in rows])
+            # ||q - v||^2 for unit v
+            results["distances"].append((query_norms[i] + 1.0 - 2.0 * np.asarray(scores)).astype(float).tolist())
+            results["documents"].append([documents[row] for row in rows])
+            if "metadatas" in include:
+                results["metadatas"].append([self._metadata(row, columns) for row in rows])
+        for field in ("documents", "metadatas", "distances"):
+            if field not in include:
+                results[field] = None
+        return results
+
+
+class NumpyClient:
+    """Minimal Chroma-client stand-in that hands out NumpyCollections"""
+
+    def __init__(self, path: Optional[str] = None, collection_class=None):
+        self.path = path
+        self.collection_class = collection_class or NumpyCollection
+        self._collections: Dict[str, NumpyCollection] = {}
+
+    def get_or_create_collection(self, name: str) -> NumpyCollection:
+        if name not in self._collections:
+            self._collections[name] = self.collection_class(name, os.path.join(self.path, name) if self.path else None)
+        return self._collections[name]
+
+    def delete_collection(self, name: str):
+        self.get_or_create_collection(name).drop()
+        del self._collections[name]
@@ -0,0 +1,215 @@
+"""Compact int8 / float16 vector collection with exact float32 rescoring"""
+
+import os
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from indexes.buffers import grow
+from indexes.numpy_collection import NumpyCollection, _GATHER_FRACTION
+from config import VECTOR_STORE_CONFIG
+
+DTYPES = {"int8": np.int8, "float16": np.float16}
+_SCORE_BLOCK_ROWS = 16384  # Bounds the float32 copy of the codes made per block
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Codes and per-row scales of float32 vectors (int8: symmetric per-vector scale)"""
+    if dtype == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class QuantizedCollection(NumpyCollection):
+    """
+    NumpyCollection searched through int8 or float16 codes
+
+    Only the codes and one float32 scale per row are held in memory; the
+    float32 vectors stay in the collection's memory-mapped `vectors.f32`
+    and are read only for the best `rescore_factor * n` candidates of each
+    query, which are rescored exactly. Filtered queries score just the
+    rows matching the filter. Codes are persisted row-aligned in
+    `quantized_codes.bin` / `quantized_scales.f32` next to the collection's
+    own files; rows missing from them (after a crash) are re-encoded on open.
+
+    In-memory collections (no path) keep the float32 rows in RAM as well,
+    so they save nothing over the numpy backend.
+    """
+
+    def __init__(self, name: str, path: Optional[str] = None, dtype: str = None, rescore_factor: int = None):
+        self.dtype = dtype or VECTOR_STORE_CONFIG["quantization"]
+        if self.dtype not in DTYPES:
+            raise ValueError(f"Unknown quantization '{self.dtype}', expected one of {tuple(DTYPES)}")
+        self.rescore_factor = max(1, rescore_factor or VECTOR_STORE_CONFIG["rescore_factor"])
+        self._codes = np.zeros((0, 0), dtype=DTYPES[self.dtype])
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._encoded_rows = 0
+        super().__init__(name, path)
+        self._restore_codes()
+
+    # ---------------------------------------------------------------- files
+
+    def _restore_codes(self):
+        """Load persisted codes, encoding rows added since"""
+        n_rows = len(self._ids)
+        if self.path and self.dim and os.path.exists(self._file("quantized_codes.bin")):
+            item = np.dtype(DTYPES[self.dtype]).itemsize
+            n_rows = min(
+                n_rows,
+                os.path.getsize(self._file("quantized_codes.bin")) // (self.dim * item),
+                os.path.getsize(self._file("quantized_scales.f32")) // 4,
+            )
+            self._codes = np.fromfile(self._file("quantized_codes.bin"), dtype=DTYPES[self.dtype],
+                                      count=n_rows * self.dim).reshape(n_rows, self.dim)
+            self._scales = np.fromfile(self._file("quantized_scales.f32"), dtype=np.float32, count=n_rows)
+        else:
+            n_rows = 0
+        self._encoded_rows = n_rows
+        self._rewrite_code_files(n_rows)
+        self._encode_pending()
+
+    def _rewrite_code_files(self, n_rows: int):
+        """Cut the code files to their first n_rows rows (creating them if missing)"""
+        if not self.path or not self.dim:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        item = np.dtype(DTYPES[self.dtype]).itemsize
+        for name, row_bytes in (("quantized_codes.bin", self.dim * item), ("quantized_scales.f32", 4)):
+            with open(self._file(name), "ab") as f:
+                f.truncate(n_rows * row_bytes)
+
+    # --------------------------------------------------------------- writes
+
+    def _rows_added(self, start: int, vectors: np.ndarray):
+        self._encode_pending()
+
+    def _encode_pending(self, block_rows: int = 65536):
+        """Quantize stored rows that have no codes yet (called with the lock held)"""
+        if not self.dim:
+            return
+        if self._codes.shape[1] != self.dim:
+            self._codes = self._codes.reshape(0, self.dim)
+        matrix = self._matrix()
+        while self._encoded_rows < len(self._ids):
+            start = self._encoded_rows
+            end = min(start + block_rows, len(self._ids))
+            codes, scales = quantize(np.asarray(matrix[start:end]), self.dtype)
+            if self.path:
+                with open(self._file("quantized_codes.bin"), "ab") as f:
+                    f.write(codes.tobytes())
+                with open(self._file("quantized_scales.f32"), "ab") as f:
+                    f.write(scales.tobytes())
+            self._codes = grow(self._codes, start, end - start)
+            self._scales = grow(self._scales, start, end - start)
+            self._codes[start:end] = codes
+            self._scales[start:end] = scales
+            self._encoded_rows = end
+
+    def _compact(self):
+        live = np.flatnonzero(self._alive[:len(self._ids)])
+        codes, scales = self._codes[live], self._scales[live]  # New arrays: readers keep the old ones
+        super()._compact()
+        self._codes, self._scales = codes, scales
+        self._encoded_rows = 0
+        self._rewrite_code_files(0)
+        if self.path:
+            with open(self._file("quantized_codes.bin"), "ab") as f:
+                f.write(codes.tobytes())
+            with open(self._file("quantized_scales.f32"), "ab") as f:
+                f.write(scales.tobytes())
+        self._encoded_rows = len(live)
+
+    def drop(self):
+        with self._lock:
+            super().drop()
+            self._codes = np.zeros((0, 0), dtype=DTYPES[self.dtype])
+            self._scales = np.zeros(0, dtype=np.float32)
+            self._encoded_rows = 0
+
+    # ---------------------------------------------------------------- reads
+
+    @staticmethod
+    def _code_scores(queries: np.ndarray, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        """Approximate dot products of the queries with the coded rows"""
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), _SCORE_BLOCK_ROWS):
+            end = min(start + _SCORE_BLOCK_ROWS, len(codes))
+            scores[:, start:end] = (queries @ codes[start:end].T.astype(np.float32)) * scales[start:end]
+        return scores
+
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        where: Dict[str, Any] = None,
+        include: List[str] = ("metadatas", "documents", "distances"),
+        rescore: bool = True
+    ) -> Dict[str, Any]:
+        """k nearest records scored on the codes, the best candidates rescored in float32"""
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        with self._lock:
+            n_rows = self._encoded_rows
+            matrix = self._matrix()
+            codes, scales = self._codes[:n_rows], self._scales[:n_rows]
+            selected = self._select(where=where)
+            state = self._row_state()
+        selected = selected[selected < n_rows]
+
+        if len(selected) <= _GATHER_FRACTION * n_rows:
+            approx = self._code_scores(queries, codes[selected], scales[selected])  # Only the matching rows
+            rows_of = selected
+        else:
+            # Broad filters (or none): one pass over the codes beats gathering most of them
+            approx = self._code_scores(queries, codes, scales)
+            excluded = np.ones(n_rows, dtype=bool)
+            excluded[selected] = False
+            approx[:, excluded] = -np.inf
+            rows_of = None
+        k = min(n_results, len(selected))
+        n_candidates = min(len(selected), k * self.rescore_factor) if rescore else k
+
+        rows_per_query, scores_per_query = [], []
+        for query, row_scores in zip(queries, approx):
+            if not k:
+                rows_per_query.append(np.zeros(0, dtype=np.int64))
+                scores_per_query.append(np.zeros(0, dtype=np.float32))
+                continue
+            candidates = np.argpartition(-row_scores, n_candidates - 1)[:n_candidates]
+            rows = rows_of[candidates] if rows_of is not None else candidates
+            if rescore:
+                order = np.argsort(rows)  # Sequential memmap reads
+                rows = rows[order]
+                scores = np.asarray(matrix[rows]) @ query
+            else:
+                scores = row_scores[candidates]
+            top = np.argsort(-scores)[:k]
+            rows_per_query.append(rows[top])
+            scores_per_query.append(scores[top])
+        return self._format_results(queries, rows_per_query, scores_per_query, include, state)
+
+    def recall(self, queries: np.ndarray, k: int = 10, rescore: bool = True) -> float:
+        """Fraction of the exact float32 top-k that the quantized search returns"""
+        found = self.query(queries, k, include=[], rescore=rescore)["ids"]
+        exact = super().query(queries, k, include=[])["ids"]
+        hits = sum(len(set(a) & set(b)) for a, b in zip(found, exact))
+        total = sum(len(b) for b in exact)
+        return hits / total if total else 1.0
+
+    def get_index_stats(self) -> Dict[str, Any]:
+        """Vector count and resident memory per vector (codes, plus float32 rows when in memory)"""
+        dim = self.dim or 0
+        code_bytes = dim * np.dtype(DTYPES[self.dtype]).itemsize + self._scales.itemsize
+        resident = code_bytes + (0 if self.path else dim * 4)
+        return {
+            "dtype": self.dtype,
+            "vectors": self.count(),
+            "dead_rows": len(self._ids) - self.count(),
+            "dimension": dim,
+            "code_bytes_per_vector": code_bytes,
+            "resident_bytes_per_vector": resident,  # Metadata, ids and documents not included
+            "float32_bytes_per_vector": dim * 4,
+            "float32_memory_mapped": bool(self.path),
+            "compression": round(dim * 4 / resident, 2) if dim else 0.0,
+            "rescore_factor": self.rescore_factor,
+        }
@@ -0,0 +1,236 @@
+"""Hash-partitioned collection that fans writes and queries out to shard collections"""
+
+import hashlib
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable
+import numpy as np
+
+
+def shard_of(chunk_id: str, n_shards: int) -> int:
+    """Shard a chunk id belongs to (stable across processes, unlike hash())"""
+    if n_shards <= 1:
+        return 0
+    return int.from_bytes(hashlib.blake2b(chunk_id.encode("utf-8"), digest_size=8).digest(), "big") % n_shards
+
+
+def shard_name(name: str, shard: int) -> str:
+    """Collection name of a shard; shard 0 keeps the unsharded name"""
+    return name if shard == 0 else f"{name}_shard{shard}"
+
+
+class ShardedCollection:
+    """
+    Chroma-collection lookalike over N shard collections
+
+    Records are routed to `shard_of(id)`; writes are split per shard and
+    all shards are written concurrently, queries run on every shard at once
+    and the per-shard top-k lists are merged by distance. Collection-level
+    metadata (index settings, shard count) lives on shard 0, which is the
+    collection an unsharded store uses, so both layouts record it in the
+    same place.
+
+    Supports the subset of the collection API used by VectorStore: add,
+    upsert, update, delete, get, query, count, modify.
+    """
+
+    def __init__(self, shards: List[Any], executor: Optional[ThreadPoolExecutor] = None):
+        self.shards = shards
+        self._executor = executor or ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="shard")
+
+    @property
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        return self.shards[0].metadata
+
+    def modify(self, metadata: Dict[str, Any] = None, **kwargs):
+        self.shards[0].modify(metadata=metadata, **kwargs)
+
+    def _map(self, fn: Callable, items: List[Any]) -> List[Any]:
+        """fn over items on the shard threads (inline when there is only one)"""
+        if len(items) == 1:
+            return [fn(items[0])]
+        return list(self._executor.map(fn, items))
+
+    def _partition(self, ids: List[str]) -> Dict[int, List[int]]:
+        """Positions of ids per shard"""
+        parts: Dict[int, List[int]] = {}
+        for position, chunk_id in enumerate(ids):
+            parts.setdefault(shard_of(chunk_id, len(self.shards)), []).append(position)
+        return parts
+
+    # ---------------------------------------------------------------- writes
+
+    def _write(self, method: str, ids: List[str], embeddings=None, documents=None, metadatas=None):
+        ids = list(ids)
+
+        def write(part):
+            shard, positions = part
+            kwargs = {"ids": [ids[p] for p in positions]}
+            if embeddings is not None:
+                # Keep the caller's type: arrays are sliced, lists are not converted
+                kwargs["embeddings"] = (
+                    embeddings[positions] if isinstance(embeddings, np.ndarray) else [embeddings[p] for p in positions]
+                )
+            if documents is not None:
+                kwargs["documents"] = [documents[p] for p in positions]
+            if metadatas is not None:
+                kwargs["metadatas"] = [metadatas[p] for p in positions]
+            getattr(self.shards[shard], method)(**kwargs)
+
+        self._map(write, list(self._partition(ids).items()))
+
+    def add(self, ids: List[str], embeddings, documents: List[str] = None, metadatas: List[Dict] = None):
+        self._write("add", ids, embeddings, documents, metadatas)
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str] = None, metadatas: List[Dict] = None):
+        self._write("upsert", ids, embeddings, documents, metadatas)
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        self._write("update", ids, metadatas=metadatas)
+
+    def delete(self, ids: List[str] = None, where: Dict[str, Any] = None):
+        if ids is None:
+            self._map(lambda shard: shard.delete(where=where), self.shards)
+            return
+        parts = self._partition(ids)
+        self._map(
+            lambda part: self.shards[part[0]].delete(ids=[ids[p] for p in part[1]], where=where),
+            list(parts.items())
+        )
+
+    # ----------------------------------------------------------------- reads
+
+    def count(self) -> int:
+        return sum(self._map(lambda shard: shard.count(), self.shards))
+
+    def get(
+        self,
+        ids: List[str] = None,
+        where: Dict[str, Any] = None,
+        limit: int = None,
+        offset: int = None,
+        include: List[str] = ("metadatas", "documents")
+    ) -> Dict[str, Any]:
+        """Records by id and/or filter, shard by shard (storage order within a shard)"""
+        include = list(include)
+        if ids is not None:
+            parts = self._partition(ids)
+            targets = [(self.shards[shard], [ids[p] for p in positions]) for shard, positions in parts.items()]
+        else:
+            targets = [(shard, None) for shard in self.shards]
+
+        if limit is None and not offset:
+            pages = self._map(lambda target: target[0].get(ids=target[1], where=where, include=include), targets)
+        else:
+            # Walk the shards in order, skipping whole shards that lie before the offset
+            pages, skip, remaining = [], offset or 0, limit
+            for shard, shard_ids in targets:
+                if remaining is not None and remaining <= 0:
+                    break
+                if skip:
+                    size = shard.count() if shard_ids is None and not where else len(
+                        shard.get(ids=shard_ids, where=where, include=[])["ids"]
+                    )
+                    if skip >= size:
+                        skip -= size
+                        continue
+                page = shard.get(ids=shard_ids, where=where, limit=remaining, offset=skip, include=include)
+                skip = 0
+                if remaining is not None:
+                    remaining -= len(page["ids"])
+                pages.append(page)
+
+        merged = {"ids": [], "included": include}
+        for field in ("documents", "metadatas", "embeddings"):
+            merged[field] = [] if field in include else None
+        for page in pages:
+            merged["ids"].extend(page["ids"])
+            for field in ("documents", "metadatas", "embeddings"):
+                if field in include and page.get(field) is not None:
+                    merged[field].extend(list(page[field]))
+        if "embeddings" in include:
+            merged["embeddings"] = np.asarray(merged["embeddings"], dtype=np.float32)
+        return merged
+
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        where: Dict[str, Any] = None,
+        include: List[str] = ("metadatas", "documents", "distances")
+    ) -> Dict[str, Any]:
+        """Per-shard top-k of every query, merged by distance"""
+        include = list(include)
+        shard_include = include if "distances" in include else include + ["distances"]
+        embeddings = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)).tolist()
+        shard_results = self._map(
+            lambda shard: shard.query(query_embeddings=embeddings, n_results=n_results, where=where,
+                                      include=shard_include),
+            self.shards
+        )
+
+        results = {"ids": [], "distances": [], "documents": [], "metadatas": []}
+        for q in range(len(embeddings)):
+            hits = heapq.nsmallest(n_results, (
+                (distance, shard, position)
+                for shard, result in enumerate(shard_results)
+                for position, distance in enumerate(result["distances"][q])
+            ))
+            results["ids"].append([shard_results[s]["ids"][q][p] for _, s, p in hits])
+            results["distances"].append([distance for distance, _, _ in hits])
+            for field in ("documents", "metadatas"):
+                if field in include:
+                    results[field].append([shard_results[s][field][q][p] for _, s, p in hits])
+        for field in ("documents", "metadatas", "distances"):
+            if field not in include:
+                results[field] = None
+        return results
+
+
+def rebalance(open_collection: Callable[[str], Any], drop_collection: Callable[[str], None], name: str,
+              from_shards: int, to_shards: int, page_size: int = 1000) -> int:
+    """
+    Move records between shard layouts without re-embedding them
+
+    Records are copied to their new shard before being deleted from the old
+    one, so an interrupted run leaves duplicates rather than losing chunks
+    and can simply be run again.
+
+    Args:
+        open_collection: Collection by name (created if missing)
+        drop_collection: Deletes a collection by name
+        name: Base collection name
+        from_shards: Current shard count
+        to_shards: Desired shard count
+
+    Returns:
+        Number of records moved
+    """
+    moved = 0
+    for shard in range(from_shards):
+        source = open_collection(shard_name(name, shard))
+        offset = 0
+        while True:
+            page = source.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            targets = {}
+            for position, chunk_id in enumerate(page["ids"]):
+                target = shard_of(chunk_id, to_shards)
+                if target != shard:
+                    targets.setdefault(target, []).append(position)
+            for target, positions in targets.items():
+                open_collection(shard_name(name, target)).upsert(
+                    ids=[page["ids"][p] for p in positions],
+                    embeddings=np.asarray(page["embeddings"], dtype=np.float32)[positions].tolist(),
+                    documents=[page["documents"][p] for p in positions],
+                    metadatas=[page["metadatas"][p] for p in positions],
+                )
+            leaving = [page["ids"][p] for positions in targets.values() for p in positions]
+            if leaving:
+                source.delete(ids=leaving)
+            moved += len(leaving)
+            offset += len(page["ids"]) - len(leaving)  # Deleted rows no longer occupy the page
+    for shard in range(to_shards, from_shards):
+        drop_collection(shard_name(name, shard))
+    return moved
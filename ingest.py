@@ -0,0 +1,634 @@
+"""Parallel, streaming and incremental ingestion pipeline for the vector store"""
+
+import hashlib
+import json
+import mmap
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Any, Optional, Tuple
+from preprocess import list_document_paths, process_text, iter_file_chunks
+from utils.dedupe import NearDuplicateFilter
+from config import INGEST_CONFIG, DEDUPE_CONFIG
+
+
+class IngestStats:
+    """Progress and throughput counters for an ingest run"""
+
+    def __init__(self, total_files: int = 0):
+        self.total_files = total_files
+        self.files = 0
+        self.files_unchanged = 0
+        self.files_added = 0
+        self.files_changed = 0
+        self.files_removed = 0
+        self.chunks = 0
+        self.chunks_written = 0
+        self.chunks_reused = 0
+        self.chunks_deleted = 0
+        self.chunks_deduplicated = 0
+        self.batches = 0
+        self.start_time = time.perf_counter()
+        self.end_time = None
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        end = self.end_time or time.perf_counter()
+        return max(end - self.start_time, 1e-9)
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.elapsed
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks_written / self.elapsed
+
+    def record_file(self, n_chunks: int):
+        with self._lock:
+            self.files += 1
+            self.chunks += n_chunks
+
+    def record_batch(self, n_chunks: int):
+        with self._lock:
+            self.batches += 1
+            self.chunks_written += n_chunks
+
+    def finish(self):
+        self.end_time = time.perf_counter()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "files": self.files,
+            "total_files": self.total_files,
+            "files_unchanged": self.files_unchanged,
+            "files_added": self.files_added,
+            "files_changed": self.files_changed,
+            "files_removed": self.files_removed,
+            "chunks": self.chunks,
+            "chunks_written": self.chunks_written,
+            "chunks_reused": self.chunks_reused,
+            "chunks_deleted": self.chunks_deleted,
+            "chunks_deduplicated": self.chunks_deduplicated,
+            "batches": self.batches,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "files_per_second": round(self.files_per_second, 2),
+            "chunks_per_second": round(self.chunks_per_second, 2),
+        }
+
+    def format(self) -> str:
+        deduplicated = f", {self.chunks_deduplicated} near-duplicates skipped" if self.chunks_deduplicated else ""
+        return (
+            f"{self.files}/{self.total_files} files, "
+            f"{self.chunks_written}/{self.chunks} chunks written{deduplicated} "
+            f"({self.files_per_second:.1f} files/s, {self.chunks_per_second:.1f} chunks/s)"
+        )
+
+
+class IndexManifest:
+    """Persisted per-file content hashes and chunk ids of an index"""
+
+    VERSION = 1
+
+    def __init__(self, path: Optional[str] = None, files: Dict[str, Dict[str, Any]] = None):
+        self.path = path
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "IndexManifest":
+        """Load a manifest, returning an empty one if it is missing or unreadable"""
+        path = path or INGEST_CONFIG["manifest_path"]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == cls.VERSION:
+                return cls(path, data.get("files", {}))
+        except (OSError, ValueError):
+            pass
+        return cls(path)
+
+    def save(self):
+        """Atomically write the manifest to disk"""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": self.VERSION, "files": self.files}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.files = {}
+
+    def is_unchanged(self, source: str, size: int, mtime_ns: int) -> bool:
+        """Cheap stat-based check; content hashes settle anything else"""
+        entry = self.files.get(source)
+        return bool(entry) and entry["size"] == size and entry["mtime_ns"] == mtime_ns
+
+
+def file_hash(data: bytes) -> str:
+    """Content hash of a document"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash_streaming(path: str, window_bytes: int = 16 * 1024 * 1024) -> str:
+    """Content hash of a (very large) document, read through a memory map"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for offset in range(0, size, window_bytes):
+                    digest.update(mm[offset:offset + window_bytes])
+    return digest.hexdigest()
+
+
+def assign_chunk_ids(chunks: List[Dict[str, Any]]) -> List[str]:
+    """
+    Derive stable ids from each chunk's source and text
+
+    Unchanged chunks keep their id when a file is edited elsewhere, so only
+    new text has to be embedded. Repeated text within one file gets a suffix.
+    """
+    ids = []
+    seen = {}
+    for chunk in chunks:
+        source = chunk["metadata"]["source"]
+        digest = hashlib.sha1(f"{source}\0{chunk['text']}".encode('utf-8')).hexdigest()[:20]
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(f"{source}:{digest}" if occurrence == 0 else f"{source}:{digest}:{occurrence}")
+    return ids
+
+
+def _process_path(path: str, known_hash: Optional[str] = None) -> Dict[str, Any]:
+    """Hash, clean and chunk one file (runs in a worker process)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    content_hash = file_hash(data)
+    chunks = None
+    if content_hash != known_hash:
+        chunks = process_text(data.decode('utf-8'), path)
+    return {"path": path, "hash": content_hash, "chunks": chunks}
+
+
+def _writer_loop(
+    vector_store,
+    manifest: IndexManifest,
+    op_queue: queue.Queue,
+    stats: IngestStats,
+    errors: List[BaseException]
+):
+    """
+    Apply write operations until the sentinel arrives (the index version moves once, at the end)
+
+    Manifest entries travel through the queue behind their file's writes, so
+    after the first failed write nothing more is recorded as indexed.
+    """
+    with vector_store.deferred_index_version():
+        while True:
+            op = op_queue.get()
+            if op is None:
+                return
+            if errors:
+                continue  # Drain the queue so the producer never blocks
+            try:
+                _apply_op(vector_store, manifest, op, stats)
+            except BaseException as e:
+                errors.append(e)
+
+
+def _apply_op(vector_store, manifest: IndexManifest, op: Tuple[str, Any], stats: IngestStats):
+    kind, payload = op
+    if kind == "manifest":
+        source, entry = payload
+        if entry is None:
+            manifest.files.pop(source, None)
+        else:
+            manifest.files[source] = entry
+    elif kind == "upsert":
+        vector_store.upsert_documents(
+            [chunk["text"] for chunk in payload],
+            [chunk["metadata"] for chunk in payload],
+            ids=[chunk["id"] for chunk in payload]
+        )
+        stats.record_batch(len(payload))
+    elif kind == "update":
+        vector_store.update_metadatas(
+            [chunk["id"] for chunk in payload],
+            [chunk["metadata"] for chunk in payload]
+        )
+    elif kind == "delete":
+        vector_store.delete_documents(payload)
+    elif kind == "delete_where":
+        vector_store.delete_where(payload)
+    elif kind == "update_where":
+        vector_store.update_metadata_where(payload["where"], payload["values"])
+
+
+def _seed_duplicate_filter(
+    duplicate_filter: NearDuplicateFilter,
+    vector_store,
+    skip_sources: set,
+    page_size: int = 5000
+) -> Dict[str, int]:
+    """
+    Register the indexed chunks of files a run leaves alone, page by page
+
+    Returns:
+        Number of aliases each seeded chunk already records in duplicate_ids
+    """
+    seeded = {}
+    offset = 0
+    while True:
+        page = vector_store.collection.get(
+            include=["documents", "metadatas"], limit=page_size, offset=offset
+        )
+        for chunk_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            metadata = metadata or {}
+            source = metadata.get("source", "")
+            if source in skip_sources:
+                continue
+            duplicate_filter.add(chunk_id, text or "", source)
+            if metadata.get("duplicate_ids"):
+                # Later aliases are appended to the ones already recorded
+                duplicate_filter.aliases[chunk_id] = metadata["duplicate_ids"].split(",")
+                seeded[chunk_id] = len(duplicate_filter.aliases[chunk_id])
+        if len(page["ids"]) < page_size:
+            return seeded
+        offset += page_size
+
+
+def ingest_documents(
+    doc_folder: str,
+    vector_store,
+    manifest: Optional[IndexManifest] = None,
+    paths: Optional[List[str]] = None,
+    workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    dedupe: Optional[bool] = None,
+    progress: bool = True
+) -> IngestStats:
+    """
+    Ingest a documents folder into the vector store as a pipeline
+
+    A process pool hashes, cleans and chunks files, fixed-size batches of
+    chunks are handed to a writer thread through a bounded queue, and the
+    writer embeds and flushes each batch to the collection. At most a few
+    files per worker and `queue_size` batches are held in memory at once.
+
+    With a manifest the run is incremental: files whose size, mtime or
+    content hash match the manifest are skipped, only chunk ids that are
+    new are embedded, and chunks of changed or removed files are deleted.
+    A file's manifest entry is only recorded once its writes succeeded, so
+    after a failed run the files that did not make it are retried.
+
+    Files above INGEST_CONFIG["large_file_bytes"] are memory-mapped and
+    cleaned/chunked as a stream, so peak memory does not depend on file
+    size; their total_chunks metadata is filled in once the stream ends.
+
+    With dedupe enabled, new chunks that are near-duplicates of an indexed
+    chunk or of one seen earlier in the run are not embedded; the kept chunk
+    lists them in its duplicate_ids metadata. Runs with work to do first read
+    the stored chunks of files they leave alone to seed the filter. Files
+    whose dropped chunks pointed at a file that changed or disappeared are
+    re-processed so no text is lost.
+
+    Args:
+        doc_folder: Folder containing .txt documents
+        vector_store: VectorStore to write into
+        manifest: IndexManifest to diff against and update (None = full ingest)
+        paths: Sync only these files (missing ones are removed); None = whole folder
+        workers: Preprocessing processes (None = INGEST_CONFIG / CPU count)
+        batch_size: Chunks per embedding batch
+        queue_size: Max batches waiting for the writer
+        dedupe: Drop near-duplicate chunks (None = DEDUPE_CONFIG["enabled"])
+        progress: Print periodic progress and throughput
+
+    Returns:
+        IngestStats with file/chunk counters and throughput
+    """
+    workers = workers or INGEST_CONFIG["workers"] or os.cpu_count() or 1
+    batch_size = batch_size or INGEST_CONFIG["embedding_batch_size"]
+    queue_size = queue_size or INGEST_CONFIG["queue_size"]
+    progress_interval = INGEST_CONFIG["progress_interval"]
+    large_file_bytes = INGEST_CONFIG["large_file_bytes"]
+    window_bytes = INGEST_CONFIG["stream_window_bytes"]
+    manifest = manifest if manifest is not None else IndexManifest()
+    dedupe = DEDUPE_CONFIG["enabled"] if dedupe is None else dedupe
+    duplicate_filter = NearDuplicateFilter() if dedupe else None
+
+    if paths is None:
+        paths = list_document_paths(doc_folder)
+        removed_paths = None
+    else:
+        # Only the given files are synced; the ones that no longer exist are removals
+        removed_paths = [path for path in paths if not os.path.isfile(path)]
+        paths = [path for path in paths if os.path.isfile(path)]
+    stats = IngestStats(total_files=len(paths))
+
+    # Cheap stat pass: only files that look different are read
+    current_sources = set()
+    to_process = []
+    to_stream = []
+    file_stats = {}
+
+    def schedule(path: str):
+        (to_stream if file_stats[path][0] >= large_file_bytes else to_process).append(path)
+
+    for path in paths:
+        source = os.path.basename(path)
+        current_sources.add(source)
+        st = os.stat(path)
+        file_stats[path] = (st.st_size, st.st_mtime_ns)
+        if manifest.is_unchanged(source, st.st_size, st.st_mtime_ns):
+            stats.files_unchanged += 1
+        else:
+            schedule(path)
+    if removed_paths is None:
+        removed_sources = [source for source in manifest.files if source not in current_sources]
+    else:
+        removed_sources = [
+            os.path.basename(path) for path in removed_paths
+            if os.path.basename(path) in manifest.files
+        ]
+
+    # Files with chunks deduplicated against a dirty file must be re-checked
+    forced = set()
+    dirty = {os.path.basename(path) for path in to_process + to_stream}.union(removed_sources)
+    for source, entry in manifest.files.items():
+        if source in dirty or not dirty.intersection(entry.get("alias_sources", ())):
+            continue
+        path = os.path.join(doc_folder, source)
+        if not os.path.isfile(path):
+            continue
+        if path in file_stats:
+            stats.files_unchanged -= 1
+        else:
+            st = os.stat(path)
+            file_stats[path] = (st.st_size, st.st_mtime_ns)
+            stats.total_files += 1
+        forced.add(path)
+        schedule(path)
+
+    seeded_aliases = {}
+    if duplicate_filter is not None and (to_process or to_stream):
+        reprocessed = {os.path.basename(path) for path in to_process + to_stream}
+        seeded_aliases = _seed_duplicate_filter(
+            duplicate_filter, vector_store, reprocessed.union(removed_sources)
+        )
+
+    op_queue = queue.Queue(maxsize=queue_size)
+    errors = []
+    writer = threading.Thread(
+        target=_writer_loop,
+        args=(vector_store, manifest, op_queue, stats, errors),
+        name="ingest-writer",
+        daemon=True
+    )
+    writer.start()
+
+    pending = []
+    last_report = time.perf_counter()
+    # Manifest entries wait until the batch with their file's last chunk is queued
+    waiting_entries = deque()
+    chunks_pending = chunks_queued = 0
+
+    def put_batch(batch: List[Dict[str, Any]]):
+        nonlocal chunks_queued
+        op_queue.put(("upsert", batch))  # Blocks when the writer falls behind
+        chunks_queued += len(batch)
+        release_entries()
+
+    def release_entries():
+        while waiting_entries and waiting_entries[0][0] <= chunks_queued:
+            _, source, entry = waiting_entries.popleft()
+            op_queue.put(("manifest", (source, entry)))
+
+    def record_entry(source: str, entry: Optional[Dict[str, Any]]):
+        waiting_entries.append((chunks_pending, source, entry))
+        release_entries()
+
+    def enqueue(chunks: List[Dict[str, Any]]):
+        nonlocal pending, last_report, chunks_pending
+        pending.extend(chunks)
+        chunks_pending += len(chunks)
+        while len(pending) >= batch_size:
+            put_batch(pending[:batch_size])
+            pending = pending[batch_size:]
+        if progress and time.perf_counter() - last_report >= progress_interval:
+            print(f"   ⏳ {stats.format()}")
+            last_report = time.perf_counter()
+
+    def drop_duplicates(chunks: List[Dict[str, Any]], alias_sources: set) -> List[Dict[str, Any]]:
+        if duplicate_filter is None:
+            return chunks
+        kept = []
+        for chunk in chunks:
+            source = chunk["metadata"]["source"]
+            match = duplicate_filter.check(chunk["id"], chunk["text"], source)
+            if match is None:
+                kept.append(chunk)
+            else:
+                stats.chunks_deduplicated += 1
+                if match[1] != source:
+                    alias_sources.add(match[1])
+        return kept
+
+    def flush():
+        nonlocal pending
+        if pending:
+            batch, pending = pending, []
+            put_batch(batch)
+
+    def collect(result: Dict[str, Any]):
+        path = result["path"]
+        source = os.path.basename(path)
+        size, mtime_ns = file_stats[path]
+        entry = manifest.files.get(source)
+
+        if result["chunks"] is None:
+            # Touched but identical content: refresh the stat fingerprint only
+            entry.update(size=size, mtime_ns=mtime_ns)
+            stats.files_unchanged += 1
+            return
+
+        chunks = result["chunks"]
+        ids = assign_chunk_ids(chunks)
+        old_ids = set(entry["chunk_ids"]) if entry else set()
+        if entry and entry.get("streamed"):
+            # Streamed chunks are not tracked by id; the file shrank below the threshold
+            op_queue.put(("delete_where", {"source": source}))
+        new_chunks, reused_chunks = [], []
+        for chunk_id, chunk in zip(ids, chunks):
+            chunk["id"] = chunk_id
+            (reused_chunks if chunk_id in old_ids else new_chunks).append(chunk)
+
+        alias_sources = set()
+        if duplicate_filter is not None:
+            # Already-embedded chunks stay, but later chunks may duplicate them
+            for chunk in reused_chunks:
+                duplicate_filter.add(chunk["id"], chunk["text"], source)
+            kept = drop_duplicates(new_chunks, alias_sources)
+            if len(kept) < len(new_chunks):
+                kept_ids = {chunk["id"] for chunk in kept}
+                dropped = {chunk["id"] for chunk in new_chunks if chunk["id"] not in kept_ids}
+                ids = [chunk_id for chunk_id in ids if chunk_id not in dropped]
+            new_chunks = kept
+
+        stale_ids = list(old_ids.difference(ids))
+        if stale_ids:
+            op_queue.put(("delete", stale_ids))
+            stats.chunks_deleted += len(stale_ids)
+        if reused_chunks:
+            op_queue.put(("update", reused_chunks))  # chunk_index/total_chunks may have moved
+            stats.chunks_reused += len(reused_chunks)
+
+        if entry:
+            stats.files_changed += 1
+        else:
+            stats.files_added += 1
+        new_entry = {
+            "hash": result["hash"],
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "chunk_ids": ids,
+        }
+        if alias_sources:
+            new_entry["alias_sources"] = sorted(alias_sources)
+
+        stats.record_file(len(chunks))
+        enqueue(new_chunks)
+        record_entry(source, new_entry)
+
+    def stream(path: str):
+        source = os.path.basename(path)
+        size, mtime_ns = file_stats[path]
+        entry = manifest.files.get(source)
+        content_hash = file_hash_streaming(path)
+        if entry and entry["hash"] == content_hash and path not in forced:
+            entry.update(size=size, mtime_ns=mtime_ns)
+            stats.files_unchanged += 1
+            return
+
+        # Streamed files are replaced wholesale: tracking per-chunk ids would
+        # make memory grow with the file
+        if entry:
+            op_queue.put(("delete_where", {"source": source}))
+            stats.files_changed += 1
+        else:
+            stats.files_added += 1
+
+        n_chunks = 0
+        alias_sources = set()
+        for chunk in iter_file_chunks(path, window_bytes=window_bytes):
+            digest = hashlib.sha1(chunk["text"].encode('utf-8')).hexdigest()[:12]
+            chunk["id"] = f"{source}:{chunk['metadata']['chunk_index']}:{digest}"
+            n_chunks += 1
+            stats.chunks += 1
+            enqueue(drop_duplicates([chunk], alias_sources))
+            if errors:
+                return
+        flush()
+        op_queue.put(("update_where", {"where": {"source": source}, "values": {"total_chunks": n_chunks}}))
+
+        stats.files += 1
+        new_entry = {
+            "hash": content_hash,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "chunk_ids": [],
+            "streamed": True,
+            "n_chunks": n_chunks,
+        }
+        if alias_sources:
+            new_entry["alias_sources"] = sorted(alias_sources)
+        record_entry(source, new_entry)
+
+    def known_hash(path: str) -> Optional[str]:
+        if path in forced:
+            return None
+        entry = manifest.files.get(os.path.basename(path))
+        return entry["hash"] if entry else None
+
+    try:
+        for source in removed_sources:
+            entry = manifest.files[source]
+            if entry.get("streamed"):
+                op_queue.put(("delete_where", {"source": source}))
+                stats.chunks_deleted += entry["n_chunks"]
+            else:
+                op_queue.put(("delete", entry["chunk_ids"]))
+                stats.chunks_deleted += len(entry["chunk_ids"])
+            record_entry(source, None)
+            stats.files_removed += 1
+
+        if workers <= 1 or len(to_process) <= 1:
+            for path in to_process:
+                collect(_process_path(path, known_hash(path)))
+                if errors:
+                    break
+        else:
+            # Keep a bounded number of files in flight instead of mapping all paths
+            max_in_flight = workers * 2
+            path_iter = iter(to_process)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                in_flight = set()
+                for path in path_iter:
+                    in_flight.add(pool.submit(_process_path, path, known_hash(path)))
+                    if len(in_flight) >= max_in_flight:
+                        break
+                while in_flight and not errors:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future.result())
+                        next_path = next(path_iter, None)
+                        if next_path is not None:
+                            in_flight.add(pool.submit(_process_path, next_path, known_hash(next_path)))
+                for future in in_flight:
+                    future.cancel()
+
+        # Large files are streamed one at a time after the pool has drained
+        for path in to_stream:
+            if errors:
+                break
+            stream(path)
+
+        if not errors:
+            flush()
+            grown = {
+                canonical_id: alias_ids
+                for canonical_id, alias_ids in (duplicate_filter.aliases if duplicate_filter else {}).items()
+                if len(alias_ids) > seeded_aliases.get(canonical_id, 0)
+            }
+            if grown:
+                # Record on each kept chunk which chunks it stands in for
+                op_queue.put(("update", [
+                    {
+                        "id": canonical_id,
+                        "metadata": {
+                            "duplicate_ids": ",".join(alias_ids),
+                            "n_duplicates": len(alias_ids),
+                        }
+                    }
+                    for canonical_id, alias_ids in grown.items()
+                ]))
+    finally:
+        op_queue.put(None)
+        writer.join()
+        stats.finish()
+
+    if errors:
+        raise errors[0]
+
+    if progress:
+        print(f"   ✅ {stats.format()}")
+
+    return stats
@@ -1,16 +1,67 @@
+import codecs
+import math
+import mmap
 import os
 import re
-from typing import List, Dict, Any
-from config import CHUNK_CONFIG
+from array import array
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple, Iterable, Iterator
+from config import CHUNK_CONFIG, VECTOR_STORE_CONFIG
+
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_WHITESPACE_RE = re.compile(r'\s+')
 
 
 def clean_text(text):
     """Remove unwanted characters and whitespace"""
-    text = re.sub(r'<[^>]+>', '', text)  # remove HTML
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = _TAG_RE.sub('', text)  # remove HTML
+    text = _WHITESPACE_RE.sub(' ', text).strip()
     return text
 
 
+def iter_clean_text(path: str, window_bytes: int = 1 << 20, max_tag_chars: int = 4096) -> Iterator[str]:
+    """
+    Yield the cleaned text of a file piece by piece from a memory map
+    
+    Concatenating the pieces gives clean_text() of the whole file. A tag that
+    is still open at a window boundary is carried into the next window, up to
+    `max_tag_chars`; a longer unclosed '<' is kept as literal text.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            carry = ''
+            pending_space = False
+            emitted = False
+            for offset in range(0, size, window_bytes):
+                final = offset + window_bytes >= size
+                text = carry + decoder.decode(mm[offset:offset + window_bytes], final=final)
+                carry = ''
+                if not final:
+                    open_tag = text.find('<', text.rfind('>') + 1)
+                    if open_tag != -1 and len(text) - open_tag <= max_tag_chars:
+                        carry = text[open_tag:]
+                        text = text[:open_tag]
+                
+                piece = _WHITESPACE_RE.sub(' ', _TAG_RE.sub('', text))
+                leading = piece.startswith(' ')
+                trailing = piece.endswith(' ')
+                piece = piece.strip(' ')
+                if piece:
+                    # Whitespace at a window edge becomes one space between pieces
+                    if emitted and (pending_space or leading):
+                        piece = ' ' + piece
+                    yield piece
+                    emitted = True
+                    pending_space = trailing
+                else:
+                    pending_space = pending_space or leading or trailing
+
+
 def chunk_text(text, max_words=100, overlap_words=20):
     """
     Chunk text with overlapping windows for better context preservation
@@ -38,6 +89,243 @@ def chunk_text(text, max_words=100, overlap_words=20):
     return chunks
 
 
+def word_chunk_spans(text: str, max_words: int = 100, overlap_words: int = 20) -> List[Tuple[int, int]]:
+    """
+    Overlapping word windows as (start, end) character offsets into `text`
+    
+    Chunks are slices of the cleaned text, so no per-window word lists are
+    built. On cleaned text (single spaces) the slices are exactly the chunks
+    chunk_text() returns, including the windows that start after one has
+    reached the end of the text; an empty text has no spans.
+    """
+    # Windows start every (max - overlap) words and span max words, so they are
+    # whole runs of gcd(max, overlap)-word blocks; the regex engine finds those
+    unit = math.gcd(max_words, overlap_words)
+    starts = array('q')
+    ends = array('q')
+    for match in _word_block_pattern(unit).finditer(text):
+        starts.append(match.start())
+        ends.append(match.end())
+    size = max_words // unit
+    # Like chunk_text(), a text of at most max_words words is one chunk
+    return _window_spans(starts, ends, size, overlap_words // unit, trailing=len(starts) > size)
+
+
+@lru_cache(maxsize=None)
+def _word_block_pattern(n_words: int):
+    """Regex matching runs of up to n_words whitespace-separated words"""
+    return re.compile(r'\S+(?:\s+\S+){0,%d}' % (n_words - 1))
+
+
+def token_chunk_spans(
+    text: str,
+    max_tokens: int = 128,
+    overlap_tokens: int = 25,
+    tokenizer=None
+) -> List[Tuple[int, int]]:
+    """
+    Overlapping windows measured in embedding-model tokens
+    
+    Windows are snapped to whitespace so words are not split across chunks,
+    unless a single word is longer than the window.
+    
+    Returns:
+        List of (start, end) character offsets into `text`
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    encoding = tokenizer(
+        text,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+        verbose=False,
+    )
+    starts = array('q')
+    ends = array('q')
+    for token_start, token_end in encoding["offset_mapping"]:
+        starts.append(token_start)
+        ends.append(token_end)
+    
+    # A token begins a word when whitespace separates it from the previous one
+    n = len(starts)
+    word_start = [i == 0 or starts[i] > ends[i - 1] for i in range(n)]
+    return _window_spans(starts, ends, max_tokens, overlap_tokens, word_start)
+
+
+def _window_spans(starts, ends, size: int, overlap: int, word_start=None, trailing: bool = False) -> List[Tuple[int, int]]:
+    """
+    Slide a window of `size` units over unit offsets, overlapping by `overlap` units
+    
+    With `trailing`, windows keep starting every step until past the end,
+    as chunk_text() does; otherwise the first window reaching the end is the last.
+    """
+    n = len(starts)
+    spans = []
+    start = 0
+    while start < n:
+        end = min(start + size, n)
+        if word_start is not None and end < n:
+            # Back off to a word boundary while keeping at least half a window
+            boundary = end
+            while boundary > start + size // 2 and not word_start[boundary]:
+                boundary -= 1
+            if word_start[boundary]:
+                end = boundary
+        spans.append((starts[start], ends[end - 1]))
+        if end == n and not trailing:
+            break
+        if word_start is None:
+            start += max(size - overlap, 1)  # From the window's start: the end is clipped at n
+        else:
+            start = max(end - overlap, start + 1)
+            while start < end and not word_start[start]:
+                start += 1
+    return spans
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model_name: str = None):
+    """Load (once per process) the tokenizer of the embedding model"""
+    from transformers import AutoTokenizer
+    model_name = model_name or VECTOR_STORE_CONFIG["embedding_model"]
+    if "/" not in model_name:
+        model_name = f"sentence-transformers/{model_name}"
+    return AutoTokenizer.from_pretrained(model_name)
+
+
+def chunk_spans(text: str) -> List[Tuple[int, int]]:
+    """Chunk spans using the strategy configured in CHUNK_CONFIG"""
+    if CHUNK_CONFIG["strategy"] == "tokens":
+        return token_chunk_spans(
+            text,
+            max_tokens=CHUNK_CONFIG["max_tokens"],
+            overlap_tokens=CHUNK_CONFIG["overlap_tokens"]
+        )
+    return word_chunk_spans(
+        text,
+        max_words=CHUNK_CONFIG["max_words"],
+        overlap_words=CHUNK_CONFIG["overlap_words"]
+    )
+
+
+def iter_stream_chunk_spans(pieces: Iterable[str], buffer_chars: int = 1 << 20) -> Iterator[Tuple[int, int, str]]:
+    """
+    Chunk a stream of cleaned text while holding only a bounded buffer
+    
+    The buffer is chunked up to its last space, where every window before
+    the first one reaching that point is final; chunking restarts at that
+    window's start once more text arrives, which reproduces the windows
+    chunk_spans() would find on the whole text.
+    
+    Yields:
+        (start, end, text) with offsets into the whole cleaned stream
+    """
+    pieces = iter(pieces)
+    buffer = ''
+    base = 0
+    target = buffer_chars
+    exhausted = False
+    while True:
+        while not exhausted and len(buffer) < target:
+            piece = next(pieces, None)
+            if piece is None:
+                exhausted = True
+            else:
+                buffer += piece
+        
+        if exhausted:
+            for start, end in chunk_spans(buffer):
+                yield base + start, base + end, buffer[start:end]
+            return
+        
+        # The last word may be cut off, so only chunk up to the last space;
+        # there every window but the last is final
+        safe = buffer.rfind(' ')
+        spans = chunk_spans(buffer[:safe]) if safe > 0 else []
+        # Windows reaching the cut (trailing word windows too) may grow with more text
+        open_from = next((i for i, (_, end) in enumerate(spans) if end == spans[-1][1]), 0)
+        if open_from == 0:
+            target *= 2  # A single window larger than the buffer: read further
+            continue
+        
+        for start, end in spans[:open_from]:
+            yield base + start, base + end, buffer[start:end]
+        keep = spans[open_from][0]
+        buffer = buffer[keep:]
+        base += keep
+        target = buffer_chars
+
+
+def iter_file_chunks(path: str, window_bytes: int = 1 << 20) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the chunks of a (very large) file with bounded memory
+    
+    Chunks carry the correct chunk_index but no total_chunks, which is only
+    known once the generator is exhausted; callers fill it in afterwards.
+    """
+    filename = os.path.basename(path)
+    document_type = _infer_document_type(filename)
+    pieces = iter_clean_text(path, window_bytes=window_bytes)
+    for i, (start, end, text) in enumerate(iter_stream_chunk_spans(pieces, buffer_chars=window_bytes)):
+        yield {
+            "text": text,
+            "metadata": {
+                "source": filename,
+                "source_path": path,
+                "chunk_index": i,
+                "document_type": document_type,
+                "char_start": start,
+                "char_end": end
+            }
+        }
+
+
+def list_document_paths(doc_folder: str) -> List[str]:
+    """List the .txt files in a documents folder"""
+    return [
+        entry.path
+        for entry in os.scandir(doc_folder)
+        if entry.is_file() and entry.name.endswith(".txt")
+    ]
+
+
+def process_file(path: str) -> List[Dict[str, Any]]:
+    """
+    Read, clean and chunk a single document
+    
+    Returns:
+        List of dictionaries with 'text' and 'metadata' keys
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = f.read()
+    return process_text(raw, path)
+
+
+def process_text(raw: str, path: str) -> List[Dict[str, Any]]:
+    """Clean and chunk the raw text of the document at `path`"""
+    filename = os.path.basename(path)
+    cleaned = clean_text(raw)
+    spans = chunk_spans(cleaned)
+    
+    # Add metadata for each chunk; offsets point into the cleaned text
+    return [
+        {
+            "text": cleaned[start:end],
+            "metadata": {
+                "source": filename,
+                "source_path": path,
+                "chunk_index": i,
+                "total_chunks": len(spans),
+                "document_type": _infer_document_type(filename),
+                "char_start": start,
+                "char_end": end
+            }
+        }
+        for i, (start, end) in enumerate(spans)
+    ]
+
+
 def preprocess_documents(doc_folder: str) -> List[Dict[str, Any]]:
     """
     Preprocess documents with metadata extraction
@@ -46,29 +334,8 @@ def preprocess_documents(doc_folder: str) -> List[Dict[str, Any]]:
         List of dictionaries with 'text' and 'metadata' keys
     """
     all_chunks = []
-    max_words = CHUNK_CONFIG["max_words"]
-    overlap_words = CHUNK_CONFIG["overlap_words"]
-    
-    for filename in os.listdir(doc_folder):
-        if filename.endswith(".txt"):
-            path = os.path.join(doc_folder, filename)
-            with open(path, 'r', encoding='utf-8') as f:
-                raw = f.read()
-                cleaned = clean_text(raw)
-                chunks = chunk_text(cleaned, max_words=max_words, overlap_words=overlap_words)
-                
-                # Add metadata for each chunk
-                for i, chunk in enumerate(chunks):
-                    all_chunks.append({
-                        "text": chunk,
-                        "metadata": {
-                            "source": filename,
-                            "source_path": path,
-                            "chunk_index": i,
-                            "total_chunks": len(chunks),
-                            "document_type": _infer_document_type(filename)
-                        }
-                    })
+    for path in list_document_paths(doc_folder):
+        all_chunks.extend(process_file(path))
     
     return all_chunks
 
@@ -1,49 +1,47 @@
 # rag_local_ollama.py
 
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-import subprocess
-from preprocess import preprocess_documents
-
-# -----------------------------
-# Step 1: Prepare Sample Documents
-# -----------------------------
-
-documents = preprocess_documents("docs")
-
-# -----------------------------
-# Step 2: Initialize ChromaDB
-# -----------------------------
-# Disable telemetry
-client = chromadb.Client(Settings(anonymized_telemetry=False))
-collection = client.get_or_create_collection(name="my_knowledge")
-
-# -----------------------------
-# Step 3: Create Embeddings & Store in Vector DB
-# -----------------------------
-model = SentenceTransformer("all-MiniLM-L6-v2")
-
-for i, doc in enumerate(documents):
-    embedding = model.encode(doc).tolist()
-    collection.add(documents=[doc], ids=[str(i)], embeddings=[embedding])
-
-# -----------------------------
-# Step 4: Accept Query
-# -----------------------------
-query = input("Ask your question: ")
-query_embed = model.encode(query).tolist()
-
-results = collection.query(query_embeddings=[query_embed], n_results=2)
-contexts = results['documents'][0]
-
-# Combine top documents into one context string
-context = "\n".join(contexts)
-
-# -----------------------------
-# Step 5: Build Prompt for Ollama
-# -----------------------------
-prompt = f"""Answer the following question using only the information in the context. Be concise and factual.
+from vector_store import VectorStore
+from agents.llm_backends import OllamaBackend
+from ingest import ingest_documents, IndexManifest
+
+
+def main():
+    """Answer one question from docs/ with a local Ollama model"""
+    # -----------------------------
+    # Step 1: Open the Persistent Vector Store
+    # -----------------------------
+    # Shares the on-disk index (VECTOR_STORE_CONFIG["persist_directory"]) with agentic_rag.py
+    vector_store = VectorStore()
+    manifest = IndexManifest.load()
+
+    if vector_store.index_mismatches():
+        # Built with another embedding model or chunking: start over
+        vector_store.delete_collection()
+        vector_store.update_collection()
+        manifest.clear()
+    elif vector_store.get_collection_info()["count"] == 0:
+        manifest.clear()
+
+    # -----------------------------
+    # Step 2: Embed Only New or Changed Documents (batched)
+    # -----------------------------
+    ingest_documents("docs", vector_store, manifest=manifest, progress=False)
+    manifest.save()
+    vector_store.record_index_info()
+
+    # -----------------------------
+    # Step 3: Accept Query
+    # -----------------------------
+    query = input("Ask your question: ")
+    contexts = vector_store.query(query, n_results=2)["documents"]
+
+    # Combine top documents into one context string
+    context = "\n".join(contexts)
+
+    # -----------------------------
+    # Step 4: Build Prompt for Ollama
+    # -----------------------------
+    prompt = f"""Answer the following question using only the information in the context. Be concise and factual.
 
 Context:
 {context}
@@ -53,16 +51,17 @@ Question:
 
 Answer:"""
 
-# -----------------------------
-# Step 6: Run Ollama CLI for Generation
-# -----------------------------
-result = subprocess.run(
-    ["ollama", "run", "llama3.1"],
-    input=prompt,
-    capture_output=True,
-    text=True
-)
+    # -----------------------------
+    # Step 5: Generate with the Running Ollama Server
+    # -----------------------------
+    # The server keeps the model loaded for OLLAMA_CONFIG["keep_alive"], so
+    # repeated runs skip both the CLI process and the model load
+    response = OllamaBackend().generate(prompt)
+
+    print("\n🧠 LLM Response:")
+    print(response)
 
-print("\n🧠 LLM Response:")
-print(result.stdout.strip())
 
+if __name__ == "__main__":
+    # The guard matters: ingest_documents starts worker processes
+    main()
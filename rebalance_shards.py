@@ -0,0 +1,29 @@
+"""Redistribute the stored index over a new number of shards without re-embedding"""
+
+import argparse
+
+from config import VECTOR_STORE_CONFIG
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--shards", type=int, default=VECTOR_STORE_CONFIG.get("shards", 1),
+        help="Target shard count (default: VECTOR_STORE_CONFIG['shards'])"
+    )
+    args = parser.parse_args()
+
+    from vector_store import VectorStore
+
+    vector_store = VectorStore()
+    before = vector_store.n_shards
+    if before == args.shards:
+        print(f"✅ Index already has {before} shard(s)")
+        return
+    print(f"🔄 Resharding {vector_store.get_collection_info()['count']} chunks: {before} -> {args.shards} shard(s)...")
+    moved = vector_store.rebalance_shards(args.shards)
+    print(f"✅ Moved {moved} chunks; index now has {vector_store.n_shards} shard(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Shared fixtures: VectorStores on a throwaway directory with a deterministic stand-in model"""
+
+import hashlib
+import os
+import sys
+from typing import List
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import vector_store
+
+
+class HashEmbeddingBackend:
+    """Unit vectors derived from a hash of each text: equal texts, equal vectors; no model download"""
+
+    name = "hash-embedding-16"
+    dim = 16
+
+    def __init__(self):
+        self.calls = 0
+        self.texts = 0
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        self.calls += 1
+        self.texts += len(texts)
+        vectors = np.array([
+            np.frombuffer(hashlib.sha256(text.encode("utf-8")).digest()[:self.dim], dtype=np.uint8)
+            for text in texts
+        ], dtype=np.float32).reshape(len(texts), self.dim) - 127.5
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def make_store(tmp_path, monkeypatch):
+    """
+    Build VectorStores whose .rag_index lives in tmp_path
+
+    Call with config overrides, e.g. make_store(backend="numpy").
+    """
+    monkeypatch.chdir(tmp_path)  # Every .rag_index path in config.py is relative
+    monkeypatch.setattr(vector_store, "create_embedding_backend", HashEmbeddingBackend)
+    monkeypatch.setitem(config.CHUNK_CONFIG, "strategy", "words")  # Token chunking loads the model's tokenizer
+
+    def make(**overrides) -> vector_store.VectorStore:
+        for key, value in overrides.items():
+            monkeypatch.setitem(config.VECTOR_STORE_CONFIG, key, value)  # Restored after the test
+        return vector_store.VectorStore()
+
+    yield make
+    if "chromadb" in sys.modules:
+        # Chroma keeps one system per path for the whole process; drop them with the directory
+        from chromadb.api.client import SharedSystemClient
+        SharedSystemClient.clear_system_cache()
@@ -0,0 +1,89 @@
+"""Semantic answer cache hits and invalidation when the index version moves
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import ingest_documents
+from utils.answer_cache import SemanticAnswerCache
+import vector_store as vector_store_module
+
+RESULT = {"answer": "42", "metadata": {"route": "basic"}}
+
+
+def unit(*values) -> np.ndarray:
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_hits_similar_queries_of_the_same_version_only():
+    cache = SemanticAnswerCache(path=None, threshold=0.95)
+    cache.store("what is the answer", unit(1, 0, 0), "v1", RESULT)
+    assert cache.lookup("What is  the answer", unit(0, 1, 0), "v1")["result"] == RESULT  # Exact text
+    assert cache.lookup("the answer is what", unit(1, 0.1, 0), "v1")["similarity"] > 0.95
+    assert cache.lookup("something else", unit(0, 1, 0), "v1") is None
+
+    assert cache.lookup("what is the answer", unit(1, 0, 0), "v2") is None
+    assert cache.get_stats()["invalidated"] == 1
+    assert cache.lookup("what is the answer", unit(1, 0, 0), "v1") is None  # Dropped, not hidden
+
+
+def test_persisted_answers_follow_the_version(tmp_path):
+    path = str(tmp_path / "answers.sqlite")
+    SemanticAnswerCache(path=path).store("q", unit(1, 0), "v1", RESULT)
+    assert SemanticAnswerCache(path=path).lookup("q", unit(1, 0), "v1")["result"] == RESULT
+    SemanticAnswerCache(path=path).lookup("q", unit(1, 0), "v2")
+    assert SemanticAnswerCache(path=path).lookup("q", unit(1, 0), "v1") is None
+
+
+def test_writes_after_a_read_retire_the_version(make_store):
+    store = make_store(backend="numpy")
+    store.add_documents(["first"], [{"source": "a.txt"}], ["a:1"])
+    version = store.index_version
+    assert store.index_version == version  # Reads leave it alone
+    store.add_documents(["second"], [{"source": "a.txt"}], ["a:2"])
+    assert store.index_version != version
+    assert make_store(backend="numpy").index_version == store.index_version  # Recorded with the index
+
+
+def write_docs(folder, n_files: int, chunks_per_file: int = 3):
+    os.makedirs(folder, exist_ok=True)
+    for i in range(n_files):
+        paragraphs = [" ".join(f"file{i} part{j} word{k}" for k in range(40)) for j in range(chunks_per_file)]
+        with open(os.path.join(folder, f"doc_{i}.txt"), "w", encoding="utf-8") as f:
+            f.write("\n\n".join(paragraphs))
+
+
+@pytest.mark.parametrize("backend", ["numpy", "chroma"])
+def test_ingest_run_retires_the_version_once(make_store, monkeypatch, tmp_path, backend):
+    store = make_store(backend=backend)
+    store.index_version
+    writes = []
+    set_version = vector_store_module.VectorStore._set_index_version
+    monkeypatch.setattr(
+        vector_store_module.VectorStore, "_set_index_version",
+        lambda self, version: (writes.append(version), set_version(self, version))
+    )
+    write_docs(str(tmp_path / "docs"), n_files=6)
+    stats = ingest_documents(str(tmp_path / "docs"), store, workers=1, batch_size=2, progress=False)
+    assert stats.batches > 1
+    assert len(writes) == 1
+    assert store.index_version == writes[0]
+
+
+def test_shared_index_picks_up_other_writers(make_store, monkeypatch, tmp_path):
+    monkeypatch.setitem(vector_store_module.ANSWER_CACHE_CONFIG, "index_version_refresh_seconds", 0)
+    reader, writer = make_store(backend="chroma"), make_store(backend="chroma")
+    assert reader.shared_index
+    version = reader.index_version
+    write_docs(str(tmp_path / "docs"), n_files=2)
+    ingest_documents(str(tmp_path / "docs"), writer, workers=1, progress=False)
+    assert reader.index_version != version
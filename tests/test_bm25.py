@@ -0,0 +1,159 @@
+"""BM25Index tokenizing, deletes, compaction and cross-process refresh; hybrid fusion and filters
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes.bm25 import BM25Index, tokenize
+from indexes.numpy_collection import NumpyCollection
+from utils.rank_fusion import reciprocal_rank_fusion
+from vector_store import VectorStore
+
+DOCUMENTS = {
+    "a": "the ticket user-014 was fixed in v1.2.3",
+    "b": "apple orchards grow apple trees",
+    "c": "an apple a day",
+    "d": "pears and plums",
+}
+
+
+def build(path=None) -> BM25Index:
+    index = BM25Index(path)
+    index.add(list(DOCUMENTS), list(DOCUMENTS.values()))
+    return index
+
+
+def test_tokenize_keeps_compounds_and_their_parts():
+    assert tokenize("Fix user-014 in v1.2.3!") == ["fix", "user-014", "user", "014", "in", "v1.2.3", "v1", "2", "3"]
+    assert tokenize("snake_case stays") == ["snake_case", "snake", "case", "stays"]
+    assert tokenize("") == []
+
+
+def test_search_ranks_by_term_frequency_and_matches_identifiers():
+    index = build()
+    ids, scores = index.search(["apple", "user-014", "014", "kiwi"], 10)
+    assert ids[0] == ["b", "c"]
+    assert scores[0][0] > scores[0][1] > 0
+    assert ids[1] == ["a"] and ids[2] == ["a"]
+    assert ids[3] == []
+
+
+def test_replace_and_delete():
+    index = build()
+    index.add(["d"], ["apple apple apple apple"])
+    assert index.search(["apple"], 1)[0] == [["d"]]
+    assert index.search(["plums"], 5)[0] == [[]]
+
+    index.delete(["d", "unknown"])
+    assert len(index) == 3
+    assert index.search(["apple"], 5)[0] == [["b", "c"]]
+
+
+def test_compaction_keeps_scores_and_survives_reopen(tmp_path):
+    path = str(tmp_path / "bm25")
+    index = build(path)
+    index.delete(["a", "d"])
+    before = index.search(["apple", "pears"], 5)
+    index.add(["e"], ["kiwi"])
+    index.delete(["e"])  # 2 live of 5 rows: compacts
+    assert index.get_stats()["dead_rows"] == 0
+    assert index.search(["apple", "pears"], 5) == before
+
+    reopened = BM25Index(path)
+    assert len(reopened) == 2
+    assert reopened.search(["apple", "pears"], 5) == before
+
+
+def test_filtered_search_scores_only_allowed_rows():
+    index = build()
+    ids, scores = index.search(["apple"], 5, allowed_ids={"c", "d"})
+    assert ids == [["c"]]
+    # Document frequency still counts every live chunk, so the score is unchanged
+    all_ids, all_scores = index.search(["apple"], 5)
+    assert scores[0][0] == pytest.approx(all_scores[0][all_ids[0].index("c")])
+
+
+def test_refresh_picks_up_writes_from_another_instance(tmp_path):
+    path = str(tmp_path / "bm25")
+    reader, writer = build(path), BM25Index(path)
+    assert not reader.refresh()
+
+    writer.add(["e"], ["kiwi kiwi"])
+    writer.delete(["b"])
+    assert reader.refresh()
+    assert reader.search(["kiwi", "apple"], 5)[0] == [["e"], ["c"]]
+
+    # Compaction by the writer replaces the log: the reader reloads it
+    writer.delete(["a", "c", "d"])
+    assert reader.refresh()
+    assert len(reader) == 1
+    assert reader.search(["kiwi"], 5)[0] == [["e"]]
+
+
+def test_own_writes_are_not_replayed_by_refresh(tmp_path):
+    index = build(str(tmp_path / "bm25"))
+    index.add(["e"], ["kiwi"])
+    assert not index.refresh()
+    assert index.get_stats()["dead_rows"] == 0
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60)
+    assert [item for item, _ in fused] == ["a", "c", "b"]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+    weighted = reciprocal_rank_fusion([["a", "b"], ["b", "a"]], k=1, weights=[1.0, 3.0])
+    assert [item for item, _ in weighted] == ["b", "a"]
+
+
+@pytest.mark.parametrize("scores, n_results, decisive", [
+    ([9.0, 2.0, 1.0], 1, True),
+    ([9.0, 8.0, 1.0], 1, False),
+    ([9.0, 8.0, 1.0], 2, True),  # Both returned hits clear the first one left out
+    ([9.0, 1.5, 1.0], 2, False),
+    ([9.0, 1.0], 2, False),  # Nothing left out to compare against
+])
+def test_decisive_compares_the_returned_hits_with_the_next(scores, n_results, decisive):
+    hits = [(f"c{i}", score) for i, score in enumerate(scores)]
+    assert VectorStore._is_decisive(hits, n_results) is decisive
+
+
+def test_lexical_search_rescores_within_a_selective_filter():
+    # Bypasses __init__: only the collection and the BM25 index are needed
+    store = VectorStore.__new__(VectorStore)
+    store.collection = NumpyCollection("kb")
+    store.lexical_index = BM25Index()
+    ids = [f"common_{i}" for i in range(50)] + ["rare_0", "rare_1"]
+    documents = ["apple apple apple"] * 50 + ["a long note that mentions apple once among other words"] * 2
+    metadatas = [{"source": "common.txt"}] * 50 + [{"source": "rare.txt"}] * 2
+    store.collection.add(ids, np.eye(len(ids), dtype=np.float32), documents, metadatas)
+    store.lexical_index.add(ids, documents)
+
+    # The rare chunks are not among the global top 5; the filtered rescore still finds them
+    hits = store._lexical_search(["apple"], 5, {"source": "rare.txt"})[0]
+    assert sorted(chunk_id for chunk_id, _ in hits) == ["rare_0", "rare_1"]
+    hits = store._lexical_search(["apple"], 5, {"source": "common.txt"})[0]
+    assert len(hits) == 5 and all(chunk_id.startswith("common") for chunk_id, _ in hits)
+
+
+def test_hybrid_batch_distances_belong_to_each_query(make_store):
+    # A chunk one query finds densely can be a lexical-only hit of another in the same batch
+    store = make_store(backend="numpy")
+    texts = [f"apple note {i} about topic {i % 7}" for i in range(40)]
+    ids = [f"chunk_{i}" for i in range(40)]
+    store.add_documents(texts, [{"source": "notes.txt"}] * 40, ids)
+    queries = ["apple topic 3", "note 12 about", "apple topic 4", "note 30 about topic"]
+    results = store.query_batch(queries, n_results=5, mode="hybrid")
+    vectors = store.get_embeddings(ids)
+    for query, result in zip(queries, results):
+        assert None not in result["distances"]  # Nothing was answered from BM25 alone
+        query_vector = store._encode([query])[0]
+        expected = [float(np.sum((query_vector - vectors[chunk_id]) ** 2)) for chunk_id in result["ids"]]
+        assert result["distances"] == pytest.approx(expected, abs=1e-5)
@@ -0,0 +1,111 @@
+"""Index bundles: export/serve round trip, checksums, and complete vs interrupted imports
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bundle_index import import_bundle, verify_bundle
+from indexes.bundle import BundleCollection, BundleError, read_manifest, write_bundle
+from ingest import IndexManifest
+
+N_CHUNKS = 120
+
+
+def filled_store(make_store, **overrides):
+    store = make_store(**overrides)
+    store.add_documents(
+        [f"note {i} about topic {i % 7}" for i in range(N_CHUNKS)],
+        [{"source": f"file_{i % 3}.txt", "chunk_index": i} for i in range(N_CHUNKS)],
+        [f"chunk_{i}" for i in range(N_CHUNKS)]
+    )
+    store.record_index_info()
+    return store
+
+
+def export(store, path="bundle"):
+    return write_bundle(store.collection, path, info={
+        "collection_name": store.collection_name,
+        "ingest_files": {"docs/file_0.txt": {"sha256": "abc", "chunk_ids": ["chunk_0"]}},
+    })
+
+
+def test_bundle_serves_the_same_results(make_store):
+    store = filled_store(make_store, backend="numpy")
+    export(store)
+    bundle = BundleCollection("bundle")
+    assert bundle.count() == N_CHUNKS
+    embeddings = store._encode(["note 5 about topic 5", "topic 3"])
+    for where in (None, {"source": "file_1.txt"}):
+        expected = store.collection.query(embeddings, 5, where=where)
+        served = bundle.query(embeddings, 5, where=where)
+        assert served["ids"] == expected["ids"]
+        assert served["documents"] == expected["documents"]
+        assert served["metadatas"] == expected["metadatas"]
+    assert bundle.get(ids=["chunk_7"])["documents"] == ["note 7 about topic 0"]
+    with pytest.raises(BundleError, match="read-only"):
+        bundle.delete(ids=["chunk_7"])
+
+
+def test_checksums_are_checked_on_demand_and_sizes_always(make_store):
+    export(filled_store(make_store, backend="numpy"))
+    with open(os.path.join("bundle", "documents.bin"), "r+b") as f:
+        f.write(b"X")  # Same size, different bytes
+    with pytest.raises(BundleError, match="checksum"):
+        read_manifest("bundle", verify=True)
+    assert not verify_bundle("bundle")
+    assert read_manifest("bundle", verify=False)["count"] == N_CHUNKS
+
+    with open(os.path.join("bundle", "vectors.npy"), "r+b") as f:
+        f.truncate(100)
+    with pytest.raises(BundleError, match="wrong size"):
+        read_manifest("bundle", verify=False)
+
+
+def test_bundle_backend_is_dense_only(make_store):
+    export(filled_store(make_store, backend="numpy"), ".rag_index/bundle")
+    served = make_store(backend="bundle")
+    assert served.read_only and served.lexical_index is None
+    assert served.query("note 5 about topic 5", n_results=1)["ids"] == ["chunk_5"]
+    with pytest.raises(ValueError, match="lexical index"):
+        served.query("note", mode="hybrid")
+
+
+def test_import_restores_the_index_and_manifest(make_store):
+    export(filled_store(make_store, backend="numpy"))
+    make_store(backend="chroma")  # The local index the bundle is imported into
+    import_bundle("bundle", verify=True)
+    store = make_store(backend="chroma")
+    assert store.get_collection_info()["count"] == N_CHUNKS
+    assert store.index_mismatches() == []
+    assert store.query("note 5 about topic 5", n_results=1)["ids"] == ["chunk_5"]
+    assert list(IndexManifest.load().files) == ["docs/file_0.txt"]
+
+
+def test_interrupted_import_is_reported_for_rebuild(make_store, monkeypatch):
+    export(filled_store(make_store, backend="numpy"))
+    IndexManifest(IndexManifest.load().path, {"docs/old.txt": {"sha256": "old", "chunk_ids": []}}).save()
+
+    get, pages = BundleCollection.get, []
+
+    def get_then_interrupt(self, *args, **kwargs):
+        if pages:
+            raise KeyboardInterrupt  # Second page: the import is killed
+        pages.append(kwargs.get("offset"))
+        return get(self, *args, **kwargs)
+
+    monkeypatch.setattr(BundleCollection, "get", get_then_interrupt)
+    make_store(backend="chroma")
+    with pytest.raises(KeyboardInterrupt):
+        import_bundle("bundle", verify=False, page_size=50)
+
+    store = make_store(backend="chroma")
+    assert 0 < store.get_collection_info()["count"] < N_CHUNKS
+    assert any("did not complete" in mismatch for mismatch in store.index_mismatches())
+    assert IndexManifest.load().files == {}  # Nothing claims to be indexed
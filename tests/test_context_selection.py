@@ -0,0 +1,93 @@
+"""Maximal marginal relevance and the advanced agent's fused, diversity-aware context selection
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.advanced_generator import AdvancedGeneratorAgent
+from config import ADVANCED_GENERATOR_CONFIG
+from utils.mmr import maximal_marginal_relevance
+
+# Items 0 and 1 are the same text; 2 and 3 point elsewhere
+VECTORS = np.array([[1.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.6, 0.0, 0.8]], dtype=np.float32)
+RELEVANCE = np.array([1.0, 0.95, 0.6, 0.5])
+
+
+def test_lambda_one_keeps_relevance_order():
+    assert maximal_marginal_relevance(RELEVANCE, VECTORS, k=3, lambda_=1.0) == [0, 1, 2]
+
+
+def test_diversity_pushes_a_repeat_down():
+    picked = maximal_marginal_relevance(RELEVANCE, VECTORS, k=4, lambda_=0.7)
+    assert picked[0] == 0
+    assert picked.index(2) < picked.index(1)  # A new direction beats the copy of the first pick
+    assert sorted(picked) == [0, 1, 2, 3]
+
+
+def test_redundancy_threshold_drops_near_copies():
+    picked = maximal_marginal_relevance(RELEVANCE, VECTORS, k=4, lambda_=1.0, redundancy_threshold=0.95)
+    assert picked == [0, 2, 3]
+
+
+@pytest.mark.parametrize("k", [0, 1, 10])
+def test_k_bounds_the_selection(k):
+    assert len(maximal_marginal_relevance(RELEVANCE, VECTORS, k=k)) == min(k, len(RELEVANCE))
+
+
+def test_empty_and_zero_vectors():
+    assert maximal_marginal_relevance(np.zeros(0), np.zeros((0, 3)), k=5) == []
+    assert maximal_marginal_relevance([0.2, 0.9], np.zeros((2, 3)), k=2) == [1, 0]
+
+
+class StoredVectors:
+    """get_embeddings over a fixed table; ids missing from it count as deleted"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def get_embeddings(self, ids):
+        return {chunk_id: self.vectors[chunk_id] for chunk_id in ids if chunk_id in self.vectors}
+
+
+def selector(vectors, **settings) -> AdvancedGeneratorAgent:
+    # Bypasses __init__: context selection only needs the store and its settings
+    agent = AdvancedGeneratorAgent.__new__(AdvancedGeneratorAgent)
+    agent.vector_store = StoredVectors(vectors)
+    agent.config = {
+        **ADVANCED_GENERATOR_CONFIG,
+        "context_selection": {**ADVANCED_GENERATOR_CONFIG["context_selection"], **settings},
+    }
+    return agent
+
+
+def test_chunks_found_by_several_retrievals_come_first():
+    vectors = {f"c{i}": np.eye(6, dtype=np.float32)[i] for i in range(6)}
+    rankings = [
+        [("c0", 0.1), ("c1", 0.2), ("c4", 0.3)],
+        [("c2", 0.1), ("c4", 0.2)],
+        [("c3", 0.1), ("c4", 0.4), ("c5", 0.5)],
+    ]
+    selected, metadata = selector(vectors, max_chunks=4, mmr_lambda=1.0)._select_context(rankings)
+    assert [chunk_id for chunk_id, _ in selected] == ["c4", "c0", "c2", "c3"]
+    assert metadata == {"retrievals": 3, "candidates": 6, "selected": 4}
+
+
+def test_duplicates_and_deleted_chunks_are_left_out():
+    vectors = {
+        "a": np.array([1.0, 0.0], dtype=np.float32),
+        "a_copy": np.array([1.0, 0.01], dtype=np.float32),
+        "b": np.array([0.0, 1.0], dtype=np.float32),
+    }
+    rankings = [[("a", 0.1), ("a_copy", 0.1), ("gone", 0.2), ("b", 0.3)]]
+    selected, metadata = selector(vectors, max_chunks=8)._select_context(rankings)
+    assert [chunk_id for chunk_id, _ in selected] == ["a", "b"]
+    assert metadata["candidates"] == 4 and metadata["selected"] == 2
+    assert selector({})._select_context(rankings) == ([], {"retrievals": 1, "candidates": 4, "selected": 0})
@@ -0,0 +1,67 @@
+"""EmbeddingCache hits and misses across the memory and disk levels, and VectorStore encodes through it
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.embedding_cache import EmbeddingCache
+
+
+def vectors(n: int) -> np.ndarray:
+    return np.random.default_rng(n).standard_normal((n, 8)).astype(np.float32)
+
+
+def test_memory_and_disk_hits(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache("model-a", path=path)
+    assert cache.get_many(["alpha", "beta"]) == [None, None]
+    stored = vectors(2)
+    cache.put_many(["alpha", "beta"], stored)
+    found = cache.get_many(["beta", "alpha", "gamma"])
+    np.testing.assert_array_equal(found[0], stored[1])
+    assert found[2] is None
+    assert cache.get_stats()["memory_hits"] == 2
+    cache.close()
+
+    reopened = EmbeddingCache("model-a", path=path)
+    np.testing.assert_array_equal(reopened.get_many(["alpha"])[0], stored[0])
+    reopened.get_many(["alpha"])
+    stats = reopened.get_stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+
+
+def test_keys_are_normalized_and_namespaced_by_model():
+    cache = EmbeddingCache("model-a", path=None)
+    cache.put_many(["two  words\n"], vectors(1))
+    assert cache.get_many(["two words"])[0] is not None
+    assert cache.get_many(["Two words"])[0] is None  # Case is meaningful to the model
+    assert EmbeddingCache("model-b", path=None).key("two words") != cache.key("two words")
+
+
+def test_memory_level_is_bounded(tmp_path):
+    cache = EmbeddingCache("model-a", path=str(tmp_path / "cache.sqlite"), max_memory_items=2)
+    cache.put_many(["a", "b", "c"], vectors(3))
+    assert cache.get_stats()["memory_items"] == 2
+    assert cache.get_many(["a"])[0] is not None  # Evicted from memory, still on disk
+    assert cache.get_stats()["disk_hits"] == 1
+
+
+def test_vector_store_encodes_each_text_once(make_store):
+    store = make_store(backend="numpy")
+    first = store._encode(["alpha", "beta", "alpha"])
+    assert store.embedding_model.texts == 2
+    np.testing.assert_array_equal(first[0], first[2])
+    np.testing.assert_array_equal(store._encode(["beta", "alpha"]), first[[1, 0]])
+    assert store.embedding_model.texts == 2
+
+    restarted = make_store(backend="numpy")
+    np.testing.assert_array_equal(restarted._encode(["alpha"]), first[:1])
+    assert restarted.embedding_model.texts == 0  # Served from disk
+    assert restarted.get_embedding_cache_stats()["disk_hits"] == 1
@@ -0,0 +1,146 @@
+"""Incremental ingest: manifest diffing, failed writes, and near-duplicate filtering across runs
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import IndexManifest, ingest_documents
+from utils.dedupe import NearDuplicateFilter
+
+
+def paragraph(name: str, n_words: int = 150) -> str:
+    return " ".join(f"{name}{i}" for i in range(n_words))
+
+
+def write_doc(folder: str, name: str, text: str):
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, name), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def indexed_ids(store):
+    return set(store.collection.get(include=[])["ids"])
+
+
+def manifest_ids(manifest):
+    return {chunk_id for entry in manifest.files.values() for chunk_id in entry["chunk_ids"]}
+
+
+def test_rerun_only_touches_what_changed(make_store):
+    store = make_store(backend="numpy")
+    for name in ("a", "b", "c"):
+        write_doc("docs", f"{name}.txt", paragraph(name))
+    manifest = IndexManifest.load()
+    stats = ingest_documents("docs", store, manifest=manifest, workers=1, progress=False)
+    assert stats.files_added == 3
+    assert indexed_ids(store) == manifest_ids(manifest)
+
+    write_doc("docs", "b.txt", paragraph("b") + " more words at the end")
+    os.remove(os.path.join("docs", "c.txt"))
+    write_doc("docs", "d.txt", paragraph("d"))
+    embedded = store.embedding_model.texts
+    stats = ingest_documents("docs", store, manifest=manifest, workers=1, progress=False)
+    assert (stats.files_unchanged, stats.files_changed, stats.files_removed, stats.files_added) == (1, 1, 1, 1)
+    assert sorted(manifest.files) == ["a.txt", "b.txt", "d.txt"]
+    assert indexed_ids(store) == manifest_ids(manifest)
+    assert stats.chunks_reused > 0
+    assert store.embedding_model.texts - embedded == stats.chunks_written  # Reused chunks are not re-embedded
+
+
+@pytest.mark.parametrize("batch_size, recorded", [
+    (2, ["a.txt", "b.txt"]),  # Two chunks per file: batches line up with files
+    (3, ["a.txt"]),  # b.txt's last chunk shares the failing batch with c.txt's
+])
+def test_failed_writes_leave_files_out_of_the_manifest(make_store, monkeypatch, batch_size, recorded):
+    store = make_store(backend="numpy")
+    for name in ("a", "b", "c", "d"):
+        write_doc("docs", f"{name}.txt", paragraph(name))
+    upsert = store.upsert_documents
+
+    def fail_on_c(texts, metadatas, ids=None):
+        if any(metadata["source"] == "c.txt" for metadata in metadatas):
+            raise RuntimeError("disk full")
+        return upsert(texts, metadatas, ids=ids)
+
+    monkeypatch.setattr(store, "upsert_documents", fail_on_c)
+    manifest = IndexManifest.load()
+    paths = [os.path.join("docs", f"{name}.txt") for name in ("a", "b", "c", "d")]  # Processed in this order
+    with pytest.raises(RuntimeError, match="disk full"):
+        ingest_documents("docs", store, manifest=manifest, paths=paths, workers=1, batch_size=batch_size, progress=False)
+    assert sorted(manifest.files) == recorded  # What was written before the failure is kept
+    assert manifest_ids(manifest) <= indexed_ids(store)
+
+    monkeypatch.setattr(store, "upsert_documents", upsert)
+    stats = ingest_documents("docs", store, manifest=manifest, workers=1, progress=False)
+    assert stats.files_added == 4 - stats.files_unchanged
+    assert sorted(manifest.files) == ["a.txt", "b.txt", "c.txt", "d.txt"]
+    assert indexed_ids(store) == manifest_ids(manifest)
+
+
+def test_failed_removal_keeps_the_entry(make_store, monkeypatch):
+    store = make_store(backend="numpy")
+    write_doc("docs", "a.txt", paragraph("a"))
+    manifest = IndexManifest.load()
+    ingest_documents("docs", store, manifest=manifest, workers=1, progress=False)
+    os.remove(os.path.join("docs", "a.txt"))
+
+    monkeypatch.setattr(store, "delete_documents", lambda ids: (_ for _ in ()).throw(RuntimeError("locked")))
+    with pytest.raises(RuntimeError, match="locked"):
+        ingest_documents("docs", store, manifest=manifest, workers=1, progress=False)
+    assert "a.txt" in manifest.files  # Retried on the next run
+
+
+def test_duplicates_of_indexed_chunks_are_dropped_on_later_runs(make_store):
+    store = make_store(backend="numpy")
+    write_doc("docs", "a.txt", paragraph("shared"))
+    manifest = IndexManifest.load()
+    ingest_documents("docs", store, manifest=manifest, workers=1, dedupe=True, progress=False)
+    original = indexed_ids(store)
+
+    write_doc("docs", "b.txt", paragraph("shared"))
+    stats = ingest_documents("docs", store, manifest=manifest, workers=1, dedupe=True, progress=False)
+    assert stats.files_added == 1 and stats.chunks_written == 0
+    assert stats.chunks_deduplicated == len(original)
+    assert manifest.files["b.txt"]["chunk_ids"] == []
+    assert indexed_ids(store) == original
+    assert manifest.files["b.txt"]["alias_sources"] == ["a.txt"]
+    metadatas = store.collection.get(ids=sorted(original), include=["metadatas"])["metadatas"]
+    assert all(metadata["duplicate_ids"].startswith("b.txt:") for metadata in metadatas)
+
+    write_doc("docs", "c.txt", paragraph("shared"))
+    ingest_documents("docs", store, manifest=manifest, workers=1, dedupe=True, progress=False)
+    metadatas = store.collection.get(ids=sorted(original), include=["metadatas"])["metadatas"]
+    assert all(metadata["n_duplicates"] == 2 for metadata in metadatas)  # Appended, not replaced
+
+
+@pytest.mark.parametrize("changed_words, is_duplicate", [
+    (0, True),
+    (1, True),
+    (40, False),
+    (200, False),
+])
+def test_near_duplicate_threshold(changed_words, is_duplicate):
+    duplicate_filter = NearDuplicateFilter(threshold=0.85, num_perm=64, bands=16, shingle_size=5)
+    words = paragraph("w", 200).split()
+    assert duplicate_filter.check("first", " ".join(words), "a.txt") is None
+    for i in range(changed_words):
+        words[(i * 37) % len(words)] = f"other{i}"  # Spread out so every edit breaks its own shingles
+    match = duplicate_filter.check("second", " ".join(words), "b.txt")
+    assert (match == ("first", "a.txt")) == is_duplicate
+    assert duplicate_filter.aliases == ({"first": ["second"]} if is_duplicate else {})
+
+
+def test_registered_and_checked_chunks_are_both_matched():
+    duplicate_filter = NearDuplicateFilter()
+    text = paragraph("w", 50)
+    duplicate_filter.add("kept", text, "a.txt")
+    assert duplicate_filter.check("new", text.upper(), "b.txt") == ("kept", "a.txt")  # Case-insensitive
+    assert duplicate_filter.check("other", paragraph("x", 50), "b.txt") is None
+    assert duplicate_filter.check("again", paragraph("x", 50), "c.txt") == ("other", "b.txt")
@@ -0,0 +1,91 @@
+"""IVFPQCollection recall against exact search, deletes, and reopening after partial writes
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes.ivfpq import IVFPQCollection
+
+DIM = 32
+N_VECTORS = 3000
+PARAMS = {
+    "min_train_size": 2000,
+    "nlist": 16,
+    "m": 8,
+    "nprobe": 4,
+    "recall_target": 0.95,
+    "background_training": False,
+}
+
+
+def clustered_vectors(n: int, seed: int = 0) -> np.ndarray:
+    centers = np.random.default_rng(0).standard_normal((24, DIM))  # Queries come from the data's clusters
+    rng = np.random.default_rng(seed + 1)
+    vectors = centers[rng.integers(0, 24, n)] + 0.4 * rng.standard_normal((n, DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture
+def collection(tmp_path):
+    collection = IVFPQCollection("kb", str(tmp_path / "kb"), **PARAMS)
+    vectors = clustered_vectors(N_VECTORS)
+    for start in range(0, N_VECTORS, 500):
+        collection.add([f"chunk_{i}" for i in range(start, start + 500)], vectors[start:start + 500])
+    return collection
+
+
+def test_trains_at_min_train_size_and_reaches_the_recall_target(collection):
+    stats = collection.get_index_stats()
+    assert stats["trained"] and stats["vectors"] == N_VECTORS
+    assert stats["nprobe"] < stats["nlist"]  # Tuning stopped before scanning every list
+    queries = clustered_vectors(50, seed=1)
+    assert collection.recall(queries, k=10) >= 0.9
+
+
+def test_deleted_rows_are_never_returned(collection):
+    queries = clustered_vectors(20, seed=2)
+    first = collection.query(queries, 5, include=[])["ids"]
+    deleted = sorted({chunk_id for row in first for chunk_id in row})
+    collection.delete(ids=deleted)
+    after = collection.query(queries, 5, include=[])["ids"]
+    assert all(len(row) == 5 for row in after)
+    assert not set(deleted) & {chunk_id for row in after for chunk_id in row}
+
+
+def test_compaction_keeps_the_trained_index(collection):
+    collection.delete(ids=[f"chunk_{i}" for i in range(2000)])  # Two thirds dead: compacts
+    stats = collection.get_index_stats()
+    assert stats["trained"] and stats["vectors"] == 1000
+    assert collection.recall(clustered_vectors(20, seed=3), k=5) >= 0.9
+
+
+def test_reopen_restores_lists_and_tuned_nprobe(collection):
+    queries = clustered_vectors(10, seed=4)
+    before = collection.query(queries, 5, include=[])["ids"]
+    reopened = IVFPQCollection("kb", collection.path, **{**PARAMS, "nprobe": 1})
+    assert reopened.get_index_stats()["nprobe"] == collection.get_index_stats()["nprobe"]
+    assert reopened.query(queries, 5, include=[])["ids"] == before
+
+
+@pytest.mark.parametrize("lost", ["ivfpq.json", "ivfpq_codes.bin"])
+def test_reopen_tolerates_a_missing_file(collection, lost):
+    # A crash between the quantizer, nprobe and code writes leaves one of them behind
+    os.remove(os.path.join(collection.path, lost))
+    reopened = IVFPQCollection("kb", collection.path, **PARAMS)
+    stats = reopened.get_index_stats()
+    assert stats["trained"] and stats["vectors"] == N_VECTORS
+    if lost == "ivfpq.json":
+        assert stats["nprobe"] == PARAMS["nprobe"]
+    assert reopened.recall(clustered_vectors(20, seed=5), k=10) >= 0.8
+
+
+def test_no_temporary_files_are_left_behind(collection):
+    assert not [name for name in os.listdir(collection.path) if name.endswith(".tmp")]
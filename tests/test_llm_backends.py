@@ -0,0 +1,123 @@
+"""OllamaBackend and its connection pool against the in-process Ollama stub
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.llm_backends import OllamaBackend
+from utils.ollama_stub import OllamaStubServer, echo_reply
+
+MODEL = "stub-model"
+
+
+def failing_reply(prompt: str) -> str:
+    raise RuntimeError("model runner crashed")
+
+
+@pytest.fixture
+def server():
+    with OllamaStubServer() as server:
+        yield server
+
+
+def backend_for(server: OllamaStubServer, **kwargs) -> OllamaBackend:
+    # Each stub listens on its own port, so every test gets a fresh pool
+    return OllamaBackend(MODEL, base_url=server.url, **kwargs)
+
+
+def test_generate(server):
+    backend = backend_for(server)
+    assert backend.generate("why is the sky blue") == echo_reply("why is the sky blue")
+
+
+def test_stream_yields_the_reply_token_by_token(server):
+    backend = backend_for(server)
+    tokens = list(backend.stream("why is the sky blue"))
+    assert len(tokens) > 1
+    assert "".join(tokens) == echo_reply("why is the sky blue")
+
+
+def test_chat(server):
+    backend = backend_for(server)
+    messages = [{"role": "system", "content": "be brief"}, {"role": "user", "content": "hello there"}]
+    assert backend.chat(messages) == echo_reply("hello there")
+
+
+def test_chat_stream(server):
+    backend = backend_for(server)
+    tokens = list(backend.chat_stream([{"role": "user", "content": "hello there"}]))
+    assert len(tokens) > 1
+    assert "".join(tokens) == echo_reply("hello there")
+
+
+def test_pool_reuses_connections(server):
+    backend = backend_for(server)
+    backend.generate("one")
+    list(backend.stream("two"))
+    backend.chat([{"role": "user", "content": "three"}])
+    list(backend.chat_stream([{"role": "user", "content": "four"}]))
+
+    stats = backend.get_stats()
+    assert stats["requests"] == 4
+    assert stats["connections_opened"] == 1
+    assert stats["reused"] == 3
+    assert server.stats["connections"] == 1
+
+
+def test_retries_connection_closed_by_server_while_idle():
+    with OllamaStubServer(idle_timeout=0.1) as server:
+        backend = backend_for(server)
+        backend.generate("first")
+        time.sleep(0.5)  # The server drops the kept-alive connection
+        assert backend.generate("second") == echo_reply("second")
+
+        stats = backend.get_stats()
+        assert stats["retried"] == 1
+        assert stats["connections_opened"] == 2
+
+
+def test_closing_a_stream_early_leaves_the_backend_usable(server):
+    backend = backend_for(server)
+    tokens = backend.stream("a long answer that is abandoned after its first token")
+    assert next(tokens)
+    tokens.close()
+
+    # The half-read connection is discarded rather than handed to the next call
+    assert backend.generate("next") == echo_reply("next")
+    assert "".join(backend.stream("after")) == echo_reply("after")
+    assert backend.get_stats()["connections_opened"] == 2
+
+
+def test_non_200_response_raises(server):
+    backend = backend_for(server, keep_alive="soon")
+    with pytest.raises(Exception, match="returned 400: Invalid keep_alive"):
+        backend.generate("hello")
+    with pytest.raises(Exception, match="returned 400: Invalid keep_alive"):
+        list(backend.stream("hello"))
+
+
+def test_failed_generation_raises():
+    with OllamaStubServer(reply=failing_reply) as server:
+        backend = backend_for(server)
+        with pytest.raises(Exception, match="returned 500: model runner crashed"):
+            backend.generate("hello")
+
+
+def test_error_chunk_in_stream_raises():
+    with OllamaStubServer(reply=failing_reply) as server:
+        backend = backend_for(server)
+        with pytest.raises(Exception, match="Error generating response: model runner crashed"):
+            list(backend.stream("hello"))
+        with pytest.raises(Exception, match="model runner crashed"):
+            list(backend.chat_stream([{"role": "user", "content": "hello"}]))
+
+        server.reply = echo_reply
+        assert backend.generate("recovered") == echo_reply("recovered")
@@ -0,0 +1,125 @@
+"""NumpyCollection `where` filters answered from metadata postings, checked against a plain scan
+
+Usage:
+    python -m pytest tests/
+"""
+
+import operator
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes.numpy_collection import NumpyCollection, _Column
+
+RANGE_OPS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def equals(stored, value) -> bool:
+    # Chroma never matches a bool against a number (True != 1)
+    return stored is not None and isinstance(stored, bool) == isinstance(value, bool) and stored == value
+
+
+def matches(metadata, where) -> bool:
+    """Reference evaluation of a Chroma `where` filter on one record"""
+    key, condition = next(iter(where.items()))
+    if key == "$and":
+        return all(matches(metadata, clause) for clause in condition)
+    if key == "$or":
+        return any(matches(metadata, clause) for clause in condition)
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+    op, value = next(iter(condition.items()))
+    stored = metadata.get(key)
+    if op in ("$eq", "$ne"):
+        return equals(stored, value) == (op == "$eq")
+    if op in ("$in", "$nin"):
+        return any(equals(stored, item) for item in value) == (op == "$in")
+    return is_number(stored) and RANGE_OPS[op](stored, value)
+
+
+def random_metadata(rng: random.Random):
+    metadata = {
+        "source": rng.choice(["a.txt", "b.txt", "c.txt"]),
+        "chunk_index": rng.randrange(20),
+        "score": rng.choice([0.5, 1.0, 2.5, "high"]),
+        "flag": rng.choice([True, False, 1, 0]),
+    }
+    if rng.random() < 0.3:
+        del metadata["score"]  # Missing keys
+    return metadata
+
+
+WHERES = [
+    {"source": "a.txt"},
+    {"source": {"$ne": "a.txt"}},
+    {"source": {"$in": ["a.txt", "c.txt"]}},
+    {"source": {"$nin": ["a.txt", "missing.txt"]}},
+    {"chunk_index": {"$gte": 5}},
+    {"chunk_index": {"$lt": 3}},
+    {"score": {"$gt": 0.75}},
+    {"score": {"$lte": 1}},
+    {"score": "high"},
+    {"score": {"$ne": 1.0}},  # Also matches rows without a score
+    {"flag": True},
+    {"flag": 1},
+    {"flag": {"$in": [False]}},
+    {"$and": [{"source": "b.txt"}, {"chunk_index": {"$gt": 10}}]},
+    {"$or": [{"flag": True}, {"$and": [{"source": "c.txt"}, {"score": {"$gte": 2}}]}]},
+    {"unknown": "x"},
+    {"unknown": {"$ne": "x"}},
+    {"unknown": {"$gt": 1}},
+]
+
+
+@pytest.fixture
+def collection():
+    rng = random.Random(0)
+    collection = NumpyCollection("kb")
+    n = 300
+    ids = [f"chunk_{i}" for i in range(n)]
+    vectors = np.random.default_rng(0).standard_normal((n, 8)).astype(np.float32)
+    collection.add(ids, vectors, [f"doc {i}" for i in range(n)], [random_metadata(rng) for _ in range(n)])
+    # Changed values leave stale postings behind until they are rebuilt
+    collection.update(ids[::3], [random_metadata(rng) for _ in ids[::3]])
+    collection.delete(ids=ids[::7])
+    return collection
+
+
+@pytest.mark.parametrize("where", WHERES)
+def test_filters_match_a_plain_scan(collection, where):
+    records = collection.get(include=["metadatas"])
+    expected = [chunk_id for chunk_id, metadata in zip(records["ids"], records["metadatas"]) if matches(metadata, where)]
+    assert collection.get(where=where, include=[])["ids"] == expected
+
+
+@pytest.mark.parametrize("where", [{"source": "a.txt"}, {"chunk_index": {"$lt": 3}}, {"flag": {"$ne": True}}])
+def test_filtered_queries_rank_only_matching_rows(collection, where):
+    query = np.random.default_rng(1).standard_normal((1, 8)).astype(np.float32)
+    allowed = set(collection.get(where=where, include=[])["ids"])
+    results = collection.query(query, 5, where=where, include=["metadatas"])
+    assert set(results["ids"][0]) <= allowed and len(results["ids"][0]) == min(5, len(allowed))
+    assert all(matches(metadata, where) for metadata in results["metadatas"][0])
+
+
+def test_postings_rebuild_drops_stale_entries():
+    column = _Column.from_values(["a", "b", None, "a"])
+    for _ in range(3000):
+        column.set(0, "b")
+        column.set(0, "a")
+    assert column.stale <= max(1024, column.entries // 2)  # Rebuilt along the way
+    # A row that went back to an earlier value may be listed more than once; filters use the rows as a mask
+    assert np.unique(column.equal_rows("a", 4)).tolist() == [0, 3]
+    assert column.equal_rows("b", 4).tolist() == [1]
+    column.rebuild_postings(4)
+    assert column.stale == 0 and column.entries == 3
+    assert column.equal_rows("a", 4).tolist() == [0, 3]
+    assert column.equal_rows("a", 1).tolist() == [0]  # Rows past n_rows are ignored
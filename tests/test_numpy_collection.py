@@ -0,0 +1,118 @@
+"""NumpyCollection persistence: log replay, torn writes, and compaction interrupted at every step
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import indexes.numpy_collection as numpy_collection
+from indexes.numpy_collection import NumpyCollection
+
+DIM = 8
+
+
+def unit_vectors(n: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((n, DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def fill(collection, n: int = 100):
+    ids = [f"chunk_{i}" for i in range(n)]
+    collection.add(ids, unit_vectors(n), [f"doc {i}" for i in range(n)], [{"part": i % 4} for i in range(n)])
+    return ids
+
+
+def snapshot(collection):
+    records = collection.get(include=["documents", "metadatas", "embeddings"])
+    return records["ids"], records["documents"], records["metadatas"], records["embeddings"].tolist()
+
+
+def test_reopen_replays_adds_updates_and_deletes(tmp_path):
+    path = str(tmp_path / "kb")
+    collection = NumpyCollection("kb", path)
+    ids = fill(collection)
+    collection.update(ids[:3], [{"part": 9, "extra": True}] * 3)
+    collection.delete(ids=ids[10:20])
+    collection.upsert(["chunk_5"], unit_vectors(1, seed=1), ["replaced"], [{"part": 7}])
+
+    reopened = NumpyCollection("kb", path)
+    assert reopened.count() == 90
+    assert snapshot(reopened) == snapshot(collection)
+    assert reopened.get(ids=["chunk_1"])["metadatas"] == [{"part": 9, "extra": True}]
+
+
+def test_torn_log_line_and_short_vector_file_are_dropped(tmp_path):
+    path = str(tmp_path / "kb")
+    collection = NumpyCollection("kb", path)
+    fill(collection, 10)
+    with open(os.path.join(path, "log.jsonl"), "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "id": "chunk_10", "docu')  # Crash mid-append
+    reopened = NumpyCollection("kb", path)
+    assert reopened.count() == 10
+
+    # An add logged without its vector row is dropped too
+    reopened.add(["chunk_10"], unit_vectors(1, seed=2), ["doc 10"], [{"part": 2}])
+    with open(os.path.join(path, "vectors.f32"), "r+b") as f:
+        f.truncate(10 * DIM * 4)
+    assert NumpyCollection("kb", path).count() == 10
+
+
+def test_deleting_most_rows_compacts_the_files(tmp_path):
+    path = str(tmp_path / "kb")
+    collection = NumpyCollection("kb", path)
+    ids = fill(collection)
+    vector_bytes = os.path.getsize(os.path.join(path, "vectors.f32"))
+    query = unit_vectors(1, seed=3)
+    collection.delete(ids=ids[:60])
+    assert os.path.getsize(os.path.join(path, "vectors.f32")) == vector_bytes * 40 // 100
+    assert not os.path.exists(f"{path}.old") and not os.path.exists(f"{path}.compact")
+    expected = collection.query(query, 5)
+    assert not set(ids[:60]) & set(expected["ids"][0])
+    assert NumpyCollection("kb", path).query(query, 5) == expected
+
+
+@pytest.mark.parametrize("failing_call", [1, 2])
+def test_interrupted_compaction_is_recovered_on_open(tmp_path, monkeypatch, failing_call):
+    # Call 1 moves the collection to <path>.old, call 2 moves <path>.compact into place
+    path = str(tmp_path / "kb")
+    collection = NumpyCollection("kb", path)
+    ids = fill(collection)
+    collection.delete(ids=ids[:40])
+    expected = snapshot(collection)
+
+    replace, calls = os.replace, []
+
+    def crash_on_call(src, dst):
+        calls.append(src)
+        if len(calls) == failing_call:
+            raise KeyboardInterrupt  # The process dies here
+        return replace(src, dst)
+
+    monkeypatch.setattr(numpy_collection.os, "replace", crash_on_call)
+    with pytest.raises(KeyboardInterrupt):
+        collection.delete(ids=ids[40:60])  # Over half dead: compacts
+    monkeypatch.setattr(numpy_collection.os, "replace", replace)
+
+    reopened = NumpyCollection("kb", path)
+    assert not os.path.exists(f"{path}.old") and not os.path.exists(f"{path}.compact")
+    ids_after, documents, metadatas, embeddings = snapshot(reopened)
+    assert set(ids_after) == set(expected[0]) - set(ids[40:60])  # The deletes were logged first
+    assert len(ids_after) == len(documents) == len(metadatas) == len(embeddings) == 40
+
+
+def test_leftover_old_directory_after_the_swap_is_removed(tmp_path):
+    path = str(tmp_path / "kb")
+    collection = NumpyCollection("kb", path)
+    fill(collection, 10)
+    expected = snapshot(collection)
+    os.makedirs(f"{path}.old")  # Crash after the swap, before the old copy was deleted
+    reopened = NumpyCollection("kb", path)
+    assert not os.path.exists(f"{path}.old")
+    assert snapshot(reopened) == expected
@@ -0,0 +1,100 @@
+"""Chunking: chunk_text compatibility, span offsets, token windows and streamed chunking
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import random
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from preprocess import (
+    chunk_text, clean_text, word_chunk_spans, token_chunk_spans, chunk_spans,
+    iter_stream_chunk_spans, process_text
+)
+
+
+def make_text(n_words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    vocabulary = ["the", "model", "retrieval", "of", "neural", "network", "v1.2", "user-014", "ö", "encyclopaedic"]
+    return " ".join(rng.choice(vocabulary) for _ in range(n_words))
+
+
+def piece_tokenizer(text, **kwargs):
+    """Stand-in word-piece tokenizer: every word split into pieces of up to 3 characters"""
+    offsets = []
+    for match in re.finditer(r"\S+", text):
+        for start in range(match.start(), match.end(), 3):
+            offsets.append((start, min(start + 3, match.end())))
+    return {"offset_mapping": offsets}
+
+
+@pytest.mark.parametrize("text, max_words, overlap_words, expected", [
+    ("", 100, 20, [""]),
+    ("  one\ttwo \n three ", 100, 20, ["one two three"]),
+    ("a b c d e f g", 4, 2, ["a b c d", "c d e f", "e f g", "g"]),  # Windows continue past the end
+    ("a b c d e f", 3, 0, ["a b c", "d e f"]),
+])
+def test_chunk_text_keeps_the_split_join_behaviour(text, max_words, overlap_words, expected):
+    assert chunk_text(text, max_words, overlap_words) == expected
+
+
+@pytest.mark.parametrize("n_words, max_words, overlap_words", [
+    (0, 100, 20), (5, 100, 20), (100, 100, 20), (101, 100, 20), (250, 100, 20), (1000, 100, 20),
+    (997, 64, 24), (300, 50, 0), (31, 7, 3),
+])
+def test_word_spans_slice_the_chunks_chunk_text_returns(n_words, max_words, overlap_words):
+    text = make_text(n_words, seed=n_words)
+    spans = word_chunk_spans(text, max_words, overlap_words)
+    expected = chunk_text(text, max_words, overlap_words) if n_words else []
+    assert [text[start:end] for start, end in spans] == expected
+
+
+def test_token_windows_respect_the_limit_and_word_boundaries():
+    text = make_text(2000)
+    spans = token_chunk_spans(text, max_tokens=40, overlap_tokens=8, tokenizer=piece_tokenizer)
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    for (start, end), (next_start, _) in zip(spans, spans[1:]):
+        assert next_start < end  # Consecutive windows overlap
+        assert text[next_start - 1] == " "  # ...and start on a word
+    for start, end in spans:
+        chunk = text[start:end]
+        assert chunk == chunk.strip()
+        assert len(piece_tokenizer(chunk)["offset_mapping"]) <= 40
+        assert end == len(text) or text[end] == " "
+
+
+def test_a_word_longer_than_the_window_is_split():
+    text = "short " + "x" * 60 + " tail"
+    spans = token_chunk_spans(text, max_tokens=8, overlap_tokens=2, tokenizer=piece_tokenizer)
+    assert all(len(piece_tokenizer(text[s:e])["offset_mapping"]) <= 8 for s, e in spans)
+    assert spans[-1][1] == len(text)
+
+
+def test_process_text_offsets_point_into_the_cleaned_text(monkeypatch):
+    monkeypatch.setitem(config.CHUNK_CONFIG, "strategy", "words")
+    raw = "<p>" + make_text(700, seed=3).replace(" the ", "  the\n") + "</p>"
+    cleaned = clean_text(raw)
+    chunks = process_text(raw, "docs/sample.txt")
+    assert [chunk["text"] for chunk in chunks] == chunk_text(cleaned, 100, 20)
+    for i, chunk in enumerate(chunks):
+        metadata = chunk["metadata"]
+        assert cleaned[metadata["char_start"]:metadata["char_end"]] == chunk["text"]
+        assert metadata["chunk_index"] == i and metadata["total_chunks"] == len(chunks)
+
+
+@pytest.mark.parametrize("strategy", ["words", "tokens"])
+def test_streamed_chunks_match_whole_text_chunks(monkeypatch, strategy):
+    monkeypatch.setitem(config.CHUNK_CONFIG, "strategy", strategy)
+    monkeypatch.setattr("preprocess.get_tokenizer", lambda model_name=None: piece_tokenizer)
+    text = make_text(5000, seed=7)
+    pieces = [text[i:i + 997] for i in range(0, len(text), 997)]  # Cuts through words
+    streamed = list(iter_stream_chunk_spans(iter(pieces), buffer_chars=4096))
+    assert [(start, end) for start, end, _ in streamed] == chunk_spans(text)
+    assert all(text[start:end] == chunk for start, end, chunk in streamed)
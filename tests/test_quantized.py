@@ -0,0 +1,123 @@
+"""QuantizedCollection recall, filters, compaction and reopen against exact float32 search
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes.numpy_collection import NumpyCollection
+from indexes.quantized import QuantizedCollection, quantize
+
+DIM = 32
+
+
+def clustered_vectors(n: int, seed: int = 0) -> np.ndarray:
+    centers = np.random.default_rng(0).standard_normal((16, DIM))  # Queries come from the data's clusters
+    rng = np.random.default_rng(seed + 1)
+    vectors = centers[rng.integers(0, 16, n)] + 0.3 * rng.standard_normal((n, DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def fill(collection, n: int = 2000):
+    vectors = clustered_vectors(n)
+    ids = [f"chunk_{i}" for i in range(n)]
+    for start in range(0, n, 500):
+        collection.add(
+            ids[start:start + 500],
+            vectors[start:start + 500],
+            [f"doc {i}" for i in range(start, min(start + 500, n))],
+            [{"part": i % 10} for i in range(start, min(start + 500, n))]
+        )
+    return ids, vectors
+
+
+def exact_ids(collection, queries, k, where=None):
+    return NumpyCollection.query(collection, queries, k, where=where, include=[])["ids"]
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_quantize_roundtrip_error_is_small(dtype):
+    vectors = clustered_vectors(100)
+    codes, scales = quantize(vectors, dtype)
+    restored = codes.astype(np.float32) * scales[:, None]
+    assert np.abs(restored - vectors).max() < 0.01
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_rescored_recall_matches_exact_search(tmp_path, dtype):
+    collection = QuantizedCollection("kb", str(tmp_path / "kb"), dtype=dtype, rescore_factor=4)
+    fill(collection)
+    queries = clustered_vectors(20, seed=1)
+    assert collection.recall(queries, k=10) >= 0.99
+    assert collection.recall(queries, k=10, rescore=False) >= 0.9
+
+
+def test_results_carry_exact_distances_and_documents(tmp_path):
+    collection = QuantizedCollection("kb", str(tmp_path / "kb"))
+    ids, vectors = fill(collection)
+    results = collection.query(vectors[:1], 3)
+    assert results["ids"][0][0] == ids[0]
+    assert results["documents"][0][0] == "doc 0"
+    assert results["distances"][0][0] == pytest.approx(0.0, abs=1e-5)
+
+
+@pytest.mark.parametrize("part", [3, {"$ne": 3}])
+def test_filtered_queries_only_return_matching_rows(tmp_path, part):
+    # A selective filter gathers the matching codes, a broad one masks the rest
+    collection = QuantizedCollection("kb", str(tmp_path / "kb"))
+    fill(collection)
+    queries = clustered_vectors(5, seed=2)
+    where = {"part": part}
+    results = collection.query(queries, 10, where=where, include=["metadatas"])
+    for metadatas in results["metadatas"]:
+        assert len(metadatas) == 10
+        assert all((m["part"] == 3) == (part == 3) for m in metadatas)
+    found, expected = results["ids"], exact_ids(collection, queries, 10, where)
+    assert sum(len(set(a) & set(b)) for a, b in zip(found, expected)) >= 0.98 * 50
+
+
+def test_deletes_compact_codes_and_survive_reopen(tmp_path):
+    path = str(tmp_path / "kb")
+    collection = QuantizedCollection("kb", path)
+    ids, vectors = fill(collection)
+    collection.delete(ids=ids[:1500])  # Over half dead: compacts
+    assert collection.get_index_stats()["dead_rows"] == 0
+    queries = clustered_vectors(10, seed=3)
+    before = collection.query(queries, 5, include=[])["ids"]
+    assert not set(ids[:1500]) & {i for row in before for i in row}
+
+    reopened = QuantizedCollection("kb", path)
+    assert reopened.count() == 500
+    assert reopened.query(queries, 5, include=[])["ids"] == before
+
+
+def test_missing_code_rows_are_reencoded_on_open(tmp_path):
+    path = str(tmp_path / "kb")
+    collection = QuantizedCollection("kb", path)
+    fill(collection)
+    queries = clustered_vectors(10, seed=4)
+    before = collection.query(queries, 5, include=[])["ids"]
+
+    # A crash between the float32 append and the code append leaves the code files short
+    codes_file = os.path.join(path, "quantized_codes.bin")
+    with open(codes_file, "r+b") as f:
+        f.truncate(os.path.getsize(codes_file) // 2)
+    reopened = QuantizedCollection("kb", path)
+    assert reopened.query(queries, 5, include=[])["ids"] == before
+
+
+def test_stats_report_resident_memory(tmp_path):
+    collection = QuantizedCollection("kb", str(tmp_path / "kb"), dtype="int8")
+    fill(collection, 100)
+    stats = collection.get_index_stats()
+    assert stats["vectors"] == 100
+    assert stats["resident_bytes_per_vector"] == DIM + 4
+    assert stats["float32_memory_mapped"]
+    assert QuantizedCollection("mem").get_index_stats()["float32_memory_mapped"] is False
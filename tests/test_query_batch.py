@@ -0,0 +1,65 @@
+"""VectorStore.query_batch returns what one query() per string would, with a single embedding pass
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUERIES = [
+    "note 5 about topic 5",
+    "topic 3",
+    "unrelated words entirely",
+    "note 5 about topic 5",  # Repeated query
+    "about note",
+]
+N_RESULTS = [3, 5, 1, 2, 4]
+FILTERS = [None, {"source": "file_1.txt"}, None, {"source": "file_2.txt"}, {"source": "file_1.txt"}]
+
+
+def filled_store(make_store, **overrides):
+    store = make_store(**overrides)
+    store.add_documents(
+        [f"note {i} about topic {i % 7}" for i in range(60)],
+        [{"source": f"file_{i % 3}.txt", "chunk_index": i} for i in range(60)],
+        [f"chunk_{i}" for i in range(60)]
+    )
+    return store
+
+
+@pytest.mark.parametrize("backend", ["numpy", "chroma"])
+@pytest.mark.parametrize("mode", ["dense", "lexical", "hybrid"])
+def test_batch_matches_single_queries(make_store, backend, mode):
+    store = filled_store(make_store, backend=backend)
+    batch = store.query_batch(QUERIES, n_results=N_RESULTS, metadata_filters=FILTERS, mode=mode)
+    single = [
+        store.query(query, n_results=n, metadata_filter=where, mode=mode)
+        for query, n, where in zip(QUERIES, N_RESULTS, FILTERS)
+    ]
+    assert len(batch) == len(QUERIES)
+    for got, expected in zip(batch, single):
+        assert got["ids"] == expected["ids"]
+        assert got["documents"] == expected["documents"]
+        assert got["metadatas"] == expected["metadatas"]
+        assert got["distances"] == pytest.approx(expected["distances"], abs=1e-5)
+
+
+def test_one_filter_and_count_apply_to_every_query(make_store):
+    store = filled_store(make_store, backend="numpy")
+    where = {"source": "file_0.txt"}
+    for result in store.query_batch(QUERIES, n_results=2, metadata_filters=where):
+        assert len(result["ids"]) == 2
+        assert all(metadata["source"] == "file_0.txt" for metadata in result["metadatas"])
+
+
+def test_queries_are_embedded_in_one_call(make_store):
+    store = filled_store(make_store, backend="numpy")
+    calls = store.embedding_model.calls
+    store.query_batch(["first question", "second question", "third question"], mode="dense")
+    assert store.embedding_model.calls == calls + 1
+    assert store.query_batch([]) == []
@@ -0,0 +1,163 @@
+"""RouterAgent against the in-process Ollama stub: status lines, and speculative cancel and escalate
+
+Usage:
+    python -m pytest tests/
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from agentic_rag import AnswerPrinter
+from agents.advanced_generator import RunCancelled, TechniqueRun
+from utils.ollama_stub import OllamaStubServer
+
+
+class FixedRetriever:
+    """The retrieval calls the agents make, answered from a few fixed chunks"""
+
+    def __init__(self, n_chunks: int = 20):
+        self.ids = [f"chunk_{i}" for i in range(n_chunks)]
+        self.texts = [f"Document chunk {i} about topic {i % 5}." for i in range(n_chunks)]
+        self.vectors = np.random.default_rng(0).normal(size=(n_chunks, 16)).astype(np.float32)
+
+    def query(self, query, n_results=3, *args, **kwargs):
+        rows = [(len(query) + i) % len(self.ids) for i in range(n_results)]
+        return {
+            "ids": [self.ids[r] for r in rows],
+            "documents": [self.texts[r] for r in rows],
+            "distances": [0.1 * (i + 1) for i in range(n_results)],
+        }
+
+    def query_batch(self, queries, n_results=3, *args, **kwargs):
+        return [self.query(query, n_results) for query in queries]
+
+    def get_embeddings(self, ids):
+        return {chunk_id: self.vectors[self.ids.index(chunk_id)] for chunk_id in ids}
+
+
+def reply(prompt: str) -> str:
+    if '"completeness_score"' in prompt:  # Answer evaluation
+        sufficient = "[escalate]" not in prompt
+        return json.dumps({"sufficient": sufficient, "completeness_score": 0.9, "confidence_score": 0.9})
+    if '"sub_queries"' in prompt:
+        return json.dumps({"sub_queries": ["first aspect", "second aspect"]})
+    if '"variations"' in prompt:
+        return json.dumps({"variations": ["rephrasing one", "rephrasing two"]})
+    return "the answer is in the documents"
+
+
+@pytest.fixture
+def make_router(monkeypatch):
+    server = OllamaStubServer(reply=reply).start()
+    monkeypatch.setitem(config.LLM_CONFIG, "backend", "ollama")
+    monkeypatch.setitem(config.OLLAMA_CONFIG, "base_url", server.url)
+    from agents.basic_generator import BasicGeneratorAgent
+    from agents.advanced_generator import AdvancedGeneratorAgent
+    from agents.router_agent import RouterAgent
+
+    def make(speculative: bool = False) -> RouterAgent:
+        retriever = FixedRetriever()
+        return RouterAgent(
+            BasicGeneratorAgent(retriever), advanced_agent=AdvancedGeneratorAgent(retriever), speculative=speculative
+        )
+
+    yield make
+    server.stop()
+
+
+def test_status_lines_go_to_the_sink_between_answers(make_router, capsys):
+    router = make_router()
+    events = []
+    result = router.route_and_generate(
+        "[escalate] what do the documents say",
+        mode="verbose",
+        on_token=lambda token: events.append("token"),
+        on_answer_end=lambda: events.append("end"),
+        on_status=lambda line: events.append(line)
+    )
+    assert result["metadata"]["routing"]["strategy"] == "basic_then_advanced"
+    assert capsys.readouterr().out == ""  # Nothing bypassed the sink
+    assert events.count("end") == 2
+    assert "[Router] ✗ Basic answer insufficient" in events
+    answer_open = False
+    for event in events:
+        if event in ("token", "end"):
+            answer_open = event == "token"
+        else:
+            assert not answer_open, event  # No status line inside a streamed answer
+
+
+def test_printer_holds_status_lines_until_the_answer_ends(capsys):
+    printer = AnswerPrinter()
+    printer.on_status("[Router] → Using Basic Generator Agent")
+    printer.on_token(" first")
+    printer.on_status("[Router] late line")
+    printer.on_token(" answer")
+    assert "late line" not in capsys.readouterr().out
+    printer.on_answer_end()
+    out = capsys.readouterr().out
+    assert out.index("=" * 60) < out.index("[Router] late line")
+
+
+def drained_stats(router):
+    router._speculation_executor.shutdown(wait=True)  # Outcomes are recorded once the run stops
+    return router.get_speculation_stats()
+
+
+def test_cancelled_run_makes_no_further_llm_calls():
+    run = TechniqueRun()
+    run.start_call()
+    run.cancel()
+    with pytest.raises(RunCancelled):
+        run.start_call()
+    assert run.llm_calls == 1
+
+
+def test_sufficient_basic_answer_cancels_the_speculation(make_router):
+    router = make_router(speculative=True)
+    result = router.route_and_generate("what do the documents say")
+    routing = result["metadata"]["routing"]
+    assert routing["strategy"] == "basic_only"
+    assert routing["speculation"] == {"used": False}
+    stats = drained_stats(router)
+    assert (stats["started"], stats["used"], stats["wasted"], stats["failed"]) == (1, 0, 1, 0)
+    assert stats["waste_rate"] == 1.0
+
+
+def test_escalation_uses_the_speculative_context(make_router):
+    query = "[escalate] what do the documents say"
+    serial = make_router(speculative=False).route_and_generate(query)
+    router = make_router(speculative=True)
+    result = router.route_and_generate(query)
+    routing = result["metadata"]["routing"]
+    assert routing["strategy"] == "basic_then_advanced"
+    assert routing["speculation"]["used"] and routing["speculation"]["llm_calls"] > 0
+    assert result["answer"] == serial["answer"]
+    assert result["retrieved_chunks"] == serial["retrieved_chunks"]
+    stats = drained_stats(router)
+    assert (stats["used"], stats["wasted"]) == (1, 0)
+    assert stats["used_llm_calls"] == routing["speculation"]["llm_calls"]
+
+
+def test_failed_speculation_reruns_the_advanced_path(make_router, monkeypatch):
+    router = make_router(speculative=True)
+    prepare_context = router.advanced_agent.prepare_context
+
+    def fail_speculative_run(query, techniques=None, debug=False, run=None):
+        if run is not None:
+            raise RuntimeError("retrieval failed")
+        return prepare_context(query, techniques, debug, run)
+
+    monkeypatch.setattr(router.advanced_agent, "prepare_context", fail_speculative_run)
+    result = router.route_and_generate("[escalate] what do the documents say")
+    assert result["metadata"]["routing"]["strategy"] == "basic_then_advanced"
+    assert result["answer"]
+    stats = drained_stats(router)
+    assert (stats["used"], stats["failed"]) == (0, 1)
@@ -0,0 +1,107 @@
+"""Sharded collections: routing, scatter-gather queries, and rebalancing between shard counts
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes.numpy_collection import NumpyClient, NumpyCollection
+from indexes.sharded import rebalance, shard_name, shard_of
+
+N_CHUNKS = 200
+QUERIES = ["note 5 about topic 5", "topic 3", "about note", "note 150"]
+
+
+def filled_store(make_store, **overrides):
+    store = make_store(**overrides)
+    store.add_documents(
+        [f"note {i} about topic {i % 7}" for i in range(N_CHUNKS)],
+        [{"source": f"file_{i % 3}.txt", "chunk_index": i} for i in range(N_CHUNKS)],
+        [f"chunk_{i}" for i in range(N_CHUNKS)]
+    )
+    return store
+
+
+def layout(store):
+    """Shard index -> ids stored in it"""
+    return {
+        shard: set(store.client.get_or_create_collection(name=shard_name(store.collection_name, shard)).get(include=[])["ids"])
+        for shard in range(store.n_shards)
+    }
+
+
+def answers(store):
+    return [
+        (result["ids"], result["distances"])
+        for where in (None, {"source": "file_1.txt"})
+        for result in store.query_batch(QUERIES, n_results=5, metadata_filters=where)
+    ]
+
+
+def assert_routed(store):
+    for shard, ids in layout(store).items():
+        assert all(shard_of(chunk_id, store.n_shards) == shard for chunk_id in ids)
+    assert sum(len(ids) for ids in layout(store).values()) == N_CHUNKS
+
+
+@pytest.mark.parametrize("backend", ["numpy", "chroma"])
+def test_sharded_queries_match_the_unsharded_index(make_store, backend):
+    store = filled_store(make_store, backend=backend, shards=1)
+    expected = answers(store)
+    assert store.rebalance_shards(3) > 0
+    assert store.n_shards == 3
+    assert_routed(store)
+    assert all(len(ids) > 0 for ids in layout(store).values())
+    sharded = answers(store)
+    for (ids, distances), (expected_ids, expected_distances) in zip(sharded, expected):
+        assert ids == expected_ids
+        assert distances == pytest.approx(expected_distances, abs=1e-5)
+
+    reopened = make_store(backend=backend, shards=1)  # The recorded layout wins over the config
+    assert reopened.n_shards == 3
+    assert reopened.get_collection_info()["count"] == N_CHUNKS
+
+
+def test_shrinking_drops_the_extra_shards(make_store):
+    store = filled_store(make_store, backend="numpy", shards=4)
+    expected = answers(store)
+    store.rebalance_shards(2)
+    assert store.n_shards == 2
+    assert_routed(store)
+    assert "knowledge_base_shard3" not in store.client._collections
+    assert [ids for ids, _ in answers(store)] == [ids for ids, _ in expected]
+
+
+def test_interrupted_rebalance_can_be_run_again(tmp_path, monkeypatch):
+    client = NumpyClient(str(tmp_path))
+    base = client.get_or_create_collection("kb")
+    vectors = [[float(i % 5 == j) for j in range(5)] for i in range(100)]
+    ids = [f"chunk_{i}" for i in range(100)]
+    base.add(ids, vectors, [f"doc {i}" for i in range(100)], [{"i": i} for i in range(100)])
+
+    delete, deletes = NumpyCollection.delete, []
+
+    def crash_on_second_delete(self, *args, **kwargs):
+        deletes.append(self.name)
+        if len(deletes) == 2:
+            raise KeyboardInterrupt  # Copied to the new shards, not yet deleted from the old one
+        return delete(self, *args, **kwargs)
+
+    monkeypatch.setattr(NumpyCollection, "delete", crash_on_second_delete)
+    with pytest.raises(KeyboardInterrupt):
+        rebalance(client.get_or_create_collection, client.delete_collection, "kb", 1, 3, page_size=30)
+    monkeypatch.setattr(NumpyCollection, "delete", delete)
+
+    rebalance(client.get_or_create_collection, client.delete_collection, "kb", 1, 3, page_size=30)
+    stored = {}
+    for shard in range(3):
+        for chunk_id in client.get_or_create_collection(shard_name("kb", shard)).get(include=[])["ids"]:
+            assert shard_of(chunk_id, 3) == shard
+            stored[chunk_id] = shard
+    assert sorted(stored) == sorted(ids)  # Nothing lost, nothing left duplicated
@@ -0,0 +1,117 @@
+"""DocumentWatcher polling: debounced micro-batches, removals, and a failing file isolated from its batch
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import watcher as watcher_module
+from ingest import IndexManifest
+from watcher import DocumentWatcher
+
+
+class Clock:
+    """Stand-in for time.monotonic that only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(watcher_module.time, "monotonic", clock)
+    return clock
+
+
+def write_doc(name: str, text: str):
+    os.makedirs("docs", exist_ok=True)
+    with open(os.path.join("docs", name), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def paragraph(name: str, n_words: int = 150) -> str:
+    return " ".join(f"{name}{i}" for i in range(n_words))
+
+
+def sources(store):
+    return {metadata["source"] for metadata in store.collection.get(include=["metadatas"])["metadatas"]}
+
+
+def test_changes_are_applied_after_the_debounce(make_store, clock):
+    store = make_store(backend="numpy")
+    os.makedirs("docs")
+    watcher = DocumentWatcher("docs", store, debounce_seconds=5)
+    write_doc("a.txt", paragraph("a"))
+    write_doc("b.txt", paragraph("b"))
+    assert watcher.poll() is None  # Just seen: not settled yet
+    clock.now += 3
+    write_doc("b.txt", paragraph("b") + " edited")  # Still being written
+    assert watcher.poll() is None
+    clock.now += 3
+    assert watcher.poll()["files_added"] == 1  # a.txt is quiet, b.txt is not
+    assert sources(store) == {"a.txt"}
+    clock.now += 3
+    assert watcher.poll()["files_added"] == 1
+    assert sources(store) == {"a.txt", "b.txt"}
+    assert watcher.stats["batches"] == 2 and watcher.stats["last_lag_seconds"] == 9.0  # From its first change
+
+    os.remove(os.path.join("docs", "a.txt"))
+    watcher.poll()
+    clock.now += 5
+    assert watcher.poll()["files_removed"] == 1
+    assert sources(store) == {"b.txt"}
+    assert sorted(IndexManifest.load().files) == ["b.txt"]  # Saved after every batch
+
+
+def test_a_file_that_keeps_changing_is_indexed_by_the_max_delay(make_store, clock, monkeypatch):
+    monkeypatch.setitem(watcher_module.WATCH_CONFIG, "max_delay_seconds", 10)
+    store = make_store(backend="numpy")
+    os.makedirs("docs")
+    watcher = DocumentWatcher("docs", store, debounce_seconds=5)
+    results = []
+    for i in range(4):  # Rewritten every 4s, never quiet for 5s
+        write_doc("busy.txt", paragraph("busy") + " x" * i)
+        results.append(watcher.poll())
+        clock.now += 4
+    assert results[:3] == [None, None, None]
+    assert results[3]["files_added"] == 1  # 12s after it was first seen
+    assert sources(store) == {"busy.txt"}
+
+
+def test_failing_file_is_split_out_and_backed_off(make_store, clock, monkeypatch):
+    store = make_store(backend="numpy")
+    os.makedirs("docs")
+    watcher = DocumentWatcher("docs", store, debounce_seconds=0)
+    upsert, broken = store.upsert_documents, {"bad.txt"}
+
+    def fail_on_broken(texts, metadatas, ids=None):
+        if broken & {metadata["source"] for metadata in metadatas}:
+            raise RuntimeError("embedding failed")
+        return upsert(texts, metadatas, ids=ids)
+
+    monkeypatch.setattr(store, "upsert_documents", fail_on_broken)
+    for name in ("a.txt", "bad.txt", "c.txt"):
+        write_doc(name, paragraph(name[0]))
+    applied = watcher.poll()
+    assert applied["files_added"] == 2  # The rest of the batch went through one by one
+    assert sources(store) == {"a.txt", "c.txt"}
+    assert sorted(IndexManifest.load().files) == ["a.txt", "c.txt"]
+    assert watcher.stats["failing_files"] == 1 and "embedding failed" in watcher.stats["last_error"]
+
+    broken.clear()
+    assert watcher.poll() is None  # Waiting out the back-off
+    clock.now += watcher_module.WATCH_CONFIG["retry_seconds"]
+    assert watcher.poll()["files_added"] == 1
+    assert sources(store) == {"a.txt", "bad.txt", "c.txt"}
+    assert watcher.stats["failing_files"] == 0
+    assert sorted(IndexManifest.load().files) == ["a.txt", "bad.txt", "c.txt"]
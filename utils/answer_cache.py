@@ -0,0 +1,206 @@
+"""Semantic cache of final answers keyed by query embedding"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+import numpy as np
+from config import ANSWER_CACHE_CONFIG
+
+
+class SemanticAnswerCache:
+    """
+    Answers of earlier queries, served again for queries whose embedding is
+    within `threshold` cosine similarity of a cached one
+
+    Every entry is tagged with the index version it was answered against;
+    entries of any other version are dropped the first time a lookup sees a
+    new version, so a changed corpus never serves stale answers. Entries
+    expire after `ttl_seconds` and the least recently used ones are evicted
+    beyond `max_items`. The cache is persisted to SQLite when a path is set.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        threshold: float = None,
+        max_items: int = None,
+        ttl_seconds: Optional[float] = None
+    ):
+        self.path = path if path is not None else ANSWER_CACHE_CONFIG["path"]
+        self.threshold = threshold or ANSWER_CACHE_CONFIG["similarity_threshold"]
+        self.max_items = max_items or ANSWER_CACHE_CONFIG["max_items"]
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else ANSWER_CACHE_CONFIG["ttl_seconds"]
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # Least recently used first
+        self._matrix: Optional[np.ndarray] = None  # Stacked embeddings, rebuilt after changes
+        self._matrix_keys: List[str] = []
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._db = None
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, query TEXT NOT NULL, index_version TEXT NOT NULL, "
+                "embedding BLOB NOT NULL, result TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._load()
+
+    def _load(self):
+        if self.ttl_seconds:
+            self._db.execute("DELETE FROM answers WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._db.commit()
+        rows = self._db.execute(
+            "SELECT key, query, index_version, embedding, result, created_at, last_used "
+            "FROM answers ORDER BY last_used DESC LIMIT ?", (self.max_items,)
+        ).fetchall()
+        for key, query, version, embedding, result, created_at, last_used in reversed(rows):
+            self._entries[key] = {
+                "query": query,
+                "index_version": version,
+                "embedding": np.frombuffer(embedding, dtype=np.float32),
+                "result": json.loads(result),
+                "created_at": created_at,
+                "last_used": last_used,
+            }
+
+    @staticmethod
+    def key(query: str, index_version: str) -> str:
+        normalized = ' '.join(query.lower().split())
+        return hashlib.sha256(f"{index_version}\0{normalized}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _set_version(self, index_version: str):
+        """Drop every entry answered against another index version"""
+        if index_version == self._version:
+            return
+        self._version = index_version
+        stale = [key for key, entry in self._entries.items() if entry["index_version"] != index_version]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            self.invalidations += len(stale)
+            self._matrix = None
+        if self._db is not None:
+            self._db.execute("DELETE FROM answers WHERE index_version != ?", (index_version,))
+            self._db.commit()
+
+    def _drop(self, keys: List[str]):
+        for key in keys:
+            self._entries.pop(key, None)
+        self._matrix = None
+        if self._db is not None and keys:
+            self._db.executemany("DELETE FROM answers WHERE key = ?", [(key,) for key in keys])
+            self._db.commit()
+
+    def lookup(self, query: str, embedding, index_version: str) -> Optional[Dict[str, Any]]:
+        """
+        Cached answer for a query, if an equivalent one was answered before
+
+        Args:
+            query: Query text (an exact repeat matches without comparing vectors)
+            embedding: Query embedding
+            index_version: Version of the index the answer must come from
+
+        Returns:
+            {"result", "similarity", "cached_query"} or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            self._set_version(index_version)
+            if self.ttl_seconds:
+                self._drop([
+                    key for key, entry in self._entries.items() if entry["created_at"] < now - self.ttl_seconds
+                ])
+
+            key = self.key(query, index_version)
+            similarity = 1.0
+            if key not in self._entries:
+                key, similarity = None, 0.0
+                if self._entries:
+                    if self._matrix is None:
+                        self._matrix_keys = list(self._entries)
+                        self._matrix = np.vstack([self._entries[k]["embedding"] for k in self._matrix_keys])
+                    scores = self._matrix @ self._normalize(embedding)
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold:
+                        key, similarity = self._matrix_keys[best], float(scores[best])
+            if key is None:
+                self.misses += 1
+                return None
+
+            entry = self._entries[key]
+            entry["last_used"] = now
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if self._db is not None:
+                self._db.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+                self._db.commit()
+            return {"result": entry["result"], "similarity": similarity, "cached_query": entry["query"]}
+
+    def store(self, query: str, embedding, index_version: str, result: Dict[str, Any]):
+        """Cache the answer to a query computed against `index_version`"""
+        now = time.time()
+        # Round-trip through JSON so the cached copy is independent of the caller's dicts
+        serialized = json.dumps(result, default=str)
+        entry = {
+            "query": query,
+            "index_version": index_version,
+            "embedding": self._normalize(embedding),
+            "result": json.loads(serialized),
+            "created_at": now,
+            "last_used": now,
+        }
+        key = self.key(query, index_version)
+        with self._lock:
+            self._set_version(index_version)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._matrix = None
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, query, index_version, entry["embedding"].tobytes(), serialized, now, now)
+                )
+                self._db.commit()
+            if len(self._entries) > self.max_items:
+                self._drop(list(self._entries)[:len(self._entries) - self.max_items])
+
+    def clear(self):
+        with self._lock:
+            self._drop(list(self._entries))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidated": self.invalidations,
+            "threshold": self.threshold,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
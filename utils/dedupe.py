@@ -0,0 +1,107 @@
+"""Near-duplicate chunk detection with MinHash signatures and LSH banding"""
+
+import re
+import zlib
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from config import DEDUPE_CONFIG
+
+_MERSENNE_PRIME = np.uint64(4294967291)  # Largest prime below 2**32
+_TOKEN_RE = re.compile(r'\w+')
+
+
+class NearDuplicateFilter:
+    """
+    Flags chunks whose word shingles overlap an earlier chunk's by at least
+    `threshold` (estimated Jaccard similarity)
+
+    Each chunk gets a MinHash signature; signatures are split into bands and
+    chunks sharing any band become candidates, which are then confirmed by
+    comparing full signatures.
+    """
+
+    def __init__(
+        self,
+        threshold: float = None,
+        num_perm: int = None,
+        bands: int = None,
+        shingle_size: int = None,
+        seed: int = 1
+    ):
+        self.threshold = threshold or DEDUPE_CONFIG["threshold"]
+        self.num_perm = num_perm or DEDUPE_CONFIG["num_perm"]
+        self.bands = bands or DEDUPE_CONFIG["bands"]
+        self.shingle_size = shingle_size or DEDUPE_CONFIG["shingle_size"]
+        if self.num_perm % self.bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.rows = self.num_perm // self.bands
+
+        rng = np.random.RandomState(seed)
+        # a < 2**31 and hash values < 2**32 keep a * h + b inside uint64
+        self._a = rng.randint(1, 2 ** 31, size=self.num_perm, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, 2 ** 31, size=self.num_perm, dtype=np.int64).astype(np.uint64)
+
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(self.bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._sources: Dict[str, str] = {}
+        self.aliases: Dict[str, List[str]] = {}
+        self.checked = 0
+        self.duplicates = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the text's word shingles"""
+        tokens = _TOKEN_RE.findall(text.lower())
+        k = self.shingle_size
+        if len(tokens) <= k:
+            shingles = {' '.join(tokens)}
+        else:
+            shingles = {' '.join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode('utf-8')) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        permuted = (hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, chunk_id: str, text: str, source: str = ""):
+        """Register a chunk that is kept regardless (e.g. already embedded)"""
+        self._register(chunk_id, self.signature(text), source)
+
+    def _register(self, chunk_id: str, signature: np.ndarray, source: str):
+        self._signatures[chunk_id] = signature
+        self._sources[chunk_id] = source
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            band.setdefault(key, []).append(chunk_id)
+
+    def check(self, chunk_id: str, text: str, source: str = "") -> Optional[Tuple[str, str]]:
+        """
+        Check a chunk against everything registered so far
+
+        Returns:
+            (canonical_id, canonical_source) if the chunk is a near-duplicate,
+            otherwise None after registering it as a new canonical chunk
+        """
+        self.checked += 1
+        signature = self.signature(text)
+        best_id, best_similarity = None, self.threshold
+        seen = set()
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            for candidate in band.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = float(np.mean(self._signatures[candidate] == signature))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = candidate, similarity
+
+        if best_id is None:
+            self._register(chunk_id, signature, source)
+            return None
+
+        self.duplicates += 1
+        self.aliases.setdefault(best_id, []).append(chunk_id)
+        return best_id, self._sources[best_id]
@@ -0,0 +1,123 @@
+"""Persistent embedding cache keyed by embedding model and normalized text"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+import numpy as np
+from config import EMBEDDING_CACHE_CONFIG
+
+
+class EmbeddingCache:
+    """
+    Two-level cache of embeddings: a bounded in-memory LRU in front of an
+    on-disk SQLite table
+
+    Keys are sha256(model name + normalized text), so identical chunks and
+    repeated queries are only ever encoded once per model.
+    """
+
+    def __init__(self, model_name: str, path: Optional[str] = None, max_memory_items: int = None):
+        self.model_name = model_name
+        self.path = path if path is not None else EMBEDDING_CACHE_CONFIG["path"]
+        self.max_memory_items = max_memory_items or EMBEDDING_CACHE_CONFIG["max_memory_items"]
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Unicode- and whitespace-normalize text before hashing"""
+        return ' '.join(unicodedata.normalize("NFC", text).split())
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{self.normalize(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up embeddings; None marks a miss"""
+        keys = [self.key(text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        disk_lookup = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.memory_hits += 1
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+
+            if disk_lookup and self._db is not None:
+                found = {}
+                pending = list(disk_lookup)
+                for start in range(0, len(pending), 500):  # Stay under SQLite's variable limit
+                    batch = pending[start:start + 500]
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+                    found.update({key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows})
+                for key, vector in found.items():
+                    self._remember(key, vector)
+                    for i in disk_lookup.pop(key):
+                        results[i] = vector
+                        self.disk_hits += 1
+
+            self.misses += sum(len(indices) for indices in disk_lookup.values())
+        return results
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """Store freshly computed embeddings"""
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, self.model_name, vector.tobytes()))
+            if self._db is not None and rows:
+                self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+                self._db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the memory and disk levels"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model": self.model_name,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_items": len(self._memory),
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
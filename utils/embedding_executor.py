@@ -0,0 +1,155 @@
+"""Dynamic micro-batching of concurrent embedding requests"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, List, Optional
+import numpy as np
+from config import EMBEDDING_EXECUTOR_CONFIG
+
+
+class _Request:
+    __slots__ = ("texts", "future", "enqueued_at")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingExecutor:
+    """
+    Runs encode requests from many threads on one dedicated worker
+
+    The worker takes the oldest pending request, then keeps collecting
+    requests until `max_batch_size` texts are gathered or `max_wait_ms` has
+    passed, and encodes them in a single forward pass. Each caller gets a
+    future resolving to the rows of its own texts. A request larger than
+    `max_batch_size` is encoded on its own rather than split.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], Any],
+        max_batch_size: int = None,
+        max_wait_ms: float = None
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size or EMBEDDING_EXECUTOR_CONFIG["max_batch_size"]
+        self.max_wait = (EMBEDDING_EXECUTOR_CONFIG["max_wait_ms"] if max_wait_ms is None else max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._carry: Optional[_Request] = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._metrics = {
+            "requests": 0,
+            "texts": 0,
+            "batches": 0,
+            "max_batch_size": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "total_encode_seconds": 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name="embedding-executor", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for encoding; the future resolves to a float32 array"""
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return request.future
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("EmbeddingExecutor is closed")
+            self._queue.put(request)
+        return request.future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Blocking convenience wrapper around submit()"""
+        return self.submit(texts).result()
+
+    def _next_batch(self) -> Optional[List[_Request]]:
+        first = self._carry or self._queue.get()
+        self._carry = None
+        if first is None:
+            return None
+
+        batch, size = [first], len(first.texts)
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)  # Re-deliver shutdown after this batch
+                break
+            if size + len(request.texts) > self.max_batch_size:
+                self._carry = request  # Starts the next batch
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            started = time.perf_counter()
+            texts = [text for request in batch for text in request.texts]
+            try:
+                vectors = np.asarray(self.encode_fn(texts), dtype=np.float32)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            offset = 0
+            for request in batch:
+                request.future.set_result(vectors[offset:offset + len(request.texts)])
+                offset += len(request.texts)
+            self._record(batch, len(texts), started, finished)
+
+    def _record(self, batch: List[_Request], n_texts: int, started: float, finished: float):
+        waits = [started - request.enqueued_at for request in batch]
+        with self._lock:
+            m = self._metrics
+            m["requests"] += len(batch)
+            m["texts"] += n_texts
+            m["batches"] += 1
+            m["max_batch_size"] = max(m["max_batch_size"], n_texts)
+            m["total_wait_seconds"] += sum(waits)
+            m["max_wait_seconds"] = max(m["max_wait_seconds"], max(waits))
+            m["total_encode_seconds"] += finished - started
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Batch-size and queue-wait metrics"""
+        with self._lock:
+            m = dict(self._metrics)
+        batches, requests = m["batches"], m["requests"]
+        return {
+            "requests": requests,
+            "texts": m["texts"],
+            "batches": batches,
+            "avg_batch_size": round(m["texts"] / batches, 2) if batches else 0.0,
+            "max_batch_size": m["max_batch_size"],
+            "avg_requests_per_batch": round(requests / batches, 2) if batches else 0.0,
+            "avg_queue_wait_ms": round(1000 * m["total_wait_seconds"] / requests, 3) if requests else 0.0,
+            "max_queue_wait_ms": round(1000 * m["max_wait_seconds"], 3),
+            "avg_encode_ms": round(1000 * m["total_encode_seconds"] / batches, 3) if batches else 0.0,
+        }
+
+    def close(self, timeout: float = None):
+        """Finish queued requests, then stop the worker"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join(timeout)
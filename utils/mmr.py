@@ -0,0 +1,53 @@
+"""Maximal marginal relevance: relevant but mutually diverse selections"""
+
+from typing import List, Optional
+import numpy as np
+
+
+def maximal_marginal_relevance(
+    relevance: np.ndarray,
+    vectors: np.ndarray,
+    k: int,
+    lambda_: float = 0.7,
+    redundancy_threshold: Optional[float] = None
+) -> List[int]:
+    """
+    Greedily pick items maximizing lambda * relevance - (1 - lambda) * redundancy
+
+    Redundancy is an item's highest cosine similarity to anything already
+    picked. The pairwise similarities are one matrix product up front, and
+    each step is a vectorized argmax plus a running maximum update.
+
+    Args:
+        relevance: Relevance per item, higher is better (ideally in [0, 1])
+        vectors: (items, dim) embeddings, row-aligned with relevance
+        k: Maximum number of items to pick
+        lambda_: 1.0 = pure relevance order, 0.0 = pure diversity
+        redundancy_threshold: Items this similar to a picked one are dropped
+                              outright (None = keep all)
+
+    Returns:
+        Indices of the picked items, in pick order
+    """
+    relevance = np.asarray(relevance, dtype=np.float64)
+    n_items = len(relevance)
+    if n_items == 0 or k <= 0:
+        return []
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    unit = vectors / norms
+    similarity = unit @ unit.T
+
+    redundancy = np.zeros(n_items)
+    available = np.ones(n_items, dtype=bool)
+    picked: List[int] = []
+    while len(picked) < k and available.any():
+        scores = np.where(available, lambda_ * relevance - (1.0 - lambda_) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+        if redundancy_threshold is not None:
+            available &= redundancy < redundancy_threshold
+    return picked
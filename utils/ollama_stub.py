@@ -0,0 +1,250 @@
+"""Minimal stand-in for `ollama serve`, for exercising OllamaBackend without a model
+
+Implements /api/generate, /api/chat and /api/tags over HTTP/1.1 keep-alive.
+A model "load" (a configurable sleep) happens whenever a request finds the
+model not resident, and `keep_alive` decides how long it stays resident,
+as in Ollama. Replies are deterministic echoes unless a reply function is
+given; with "stream" (the default, as in Ollama) they are sent word by
+word as chunked NDJSON, optionally paced to simulate generation speed.
+A reply function that raises is reported as a failed generation: a 500,
+or an {"error": ...} chunk in a stream.
+
+Usage:
+    python -m utils.ollama_stub [--port 11434] [--load-seconds 2.0] [--token-seconds 0.02]
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+_DURATION = re.compile(r"^(-?\d+(?:\.\d+)?)(ms|s|m|h)?$")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}
+_TOKEN = re.compile(r"\s*\S+")
+
+
+def parse_keep_alive(value, default: float = 300.0) -> float:
+    """Seconds a model stays loaded ("30m", "10s", 60, ...); negative = forever"""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _DURATION.match(str(value).strip())
+    if not match:
+        raise ValueError(f"Invalid keep_alive duration: {value!r}")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def echo_reply(prompt: str) -> str:
+    return f"stub reply ({len(prompt)} chars): {' '.join(prompt.split()[-8:])}"
+
+
+class OllamaStubServer:
+    """
+    Threaded HTTP server speaking the subset of the Ollama API the backend uses
+
+    Args:
+        host, port: Address to bind (port 0 picks a free port)
+        load_seconds: Simulated model load time
+        reply: prompt -> completion text (raise to fail the generation)
+        idle_timeout: Close connections idle this long (None = never)
+        token_seconds: Delay before each streamed token
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        load_seconds: float = 0.0,
+        reply: Optional[Callable[[str], str]] = None,
+        idle_timeout: Optional[float] = None,
+        token_seconds: float = 0.0
+    ):
+        self.load_seconds = load_seconds
+        self.token_seconds = token_seconds
+        self.idle_timeout = idle_timeout
+        self.reply = reply or echo_reply
+        self.stats = {"connections": 0, "requests": 0, "loads": 0}
+        self._resident_until: Dict[str, float] = {}  # Model -> expiry (inf = forever)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "OllamaStubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve on the calling thread until interrupted"""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "OllamaStubServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _use_model(self, model: str, keep_alive) -> float:
+        """Load the model if it is not resident; returns the load time spent"""
+        with self._lock:
+            now = time.monotonic()
+            loaded = self._resident_until.get(model, 0.0) > now
+            if not loaded:
+                self.stats["loads"] += 1
+                time.sleep(self.load_seconds)  # Loads are serialized, as on a real server
+            seconds = parse_keep_alive(keep_alive)
+            self._resident_until[model] = float("inf") if seconds < 0 else time.monotonic() + seconds
+            return 0.0 if loaded else self.load_seconds
+
+    def _handle(self, path: str, request: Dict[str, Any]):
+        """(status, response body) of an API call"""
+        model = request.get("model")
+        if path in ("/api/generate", "/api/chat") and not model:
+            return 400, {"error": "model is required"}
+        if path == "/api/generate":
+            load = self._use_model(model, request.get("keep_alive"))
+            prompt = request.get("prompt")
+            text = self.reply(prompt) if prompt else ""  # No prompt: load (or unload) only
+            return 200, {"model": model, "response": text, "done": True, "done_reason": "load" if not prompt else "stop",
+                         "load_duration": int(load * 1e9)}
+        if path == "/api/chat":
+            load = self._use_model(model, request.get("keep_alive"))
+            messages = request.get("messages") or []
+            text = self.reply(messages[-1]["content"]) if messages else ""
+            return 200, {"model": model, "message": {"role": "assistant", "content": text}, "done": True,
+                         "load_duration": int(load * 1e9)}
+        if path == "/api/tags":
+            with self._lock:
+                return 200, {"models": [{"name": name} for name in self._resident_until]}
+        return 404, {"error": f"unknown endpoint {path}"}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive
+            disable_nagle_algorithm = True  # Headers and body are separate writes
+            timeout = stub.idle_timeout
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.stats["connections"] += 1
+
+            def _respond(self, status: int, body: Dict[str, Any]):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _respond_stream(self, body: Dict[str, Any]):
+                """Send a reply as NDJSON chunks, one word each, then the final "done" chunk"""
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                if "message" in body:
+                    text = body["message"]["content"]
+                    chunk = lambda token: {"model": body["model"], "message": {"role": "assistant", "content": token}}
+                else:
+                    text = body["response"]
+                    chunk = lambda token: {"model": body["model"], "response": token}
+                try:
+                    for token in _TOKEN.findall(text):
+                        time.sleep(stub.token_seconds)
+                        self._write_chunk({**chunk(token), "done": False})
+                    self._write_chunk({**body, **chunk("")})
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # Client stopped reading: generation cancelled
+
+            def _respond_stream_error(self, message: str):
+                """Report a failure in-band, as Ollama does once a stream has started"""
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                self._write_chunk({"error": message})
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, data: Dict[str, Any]):
+                line = json.dumps(data).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+            def _dispatch(self, request: Dict[str, Any]):
+                with stub._lock:
+                    stub.stats["requests"] += 1
+                try:
+                    status, body = stub._handle(self.path, request)
+                except ValueError as e:
+                    status, body = 400, {"error": str(e)}
+                except Exception as e:
+                    if request.get("stream", True):
+                        self._respond_stream_error(str(e))
+                        return
+                    status, body = 500, {"error": str(e)}
+                if status != 200 or self.path not in ("/api/generate", "/api/chat"):
+                    self._respond(status, body)
+                elif request.get("stream", True):
+                    self._respond_stream(body)
+                else:
+                    text = body["message"]["content"] if "message" in body else body["response"]
+                    time.sleep(stub.token_seconds * len(_TOKEN.findall(text)))  # Same pace, sent at the end
+                    self._respond(status, body)
+
+            def do_GET(self):
+                self._dispatch({})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._respond(400, {"error": "invalid JSON"})
+                    return
+                self._dispatch(request)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--load-seconds", type=float, default=2.0)
+    parser.add_argument("--token-seconds", type=float, default=0.0, help="Delay per streamed token")
+    args = parser.parse_args()
+
+    server = OllamaStubServer(args.host, args.port, load_seconds=args.load_seconds, token_seconds=args.token_seconds)
+    print(f"🧪 Ollama stub listening on {server.url} (model load {args.load_seconds}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Reciprocal rank fusion of several rankings of the same items"""
+
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Hashable]],
+    k: int = 60,
+    weights: Optional[Sequence[float]] = None
+) -> List[Tuple[Hashable, float]]:
+    """
+    Fuse rankings by summing weight / (k + rank) per item
+
+    Only ranks are used, so rankings with incomparable scores (BM25 vs
+    vector distance) can be combined without normalization.
+
+    Args:
+        rankings: Item lists, best first (an item appears at most once per list)
+        k: Damping constant; larger values flatten the head of each ranking
+        weights: Per-ranking weights (default 1.0 each)
+
+    Returns:
+        (item, fused score) pairs, best first; ties keep first-seen order
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda pair: -pair[1])
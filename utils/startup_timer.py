@@ -0,0 +1,42 @@
+"""Wall-clock breakdown of cold start by phase"""
+
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+
+class StartupTimer:
+    """Records how long each named startup phase took, in order"""
+
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+
+    def record(self, name: str, seconds: float):
+        self.phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as one phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    @property
+    def total(self) -> float:
+        return sum(seconds for _, seconds in self.phases)
+
+    def as_dict(self) -> dict:
+        return {name: round(seconds, 3) for name, seconds in self.phases}
+
+    def format(self) -> str:
+        """One line per phase with its share of the total"""
+        total = self.total or 1.0
+        width = max((len(name) for name, _ in self.phases), default=0)
+        lines = [
+            f"   {name:<{width}}  {seconds:6.2f}s  {seconds / total:4.0%}"
+            for name, seconds in self.phases
+        ]
+        lines.append(f"   {'total':<{width}}  {self.total:6.2f}s")
+        return "\n".join(lines)
@@ -1,75 +1,683 @@
 """Vector Store module for ChromaDB operations"""
 
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any
-from config import VECTOR_STORE_CONFIG
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple, Union
+from embeddings import create_embedding_backend
+from indexes.numpy_collection import NumpyClient, NumpyCollection
+from indexes.ivfpq import IVFPQCollection
+from indexes.quantized import QuantizedCollection
+from indexes.bm25 import BM25Index
+from indexes.sharded import ShardedCollection, shard_name, rebalance
+from indexes.bundle import BundleClient
+from utils.embedding_cache import EmbeddingCache
+from utils.embedding_executor import EmbeddingExecutor
+from utils.rank_fusion import reciprocal_rank_fusion
+from config import (
+    VECTOR_STORE_CONFIG, EMBEDDING_CACHE_CONFIG, EMBEDDING_EXECUTOR_CONFIG, CHUNK_CONFIG, LEXICAL_CONFIG,
+    BUNDLE_CONFIG, ANSWER_CACHE_CONFIG
+)
+
+QUERY_MODES = ("dense", "lexical", "hybrid")
+_RESULT_FIELDS = ("ids", "documents", "metadatas", "distances")
 
 
 class VectorStore:
-    """Manages vector database operations using ChromaDB"""
+    """Manages vector database operations using ChromaDB or the in-process numpy backend"""
     
-    def __init__(self, collection_name: str = None):
+    def __init__(self, collection_name: str = None, persist_directory: Optional[str] = None):
+        """
+        Args:
+            collection_name: Chroma collection (default from VECTOR_STORE_CONFIG)
+            persist_directory: On-disk index location; "" forces an in-memory
+                               store (default from VECTOR_STORE_CONFIG)
+        """
         self.collection_name = collection_name or VECTOR_STORE_CONFIG["collection_name"]
-        self.client = chromadb.Client(Settings(anonymized_telemetry=False))
-        self.collection = self.client.get_or_create_collection(name=self.collection_name)
-        self.embedding_model = SentenceTransformer(VECTOR_STORE_CONFIG["embedding_model"])
+        self.persist_directory = (
+            persist_directory if persist_directory is not None
+            else VECTOR_STORE_CONFIG.get("persist_directory")
+        )
+        self.backend = VECTOR_STORE_CONFIG.get("backend", "chroma")
+        self.read_only = self.backend == "bundle"
+        if self.read_only:
+            # Vectors and texts stay memory-mapped; nothing is embedded or written
+            # Sizes are always checked; hashing every file is left to import/verify
+            self.client = BundleClient(BUNDLE_CONFIG["path"], verify=BUNDLE_CONFIG["verify_on_serve"])
+            self.persist_directory = ""
+        elif self.backend in ("numpy", "ivfpq", "quantized"):
+            self.client = NumpyClient(
+                VECTOR_STORE_CONFIG["numpy_dir"] if self.persist_directory else None,
+                collection_class={
+                    "numpy": NumpyCollection, "ivfpq": IVFPQCollection, "quantized": QuantizedCollection
+                }[self.backend]
+            )
+        elif self.backend == "chroma":
+            # chromadb is imported here rather than at module level: it takes ~1s to import
+            import chromadb
+            from chromadb.config import Settings
+            
+            if self.persist_directory:
+                self.client = chromadb.PersistentClient(
+                    path=self.persist_directory,
+                    settings=Settings(anonymized_telemetry=False)
+                )
+            else:
+                self.client = chromadb.Client(Settings(anonymized_telemetry=False))
+        else:
+            raise ValueError(
+                f"Unknown vector store backend '{self.backend}', expected 'chroma', 'numpy', 'ivfpq', 'quantized' or 'bundle'"
+            )
+        self.configured_shards = 1 if self.read_only else max(1, VECTOR_STORE_CONFIG.get("shards", 1))
+        self._index_version: Optional[str] = None  # Read lazily from the collection metadata
+        self._index_version_used = True  # A recorded version may be cached by earlier runs
+        self._index_version_read_at = 0.0
+        self._index_version_lock = threading.Lock()
+        self._deferred_depth = 0  # Open deferred_index_version() blocks
+        self._deferred_change = False  # A write happened inside them
+        # Other processes (watcher.py, bundle_index.py) write to a persistent Chroma index live
+        self.shared_index = self.backend == "chroma" and bool(self.persist_directory)
+        self.n_shards = 1
+        self.collection = self._open_collection()
+        if self.n_shards != self.configured_shards:
+            print(
+                f"⚠️  Index has {self.n_shards} shard(s) but {self.configured_shards} are configured; "
+                f"run `python rebalance_shards.py` to reshard it"
+            )
+        self.embedding_model = create_embedding_backend()
+        self.embedding_cache = None
+        if EMBEDDING_CACHE_CONFIG["enabled"]:
+            # Backends are namespaced separately: int8 vectors differ slightly from torch ones
+            self.embedding_cache = EmbeddingCache(self.embedding_model.name)
+        self.embedding_executor = None
+        if EMBEDDING_EXECUTOR_CONFIG["enabled"]:
+            self.embedding_executor = EmbeddingExecutor(self.embedding_model.encode)
+        self.lexical_index = None
+        # A bundle carries no BM25 postings, and rebuilding them would cost every worker the whole corpus
+        if LEXICAL_CONFIG["enabled"] and not self.read_only:
+            self.lexical_index = BM25Index(
+                os.path.join(LEXICAL_CONFIG["bm25_dir"], self.collection_name) if self.persist_directory else None,
+                k1=LEXICAL_CONFIG["k1"],
+                b=LEXICAL_CONFIG["b"]
+            )
+            self._sync_lexical_index()
+        self.query_mode = LEXICAL_CONFIG["query_mode"] if self.lexical_index is not None else "dense"
+        self._lexical_index_version = None  # Index version the BM25 log was last refreshed at
+        self.query_stats = {"dense": 0, "lexical": 0, "hybrid": 0, "lexical_fast_path": 0}
+    
+    def _open_collection(self):
+        """
+        The collection to read and write: the base collection, or a
+        ShardedCollection over it and its siblings
+        
+        The shard layout is recorded in the base collection's metadata when it
+        is first created, and an existing index keeps its recorded layout
+        until rebalance_shards() changes it (an unsharded index counts as 1).
+        """
+        base = self.client.get_or_create_collection(name=self.collection_name)
+        recorded = (base.metadata or {}).get("shards")
+        if recorded is None and base.count() == 0:
+            base.modify(metadata={**(base.metadata or {}), "shards": self.configured_shards})
+            recorded = self.configured_shards
+        self.n_shards = int(recorded or 1)
+        if self.n_shards == 1:
+            return base
+        return ShardedCollection([base] + [
+            self.client.get_or_create_collection(name=shard_name(self.collection_name, shard))
+            for shard in range(1, self.n_shards)
+        ])
+    
+    def rebalance_shards(self, n_shards: Optional[int] = None) -> int:
+        """
+        Redistribute stored chunks over a new number of shards (no re-embedding)
+        
+        Args:
+            n_shards: Target shard count (default VECTOR_STORE_CONFIG["shards"])
+        
+        Returns:
+            Number of chunks moved
+        """
+        n_shards = max(1, n_shards or self.configured_shards)
+        moved = rebalance(
+            lambda name: self.client.get_or_create_collection(name=name),
+            lambda name: self.client.delete_collection(name=name),
+            self.collection_name,
+            from_shards=self.n_shards,
+            to_shards=n_shards
+        )
+        base = self.client.get_or_create_collection(name=self.collection_name)
+        base.modify(metadata={**(base.metadata or {}), "shards": n_shards})
+        self.collection = self._open_collection()
+        return moved
+    
+    def _sync_lexical_index(self, page_size: int = 5000):
+        """Rebuild the BM25 index from the collection's documents if they disagree"""
+        if len(self.lexical_index) == self.collection.count():
+            return
+        self.lexical_index.clear()
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                return
+            self.lexical_index.add(page["ids"], page["documents"])
+            offset += len(page["ids"])
+    
+    def _model_encode(self, texts: List[str]) -> np.ndarray:
+        """Run the embedding model, micro-batched with concurrent callers when enabled"""
+        if self.embedding_executor is None:
+            return self.embedding_model.encode(texts)
+        return self.embedding_executor.encode(texts)
     
-    def add_documents(self, documents: List[str], metadatas: List[Dict[str, Any]] = None):
-        """Add documents to the vector store with optional metadata"""
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, serving repeats from the embedding cache when enabled"""
+        if self.embedding_cache is None:
+            return self._model_encode(texts)
+        
+        vectors = self.embedding_cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            computed = self._model_encode(missing)
+            self.embedding_cache.put_many(missing, computed)
+            fresh = dict(zip(missing, computed))
+            vectors = [fresh[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return np.vstack(vectors)
+    
+    def add_documents(
+        self,
+        documents: List[str],
+        metadatas: List[Dict[str, Any]] = None,
+        ids: List[str] = None,
+        embeddings: Optional[np.ndarray] = None
+    ):
+        """
+        Add documents to the vector store with optional metadata and ids
+        
+        Args:
+            embeddings: Precomputed vectors of the documents (skips the model)
+        """
         if not documents:
             return
         
         # Generate embeddings
-        embeddings = self.embedding_model.encode(documents).tolist()
+        vectors = self._encode(documents) if embeddings is None else np.asarray(embeddings, dtype=np.float32)
         
-        # Generate IDs if not provided
-        ids = [f"doc_{i}" for i in range(len(documents))]
+        # Generate content-derived IDs if not provided (positional ids collide across calls)
+        ids = ids or self._content_ids(documents)
         
         # Add to collection
         self.collection.add(
             documents=documents,
             ids=ids,
-            embeddings=embeddings,
-            metadatas=metadatas or [{}] * len(documents)
+            embeddings=vectors.tolist(),
+            metadatas=metadatas or None  # Recent Chroma rejects empty metadata dicts
         )
+        if self.lexical_index is not None:
+            self.lexical_index.add(ids, documents)
+        self._index_changed()
     
-    def query(self, query: str, n_results: int = 3, metadata_filter: Dict = None) -> Dict[str, Any]:
-        """Query the vector store and return similar documents"""
-        # Generate query embedding
-        query_embedding = self.embedding_model.encode(query).tolist()
+    @staticmethod
+    def _content_ids(documents: List[str]) -> List[str]:
+        """Stable ids derived from document text, suffixed for repeats"""
+        ids = []
+        seen = {}
+        for text in documents:
+            digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:20]
+            occurrence = seen.get(digest, 0)
+            seen[digest] = occurrence + 1
+            ids.append(f"doc_{digest}" if occurrence == 0 else f"doc_{digest}_{occurrence}")
+        return ids
+    
+    def upsert_documents(
+        self,
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str]
+    ):
+        """Insert or replace documents by id"""
+        if not documents:
+            return
         
-        # Query with optional metadata filter
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results,
-            where=metadata_filter
+        vectors = self._encode(documents)
+        self.collection.upsert(
+            documents=documents,
+            ids=ids,
+            embeddings=vectors.tolist(),
+            metadatas=metadatas
         )
+        if self.lexical_index is not None:
+            self.lexical_index.add(ids, documents)
+        self._index_changed()
+    
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Replace metadata of existing documents without re-embedding them"""
+        if ids:
+            self.collection.update(ids=ids, metadatas=metadatas)
+            self._index_changed()
+    
+    def delete_documents(self, ids: List[str]):
+        """Delete documents by id"""
+        if ids:
+            self.collection.delete(ids=ids)
+            if self.lexical_index is not None:
+                self.lexical_index.delete(ids)
+            self._index_changed()
+    
+    def delete_where(self, where: Dict[str, Any]):
+        """Delete all documents matching a metadata filter"""
+        if self.lexical_index is not None:
+            self.lexical_index.delete(self.collection.get(where=where, include=[])["ids"])
+        self.collection.delete(where=where)
+        self._index_changed()
+    
+    def update_metadata_where(self, where: Dict[str, Any], values: Dict[str, Any], page_size: int = 5000):
+        """Merge `values` into the metadata of all documents matching a filter, page by page"""
+        offset = 0
+        while True:
+            page = self.collection.get(where=where, include=[], limit=page_size, offset=offset)
+            ids = page["ids"]
+            if not ids:
+                return
+            self.collection.update(ids=ids, metadatas=[dict(values) for _ in ids])
+            self._index_changed()
+            offset += len(ids)
+    
+    def query(
+        self,
+        query: str,
+        n_results: int = 3,
+        metadata_filter: Dict = None,
+        mode: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Query the vector store and return similar documents
+        
+        Args:
+            query: Query string
+            n_results: Number of chunks to return
+            metadata_filter: Optional Chroma `where` filter
+            mode: "dense", "lexical" or "hybrid" (default LEXICAL_CONFIG query_mode)
+        """
+        return self.query_batch([query], n_results, metadata_filter, mode=mode)[0]
+    
+    def query_batch(
+        self,
+        queries: List[str],
+        n_results: Union[int, List[int]] = 3,
+        metadata_filters: Union[Dict, List[Optional[Dict]], None] = None,
+        mode: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Query several strings at once
+        
+        All queries needing dense retrieval are embedded in one batch and
+        every group of queries sharing a filter is answered by one collection
+        query (with the group's largest n_results, truncated per query).
+        
+        In "hybrid" mode the BM25 and dense rankings are fused with reciprocal
+        rank fusion, except when the BM25 hits to return clearly beat the next
+        one (LEXICAL_CONFIG decisive_ratio): those queries are answered from
+        the lexical index alone and never embedded. Distances of fused hits
+        found only lexically are computed from their stored vectors; queries
+        that were never embedded ("lexical" mode, decisive hybrid queries)
+        have distances of None.
+        
+        Args:
+            queries: Query strings
+            n_results: One count for all queries, or one per query
+            metadata_filters: One filter for all queries, or one per query
+            mode: "dense", "lexical" or "hybrid" (default LEXICAL_CONFIG query_mode)
+        
+        Returns:
+            One result dict per query, in order, shaped like query()
+        """
+        if not queries:
+            return []
+        
+        mode = mode or self.query_mode
+        if mode not in QUERY_MODES:
+            raise ValueError(f"Unknown query mode '{mode}', expected one of {QUERY_MODES}")
+        if mode != "dense" and self.lexical_index is None:
+            raise ValueError(
+                f"Query mode '{mode}' needs the lexical index (LEXICAL_CONFIG['enabled'], not available with bundles)"
+            )
+        
+        n_list = n_results if isinstance(n_results, list) else [n_results] * len(queries)
+        filters = metadata_filters if isinstance(metadata_filters, list) else [metadata_filters] * len(queries)
+        groups = {}
+        for i, metadata_filter in enumerate(filters):
+            key = json.dumps(metadata_filter, sort_keys=True)
+            groups.setdefault(key, []).append(i)
+        
+        # Lexical rankings first: decisive ones spare the embedding forward pass
+        depth = 1 if mode == "dense" else LEXICAL_CONFIG["candidates_per_result"]
+        lexical = {}
+        if mode != "dense":
+            self._refresh_lexical_index()
+            for indices in groups.values():
+                hits = self._lexical_search(
+                    [queries[i] for i in indices],
+                    max(n_list[i] for i in indices) * depth,
+                    filters[indices[0]]
+                )
+                lexical.update(zip(indices, hits))
+        dense_needed = [
+            i for i in range(len(queries))
+            if mode == "dense" or (mode == "hybrid" and not self._is_decisive(lexical[i], n_list[i]))
+        ]
+        embeddings = dict(zip(dense_needed, self._encode([queries[i] for i in dense_needed]))) if dense_needed else {}
+        
+        dense = {}
+        for indices in groups.values():
+            dense_indices = [i for i in indices if i in embeddings]
+            if not dense_indices:
+                continue
+            results = self._search(
+                np.vstack([embeddings[i] for i in dense_indices]),
+                max(n_list[i] for i in dense_indices) * depth,
+                filters[indices[0]]
+            )
+            for row, i in enumerate(dense_indices):
+                dense[i] = {field: results[field][row] if results[field] else [] for field in _RESULT_FIELDS}
         
+        if mode == "dense":
+            self.query_stats["dense"] += len(queries)
+            return [{field: dense[i][field][:n_list[i]] for field in _RESULT_FIELDS} for i in range(len(queries))]
+        
+        self.query_stats[mode] += len(queries)
+        if mode == "hybrid":
+            self.query_stats["lexical_fast_path"] += len(queries) - len(dense_needed)
+        rankings = {}
+        for i in range(len(queries)):
+            lexical_ids = [chunk_id for chunk_id, _ in lexical[i]]
+            if i in dense:
+                fused = reciprocal_rank_fusion([dense[i]["ids"], lexical_ids], k=LEXICAL_CONFIG["rrf_k"])
+                rankings[i] = [chunk_id for chunk_id, _ in fused[:n_list[i]]]
+            else:
+                rankings[i] = lexical_ids[:n_list[i]]
+        
+        # Documents of dense hits are known; fetch the rest once. Distances are per query:
+        # a chunk one query found densely may be a lexical-only hit of another
+        known = {
+            chunk_id: (document, metadata)
+            for i in dense
+            for chunk_id, document, metadata in zip(dense[i]["ids"], dense[i]["documents"], dense[i]["metadatas"])
+        }
+        missing = list(dict.fromkeys(chunk_id for ids in rankings.values() for chunk_id in ids if chunk_id not in known))
+        known.update(self._records(missing))
+        dense_distances = {i: dict(zip(dense[i]["ids"], dense[i]["distances"])) for i in dense}
+        lexical_only = list(dict.fromkeys(
+            chunk_id for i in dense for chunk_id in rankings[i]
+            if chunk_id in known and chunk_id not in dense_distances[i]
+        ))
+        vectors = self.get_embeddings(lexical_only)
+        outputs = []
+        for i in range(len(queries)):
+            hits = [(chunk_id, known[chunk_id]) for chunk_id in rankings[i] if chunk_id in known]
+            if i in dense:
+                # Same squared L2 the collections report
+                distances = [
+                    dense_distances[i][chunk_id] if chunk_id in dense_distances[i]
+                    else float(np.sum((embeddings[i] - vectors[chunk_id]) ** 2)) if chunk_id in vectors
+                    else None
+                    for chunk_id, _ in hits
+                ]
+            else:
+                distances = [None] * len(hits)
+            outputs.append({
+                "ids": [chunk_id for chunk_id, _ in hits],
+                "documents": [record[0] for _, record in hits],
+                "metadatas": [record[1] for _, record in hits],
+                "distances": distances,
+            })
+        return outputs
+    
+    def _refresh_lexical_index(self):
+        """Apply BM25 entries written by other processes once the index version moves"""
+        if not self.shared_index:
+            return
+        version = self.index_version
+        if version != self._lexical_index_version:
+            self.lexical_index.refresh()
+            self._lexical_index_version = version
+    
+    def _lexical_search(
+        self,
+        queries: List[str],
+        n_results: int,
+        where: Optional[Dict] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        BM25 (id, score) hits per query, restricted to chunks matching `where`
+        
+        The global top hits are filtered first; if that leaves a query short
+        of hits it might have had, the queries are re-scored over only the
+        chunks matching the filter, so selective filters still get results.
+        """
+        ids, scores = self.lexical_index.search(queries, n_results)
+        hits = [list(zip(row_ids, row_scores)) for row_ids, row_scores in zip(ids, scores)]
+        if where:
+            candidates = list(dict.fromkeys(chunk_id for row in ids for chunk_id in row))
+            allowed = set(self.collection.get(ids=candidates, where=where, include=[])["ids"]) if candidates else set()
+            filtered = [[hit for hit in row if hit[0] in allowed] for row in hits]
+            if any(len(kept) < n_results <= len(row) for kept, row in zip(filtered, hits)):
+                allowed = set(self.collection.get(where=where, include=[])["ids"])
+                ids, scores = self.lexical_index.search(queries, n_results, allowed_ids=allowed)
+                filtered = [list(zip(row_ids, row_scores)) for row_ids, row_scores in zip(ids, scores)]
+            hits = filtered
+        return hits
+    
+    @staticmethod
+    def _is_decisive(hits: List[Tuple[str, float]], n_results: int) -> bool:
+        """
+        Whether BM25 alone can answer: each of the n_results hits to return
+        beats the best hit left out by LEXICAL_CONFIG decisive_ratio
+        
+        With no hit left out there is nothing to measure the margin against
+        (the rest of the corpus shares no term), so dense retrieval runs.
+        """
+        if not 0 < n_results < len(hits):
+            return False
+        return hits[n_results - 1][1] >= LEXICAL_CONFIG["decisive_ratio"] * hits[n_results][1]
+    
+    def _records(self, ids: List[str]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """Document and metadata of existing ids (deleted ones are left out)"""
+        if not ids:
+            return {}
+        records = self.collection.get(ids=ids, include=["documents", "metadatas"])
         return {
-            "documents": results["documents"][0] if results["documents"] else [],
-            "metadatas": results["metadatas"][0] if results["metadatas"] else [],
-            "distances": results["distances"][0] if results["distances"] else [],
+            chunk_id: (document, metadata)
+            for chunk_id, document, metadata in zip(records["ids"], records["documents"], records["metadatas"])
         }
     
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors of existing ids (no re-embedding)"""
+        if not ids:
+            return {}
+        records = self.collection.get(ids=ids, include=["embeddings"])
+        vectors = np.asarray(records["embeddings"], dtype=np.float32)
+        return dict(zip(records["ids"], vectors))
+    
+    def warm_up(self) -> float:
+        """
+        Run a dummy encode so the first real query does not pay for lazy
+        model initialization (bypasses the embedding cache)
+        
+        Returns:
+            Seconds spent
+        """
+        start = time.perf_counter()
+        self._model_encode(["warm-up query"])
+        return time.perf_counter() - start
+    
+    def _search(self, embeddings: np.ndarray, n_results: int, where: Optional[Dict] = None) -> Dict[str, Any]:
+        """Nearest neighbours of query embeddings, shaped like collection.query()"""
+        return self.collection.query(
+            query_embeddings=embeddings.tolist(),
+            n_results=n_results,
+            where=where
+        )
+    
     def embed_text(self, text: str) -> List[float]:
         """Generate embedding for a single text"""
-        return self.embedding_model.encode(text).tolist()
+        return self._encode([text])[0].tolist()
     
     def update_collection(self):
         """Reinitialize collection (useful for updates)"""
-        self.collection = self.client.get_or_create_collection(name=self.collection_name)
+        self.collection = self._open_collection()
     
     def delete_collection(self):
-        """Delete the collection"""
-        self.client.delete_collection(name=self.collection_name)
+        """Delete the collection (every shard)"""
+        for shard in range(self.n_shards):
+            self.client.delete_collection(name=shard_name(self.collection_name, shard))
+        if self.lexical_index is not None:
+            self.lexical_index.clear()
+        with self._index_version_lock:
+            self._index_version = None
+            self._index_version_used = True
+    
+    @property
+    def index_version(self) -> str:
+        """
+        Token identifying the current contents of the index
+        
+        It changes after any write that follows a read of it, and is stored in
+        the collection metadata, so anything cached against it (answers) can
+        be invalidated across restarts. On a shared index every write changes
+        it, and it is re-read every ANSWER_CACHE_CONFIG
+        ["index_version_refresh_seconds"] so writes by other processes are
+        picked up.
+        """
+        with self._index_version_lock:
+            now = time.monotonic()
+            refresh_seconds = ANSWER_CACHE_CONFIG["index_version_refresh_seconds"]
+            if self._index_version is None or (
+                self.shared_index and refresh_seconds is not None
+                and now - self._index_version_read_at >= refresh_seconds
+            ):
+                self._index_version = self._recorded_metadata().get("index_version")
+                self._index_version_read_at = now
+                if self._index_version is None:
+                    self._set_index_version(uuid.uuid4().hex[:16])
+            self._index_version_used = True
+            return self._index_version
+    
+    def _recorded_metadata(self) -> Dict[str, Any]:
+        """Collection metadata as stored, including changes made by other processes"""
+        if self.shared_index:
+            return self.client.get_collection(name=self.collection_name).metadata or {}
+        return self.collection.metadata or {}
+    
+    def _index_changed(self):
+        """Retire the index version after a write, if it may have been handed out"""
+        with self._index_version_lock:
+            if self._deferred_depth:
+                self._deferred_change = True
+                return
+            # Versions read by other processes are invisible here
+            if self._index_version_used or self.shared_index:
+                self._set_index_version(uuid.uuid4().hex[:16])
+                self._index_version_used = False
+    
+    @contextmanager
+    def deferred_index_version(self):
+        """
+        Retire the index version once for all writes made inside the block
+        
+        Each retirement rewrites the collection metadata (and re-reads it on
+        a shared index), so an ingest run or watcher batch bumps the version
+        when it ends rather than per write batch. Blocks may nest and the
+        writes may come from any thread.
+        """
+        with self._index_version_lock:
+            self._deferred_depth += 1
+        try:
+            yield
+        finally:
+            with self._index_version_lock:
+                self._deferred_depth -= 1
+                changed = self._deferred_change and not self._deferred_depth
+                if changed:
+                    self._deferred_change = False
+            if changed:
+                self._index_changed()
+    
+    def _set_index_version(self, version: str):
+        self._index_version = version
+        self.collection.modify(metadata={**self._recorded_metadata(), "index_version": version})
+    
+    def index_info(self) -> Dict[str, str]:
+        """Settings that determine the stored vectors and chunk boundaries"""
+        return {
+            "embedding_model": self.embedding_model.name,
+            "chunk_config": json.dumps(CHUNK_CONFIG, sort_keys=True),
+        }
+    
+    def index_mismatches(self) -> List[str]:
+        """
+        Compare the settings recorded with the index against the current ones
+        
+        Returns:
+            One description per differing setting (empty if compatible or
+            nothing was recorded yet)
+        """
+        recorded = self.collection.metadata or {}
+        mismatches = [
+            f"{key}: index has {recorded[key]}, configured {value}"
+            for key, value in self.index_info().items()
+            if key in recorded and recorded[key] != value
+        ]
+        if recorded.get("import_in_progress"):
+            mismatches.append(f"import of bundle '{recorded['import_in_progress']}' did not complete")
+        return mismatches
+    
+    def mark_import_started(self, source: str):
+        """Flag the (empty) collection as being filled from `source` until record_index_info"""
+        self.collection.modify(metadata={**self._recorded_metadata(), "import_in_progress": source})
+    
+    def record_index_info(self):
+        """Store the current settings in the collection metadata (and clear an import flag)"""
+        metadata = {**self._recorded_metadata(), **self.index_info()}
+        metadata.pop("import_in_progress", None)
+        self.collection.modify(metadata=metadata)
+    
+    def get_embedding_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss statistics of the embedding cache"""
+        if self.embedding_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.embedding_cache.get_stats()}
+    
+    def get_embedding_executor_stats(self) -> Dict[str, Any]:
+        """Batch-size and queue-wait metrics of the embedding executor"""
+        if self.embedding_executor is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.embedding_executor.get_stats()}
+    
+    def get_quantized_index_stats(self) -> Dict[str, Any]:
+        """Code size and resident memory per vector of the quantized backend"""
+        if self.backend != "quantized" or self.n_shards != 1:
+            return {"enabled": False}
+        return {"enabled": True, **self.collection.get_index_stats()}
+    
+    def get_lexical_index_stats(self) -> Dict[str, Any]:
+        """BM25 index size and how queries were answered per mode"""
+        if self.lexical_index is None:
+            return {"enabled": False, "queries": dict(self.query_stats)}
+        return {"enabled": True, **self.lexical_index.get_stats(), "queries": dict(self.query_stats)}
     
     def get_collection_info(self) -> Dict[str, Any]:
         """Get information about the collection"""
         count = self.collection.count()
         return {
             "name": self.collection_name,
+            "backend": self.backend,
             "count": count,
+            "shards": self.n_shards,
+            "persist_directory": self.persist_directory or None,
         }
 
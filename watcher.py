@@ -0,0 +1,211 @@
+"""Live watch-folder ingestion: keeps the vector store in sync with the docs folder"""
+
+import os
+import sys
+import threading
+import time
+from typing import Dict, Tuple, Optional, Any
+from ingest import ingest_documents, IndexManifest
+from config import WATCH_CONFIG
+
+
+class DocumentWatcher:
+    """
+    Polls a documents folder in a background thread and applies created,
+    modified and deleted .txt files to a live VectorStore
+
+    Changes are debounced per file (a file must stop changing for
+    `debounce_seconds`, or has been pending for `max_delay_seconds`) and
+    applied oldest first in micro-batches through the incremental ingest
+    pipeline, so queries keep being served while the index updates.
+
+    When a batch fails its files are retried one by one, so a file that
+    cannot be indexed does not hold back the others; it is retried with
+    exponential back-off until it succeeds or changes again.
+    """
+
+    def __init__(
+        self,
+        doc_folder: str,
+        vector_store,
+        manifest: Optional[IndexManifest] = None,
+        poll_interval: float = None,
+        debounce_seconds: float = None,
+        max_batch_files: int = None,
+        verbose: bool = False
+    ):
+        self.doc_folder = doc_folder
+        self.vector_store = vector_store
+        self.manifest = manifest if manifest is not None else IndexManifest.load()
+        self.poll_interval = poll_interval or WATCH_CONFIG["poll_interval"]
+        self.debounce_seconds = WATCH_CONFIG["debounce_seconds"] if debounce_seconds is None else debounce_seconds
+        self.max_batch_files = max_batch_files or WATCH_CONFIG["max_batch_files"]
+        self.max_delay_seconds = WATCH_CONFIG["max_delay_seconds"]
+        self.verbose = verbose
+
+        self._snapshot = self._scan()
+        self._pending: Dict[str, Tuple[float, float]] = {}  # path -> (first seen, last changed)
+        self._failures: Dict[str, Tuple[int, float]] = {}  # path -> (consecutive failures, retry at)
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {
+            "batches": 0,
+            "files_applied": 0,
+            "errors": 0,
+            "last_error": None,
+            "failing_files": 0,  # Files waiting out a back-off after failing to index
+            "last_lag_seconds": None,  # First detected change -> searchable
+            "max_lag_seconds": 0.0,
+        }
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """Stat fingerprint of every .txt file in the folder"""
+        snapshot = {}
+        try:
+            entries = list(os.scandir(self.doc_folder))
+        except FileNotFoundError:
+            return snapshot
+        for entry in entries:
+            if entry.name.endswith(".txt"):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue  # Deleted between listing and stat
+                if entry.is_file():
+                    snapshot[entry.path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def start(self) -> "DocumentWatcher":
+        """Start watching in a daemon thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="document-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        """Stop watching; a micro-batch in progress is finished first"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            self.poll()
+
+    def poll(self) -> Optional[Dict[str, Any]]:
+        """Detect changes once and apply a micro-batch of settled files"""
+        now = time.monotonic()
+        snapshot = self._scan()
+        for path in set(snapshot).union(self._snapshot):
+            if snapshot.get(path) != self._snapshot.get(path):
+                first_seen = self._pending.get(path, (now, now))[0]
+                self._pending[path] = (first_seen, now)
+                self._failures.pop(path, None)  # Changed since it failed: worth a fresh try
+        self._snapshot = snapshot
+
+        ready = sorted(
+            (
+                path for path, (first_seen, last_changed) in self._pending.items()
+                if (now - last_changed >= self.debounce_seconds or now - first_seen >= self.max_delay_seconds)
+                and self._failures.get(path, (0, now))[1] <= now
+            ),
+            key=lambda path: self._pending[path][0]
+        )[:self.max_batch_files]
+        if not ready:
+            return None
+        return self._apply(ready)
+
+    def _apply(self, paths) -> Optional[Dict[str, Any]]:
+        # Ingest only records files whose writes succeeded, so a failed batch keeps what it wrote
+        try:
+            stats = ingest_documents(
+                self.doc_folder,
+                self.vector_store,
+                manifest=self.manifest,
+                paths=paths,
+                workers=WATCH_CONFIG["workers"],
+                progress=False
+            )
+            self.manifest.save()
+        except Exception as e:
+            self.manifest.save()
+            self.stats["errors"] += 1
+            self.stats["last_error"] = str(e)
+            if len(paths) > 1:
+                # Find the file(s) at fault: the rest of the batch still goes through
+                if self.verbose:
+                    print(f"\n⚠️  [Watcher] Failed to index a batch ({e}), retrying its files one by one")
+                applied = [result for result in (self._apply([path]) for path in paths) if result]
+                return _sum_stats(applied) if applied else None
+            self._back_off(paths[0], e)
+            return None
+
+        applied_at = time.monotonic()
+        for path in paths:
+            self._failures.pop(path, None)
+        self.stats["failing_files"] = len(self._failures)
+        lag = max(applied_at - self._pending.pop(path)[0] for path in paths)
+        self.stats["batches"] += 1
+        self.stats["files_applied"] += len(paths)
+        self.stats["last_lag_seconds"] = round(lag, 3)
+        self.stats["max_lag_seconds"] = round(max(self.stats["max_lag_seconds"], lag), 3)
+
+        if self.verbose:
+            print(
+                f"\n🔄 [Watcher] {stats.files_added} added, {stats.files_changed} changed, "
+                f"{stats.files_removed} removed ({lag:.1f}s after change)"
+            )
+        return stats.as_dict()
+
+    def _back_off(self, path: str, error: Exception):
+        """Keep a failed file pending, but retry it only after a growing delay"""
+        failures = self._failures.get(path, (0, 0.0))[0] + 1
+        delay = min(WATCH_CONFIG["retry_seconds"] * 2 ** (failures - 1), WATCH_CONFIG["max_retry_seconds"])
+        self._failures[path] = (failures, time.monotonic() + delay)
+        self.stats["failing_files"] = len(self._failures)
+        if self.verbose:
+            print(f"\n⚠️  [Watcher] Failed to index {os.path.basename(path)} ({error}); retrying in {delay:.0f}s")
+
+
+def _sum_stats(results) -> Dict[str, Any]:
+    """Ingest stats of several batches added up (rates recomputed from the totals)"""
+    total = {key: sum(result[key] for result in results) for key in results[0]}
+    elapsed = max(total["elapsed_seconds"], 1e-9)
+    total["files_per_second"] = round(total["files"] / elapsed, 2)
+    total["chunks_per_second"] = round(total["chunks_written"] / elapsed, 2)
+    return total
+
+
+def main():
+    """Watch a folder and keep the configured vector store in sync"""
+    from vector_store import VectorStore
+
+    doc_folder = sys.argv[1] if len(sys.argv) > 1 else "docs"
+    vector_store = VectorStore()
+    manifest = IndexManifest.load()
+    if vector_store.index_mismatches():
+        print("🔄 Stored index was built with different settings, rebuilding...")
+        vector_store.delete_collection()
+        vector_store.update_collection()
+        manifest.clear()
+    elif vector_store.get_collection_info()["count"] == 0:
+        manifest.clear()
+
+    print(f"📄 Syncing '{doc_folder}'...")
+    ingest_documents(doc_folder, vector_store, manifest=manifest)
+    manifest.save()
+    vector_store.record_index_info()
+
+    watcher = DocumentWatcher(doc_folder, vector_store, manifest=manifest, verbose=True).start()
+    print(f"👀 Watching '{doc_folder}' for changes (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
+        print("\n👋 Stopped watching")
+
+
+if __name__ == "__main__":
+    main()